@@ -0,0 +1,336 @@
+"""Compiled FAST lookup tables.
+
+Each depth-damage function (DDF) CSV under ``Lookuptables`` becomes a dense float array of
+shape (functions, depth breakpoints m4..p24) with a hash index from its key (SpecificOccupId
+or DDF ID) to the row, so a lookup is a dict hit and depth interpolation is one gather over
+the array. Debris, restoration and inventory economic tables are compiled the same way.
+
+The compiled arrays are cached as ``Lookuptables/.cache/fast_lut_<digest>.npz``, where the
+digest is a SHA-256 over the source CSVs, so later runs skip CSV parsing until a table is
+edited. The row-by-row engine's dict rows are rebuilt from the same arrays, so neither engine
+parses a CSV on a warm start.
+"""
+
+import csv
+import hashlib
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+logger = logging.getLogger("FAST")
+
+# Depth breakpoints of every DDF table, in column order: m4 .. m1, p0 .. p24 (feet).
+DEPTH_COLUMNS = ["m4", "m3", "m2", "m1"] + ["p" + str(ft) for ft in range(25)]
+MIN_DEPTH = -4
+MAX_DEPTH = 24
+
+LUT_FILES = {
+    "bddf_riverine": "Building_DDF_Riverine_LUT_Hazus4p0.csv",
+    "bddf_coastalA": "Building_DDF_CoastalA_LUT_Hazus4p0.csv",
+    "bddf_coastalV": "Building_DDF_CoastalV_LUT_Hazus4p0.csv",
+    "bddf_full": "flBldgStructDmgFn.csv",
+    "cddf_riverine": "Content_DDF_Riverine_LUT_Hazus4p0.csv",
+    "cddf_coastalA": "Content_DDF_CoastalA_LUT_Hazus4p0.csv",
+    "cddf_coastalV": "Content_DDF_CoastalV_LUT_Hazus4p0.csv",
+    "cddf_full": "flBldgContDmgFn.csv",
+    "iddf_riverine": "Inventory_DDF_LUT_Hazus4p0.csv",
+    "iddf_full": "flBldgInvDmgFn.csv",
+    "iecon": "flBldgEconParamSalesAndInv.csv",
+    "debris": "flDebris_LUT.csv",
+    "restoration": "flRsFnGBS_LUT.csv",
+}
+
+# DDF tables with their key and ID columns. Yes, the capitalization of the full-library ID
+# columns differs (BldgDmgFnID / ContDmgFnId / InvDmgFnId). That's the way the Hazus database is.
+DDF_TABLES = {
+    "bddf_riverine": ("SpecificOccupId", "DDF_ID"),
+    "bddf_coastalA": ("SpecificOccupId", "DDF_ID"),
+    "bddf_coastalV": ("SpecificOccupId", "DDF_ID"),
+    "bddf_full": ("BldgDmgFnID", "BldgDmgFnID"),
+    "cddf_riverine": ("SpecificOccupId", "DDF_ID"),
+    "cddf_coastalA": ("SpecificOccupId", "DDF_ID"),
+    "cddf_coastalV": ("SpecificOccupId", "DDF_ID"),
+    "cddf_full": ("ContDmgFnId", "ContDmgFnId"),
+    "iddf_riverine": ("SpecificOccupId", "DDF_ID"),
+    "iddf_full": ("InvDmgFnId", "InvDmgFnId"),
+}
+
+COASTAL_KINDS = ("riverine", "coastalA", "coastalV")
+
+CACHE_DIR_NAME = ".cache"
+# Bump when the cached layout or the compiled representation changes.
+CACHE_VERSION = 2
+
+
+def _read_lut(path):
+    with open(path) as lut_file:
+        return [row for row in csv.DictReader(lut_file)]
+
+
+def _first_index(keys):
+    index = {}
+    for i, key in enumerate(keys):
+        index.setdefault(key, i)
+    return index
+
+
+def map_keys(keys, index, missing=-1):
+    """Row index for each key of an array, ``missing`` where the key is not in ``index``."""
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64)
+    uniques, inverse = np.unique(np.asarray(keys).astype(str), return_inverse=True)
+    mapped = np.array([index.get(key, missing) for key in uniques.tolist()], dtype=np.int64)
+    return mapped[inverse]
+
+
+def depth_breakpoints(depth):
+    """Column indexes below/above each (already clamped) depth and the fraction between them."""
+    lower = np.floor(depth)
+    upper = np.ceil(depth)
+    return (lower - MIN_DEPTH).astype(np.int64), (upper - MIN_DEPTH).astype(np.int64), depth - lower
+
+
+class DDFTable(object):
+    """One DDF lookup table compiled to a (functions x depth breakpoints) array.
+
+    ``index`` maps the key column to the first matching row, as the legacy scan (which breaks
+    on the first hit) does. ``damage`` has one spare all-zero row at the end so gathers with a
+    ``-1`` miss index stay in bounds.
+    """
+
+    def __init__(self, keys, ids, damage, occupancies, key_field, id_field):
+        self.keys = keys
+        self.index = _first_index(keys)
+        self.ids = np.empty(len(ids) + 1, dtype=object)
+        self.ids[:-1] = ids
+        self.ids[-1] = ""
+        self.damage = damage
+        self.occupancies = occupancies
+        self.key_field = key_field
+        self.id_field = id_field
+        self._rows = None
+
+    @classmethod
+    def from_rows(cls, rows, key_field, id_field):
+        damage = np.array(
+            [[float(row[col]) for col in DEPTH_COLUMNS] for row in rows] + [[0.0] * len(DEPTH_COLUMNS)],
+            dtype=np.float64,
+        )
+        return cls(
+            [row[key_field] for row in rows],
+            [row[id_field] for row in rows],
+            damage,
+            [row["Occupancy"] for row in rows],
+            key_field,
+            id_field,
+        )
+
+    @property
+    def rows(self):
+        """The table as dict rows for the row-by-row engine (built from the arrays on first use).
+
+        Each row has the key, ID and Occupancy columns as text and the depth columns as floats.
+        """
+        if self._rows is None:
+            self._rows = []
+            for key, ddf_id, occupancy, damage in zip(
+                self.keys, self.ids[:-1].tolist(), self.occupancies, self.damage[:-1].tolist()
+            ):
+                row = dict(zip(DEPTH_COLUMNS, damage))
+                row.update({"Occupancy": occupancy, self.key_field: key, self.id_field: ddf_id})
+                self._rows.append(row)
+        return self._rows
+
+    def row(self, key):
+        """The CSV row for ``key`` (first match), or None."""
+        i = self.index.get(key)
+        return None if i is None else self.rows[i]
+
+    def lookup(self, keys):
+        """Row index per key, or -1 when the key is not in the table."""
+        return map_keys(keys, self.index)
+
+    def interpolate(self, rows, lower_index, upper_index, frac):
+        """Damage fraction (0-1) for table rows at the given breakpoints, interpolated like Hazus."""
+        d_lower = self.damage[rows, lower_index]
+        d_upper = self.damage[rows, upper_index]
+        return (d_lower + frac * (d_upper - d_lower)) / 100
+
+
+class LookupTables(object):
+    """All FAST lookup tables, compiled for O(1) keyed access and array gathers.
+
+    Build one with ``compile_lookup_tables``. ``arrays`` holds the compiled representation
+    (the same arrays that go into the on-disk cache); the ``*_rows`` properties rebuild dict
+    rows from it for the row-by-row engine.
+    """
+
+    def __init__(self, lut_dir, arrays):
+        self.lut_dir = lut_dir
+        self.arrays = arrays
+
+        self.ddf_tables = {
+            name: DDFTable(
+                arrays[name + "/keys"].tolist(),
+                arrays[name + "/ids"].tolist(),
+                arrays[name + "/damage"],
+                arrays[name + "/occupancy"].tolist(),
+                key_field,
+                id_field,
+            )
+            for name, (key_field, id_field) in DDF_TABLES.items()
+        }
+        self.building = {kind: self.ddf_tables["bddf_" + kind] for kind in COASTAL_KINDS}
+        self.content = {kind: self.ddf_tables["cddf_" + kind] for kind in COASTAL_KINDS}
+        self.inventory = self.ddf_tables["iddf_riverine"]
+        self.building_full = self.ddf_tables["bddf_full"]
+        self.content_full = self.ddf_tables["cddf_full"]
+        self.inventory_full = self.ddf_tables["iddf_full"]
+
+        self.iecon_index = _first_index(arrays["iecon/keys"].tolist())
+        values = arrays["iecon/values"]
+        self.inventory_value = {occupancy: tuple(values[i].tolist()) for occupancy, i in self.iecon_index.items()}
+
+        # The legacy debris scan has no break, so the last matching row wins.
+        self.debris_index = {key: i for i, key in enumerate(arrays["debris/keys"].tolist())}
+        self.debris_rates = arrays["debris/rates"]
+
+        self.restoration_index = _first_index(arrays["restoration/keys"].tolist())
+        self.restoration_days = arrays["restoration/days"]
+
+        self._iecon_rows = None
+        self._debris_rows = None
+        self._restoration_rows = None
+
+    @property
+    def iecon_rows(self):
+        if self._iecon_rows is None:
+            self._iecon_rows = [
+                {"Occupancy": occupancy, "AnnualSalesPerSqFt": sales, "BusinessInvPctofSales": inventory}
+                for occupancy, (sales, inventory) in zip(
+                    self.arrays["iecon/keys"].tolist(), self.arrays["iecon/values"].tolist()
+                )
+            ]
+        return self._iecon_rows
+
+    @property
+    def debris_rows(self):
+        if self._debris_rows is None:
+            self._debris_rows = [
+                {"DebrisID": key, "Finishes": finishes, "Structure": structure, "Foundation": foundation}
+                for key, (finishes, structure, foundation) in zip(
+                    self.arrays["debris/keys"].tolist(), self.debris_rates[:-1].tolist()
+                )
+            ]
+        return self._debris_rows
+
+    @property
+    def restoration_rows(self):
+        if self._restoration_rows is None:
+            self._restoration_rows = [
+                {"RestFnID": key, "Min_Restor_Days": min_days, "Max_Restor_Days": max_days}
+                for key, (min_days, max_days) in zip(
+                    self.arrays["restoration/keys"].tolist(), self.restoration_days[:-1].tolist()
+                )
+            ]
+        return self._restoration_rows
+
+
+def _read_source_rows(lut_dir):
+    return {name: _read_lut(os.path.join(lut_dir, file_name)) for name, file_name in LUT_FILES.items()}
+
+
+def _compile_arrays(rows):
+    """The compiled arrays (keys, IDs, damage and rate matrices) for the parsed lookup CSVs."""
+    arrays = {}
+    for name, (key_field, id_field) in DDF_TABLES.items():
+        table = DDFTable.from_rows(rows[name], key_field, id_field)
+        arrays[name + "/keys"] = np.array(table.keys, dtype=str)
+        arrays[name + "/ids"] = np.array(table.ids[:-1].tolist(), dtype=str)
+        arrays[name + "/damage"] = table.damage
+        arrays[name + "/occupancy"] = np.array(table.occupancies, dtype=str)
+
+    iecon = rows["iecon"]
+    arrays["iecon/keys"] = np.array([row["Occupancy"] for row in iecon], dtype=str)
+    arrays["iecon/values"] = np.array(
+        [[float(row["AnnualSalesPerSqFt"]), float(row["BusinessInvPctofSales"])] for row in iecon], dtype=np.float64
+    ).reshape(len(iecon), 2)
+
+    debris = rows["debris"]
+    arrays["debris/keys"] = np.array([row["DebrisID"] for row in debris], dtype=str)
+    arrays["debris/rates"] = np.array(
+        [[float(row["Finishes"]), float(row["Structure"]), float(row["Foundation"])] for row in debris]
+        + [[0.0, 0.0, 0.0]],
+        dtype=np.float64,
+    )
+
+    restoration = rows["restoration"]
+    arrays["restoration/keys"] = np.array([row["RestFnID"] for row in restoration], dtype=str)
+    arrays["restoration/days"] = np.array(
+        [(int(row["Min_Restor_Days"]), int(row["Max_Restor_Days"])) for row in restoration] + [(0, 0)],
+        dtype=np.int64,
+    )
+    return arrays
+
+
+def lookup_tables_digest(lut_dir):
+    """SHA-256 (hex, shortened) over the contents of every lookup CSV FAST reads."""
+    digest = hashlib.sha256("fast_lut/{}".format(CACHE_VERSION).encode("utf-8"))
+    for name in sorted(LUT_FILES):
+        digest.update(name.encode("utf-8"))
+        with open(os.path.join(lut_dir, LUT_FILES[name]), "rb") as lut_file:
+            digest.update(hashlib.sha256(lut_file.read()).digest())
+    return digest.hexdigest()[:32]
+
+
+def lookup_tables_cache_path(lut_dir, digest=None):
+    """Path of the compiled-table cache for the current contents of ``lut_dir``."""
+    digest = digest or lookup_tables_digest(lut_dir)
+    return os.path.join(lut_dir, CACHE_DIR_NAME, "fast_lut_" + digest + ".npz")
+
+
+def _save_cache(path, arrays):
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as cache_file:
+            np.savez(cache_file, **arrays)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    # Drop caches of older table versions.
+    for entry in os.listdir(cache_dir):
+        if entry.startswith("fast_lut_") and entry.endswith(".npz") and entry != os.path.basename(path):
+            os.remove(os.path.join(cache_dir, entry))
+
+
+def _load_cache(path):
+    with np.load(path, allow_pickle=False) as cached:
+        return {name: cached[name] for name in cached.files}
+
+
+def compile_lookup_tables(lut_dir, use_cache=True):
+    """Compile the FAST lookup CSVs in ``lut_dir`` into a ``LookupTables``.
+
+    With ``use_cache`` the compiled arrays are loaded from (or saved to) the on-disk cache
+    next to the CSVs. A cache that cannot be read or written is ignored.
+    """
+    path = lookup_tables_cache_path(lut_dir) if use_cache else None
+    if path is not None and os.path.isfile(path):
+        try:
+            return LookupTables(lut_dir, _load_cache(path))
+        except Exception as exc:
+            logger.debug("Ignoring unreadable lookup table cache %s: %s", path, exc)
+
+    rows = _read_source_rows(lut_dir)
+    arrays = _compile_arrays(rows)
+    if path is not None:
+        try:
+            _save_cache(path, arrays)
+        except OSError as exc:
+            logger.debug("Could not write lookup table cache %s: %s", path, exc)
+    return LookupTables(lut_dir, arrays)
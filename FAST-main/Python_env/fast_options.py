@@ -0,0 +1,13 @@
+"""Option values shared by the FAST entry points.
+
+Kept free of third-party imports so ``run_fast.py --help`` and ``hazus_notinuse`` can use them
+without loading NumPy, rasterio or pyarrow.
+"""
+
+# Damage engines: the row-by-row flood_damage in hazus_notinuse.py, or the columnar NumPy
+# implementation in fast_vectorized.py (same output, much faster on large inventories).
+ENGINES = ("legacy", "vectorized")
+
+# Result formats written to a file; "arrow" keeps the results in memory (run_fast.FastEngine).
+FILE_RESULTS_FORMATS = ("csv", "parquet")
+RESULTS_FORMATS = FILE_RESULTS_FORMATS + ("arrow",)
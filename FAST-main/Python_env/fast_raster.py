@@ -0,0 +1,179 @@
+"""Batched, windowed depth-grid sampling for FAST.
+
+``DepthRaster`` samples a flood depth raster at whole arrays of building coordinates at
+once: the points are reprojected from WGS84 lon/lat into the raster CRS with a single
+pyproj ``Transformer`` call, mapped to pixel indices through the inverse affine transform,
+and gathered tile by tile. Points that cannot be projected, fall outside the grid, or land
+on a nodata cell are masked instead of raising per row.
+
+The band is never read whole. Only the tiles (block-aligned windows of roughly
+``TILE_SIZE`` pixels a side) that contain buildings are read, and they are kept in a
+least-recently-used cache bounded by ``cache_bytes``, so peak memory follows the
+inventory's footprint rather than the size of a CONUS-scale grid.
+"""
+
+import logging
+from collections import OrderedDict
+
+import numpy as np
+import rasterio
+from pyproj import CRS, Transformer
+from rasterio.windows import Window
+
+logger = logging.getLogger("FAST")
+
+WGS84 = "EPSG:4326"
+TILE_SIZE = 512
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def _coordinate_transformer(crs):
+    """Return a lon/lat -> raster CRS transformer, or None when no reprojection is needed."""
+    if crs is None:
+        # Unreferenced grids are assumed to be in lon/lat, as the row-by-row engine assumes.
+        return None
+    raster_crs = CRS.from_user_input(crs.to_wkt())
+    if raster_crs.equals(WGS84, ignore_axis_order=True):
+        return None
+    return Transformer.from_crs(WGS84, raster_crs, always_xy=True)
+
+
+def _tile_extent(block, size, limit):
+    """Smallest multiple of the internal ``block`` size that is at least ``size`` (capped at ``limit``)."""
+    return min(limit, max(block, -(-size // block) * block))
+
+
+class DepthRaster(object):
+    """Band 1 of a depth grid, read lazily in tiles and sampled a batch of points at a time."""
+
+    def __init__(self, path, cache_bytes=DEFAULT_CACHE_BYTES, tile_size=TILE_SIZE):
+        self.path = path
+        self.src = rasterio.open(path)
+        self.crs = self.src.crs
+        self.nodata = self.src.nodata
+        self.width = self.src.width
+        self.height = self.src.height
+        self.dtype = np.dtype(self.src.dtypes[0])
+        self.transform = self.src.transform
+        self.inverse = ~self.transform
+        self.transformer = _coordinate_transformer(self.crs)
+
+        block_height, block_width = self.src.block_shapes[0]
+        self.tile_height = _tile_extent(block_height, tile_size, self.height)
+        self.tile_width = _tile_extent(block_width, tile_size, self.width)
+        self.tiles_across = -(-self.width // self.tile_width)
+        self.cache_bytes = cache_bytes
+        self._tiles = OrderedDict()
+        self._cached_bytes = 0
+        self.tiles_read = 0
+        logger.debug(
+            "Opened raster %s (%d x %d, %s) in %d x %d tiles",
+            path,
+            self.height,
+            self.width,
+            self.dtype,
+            self.tile_height,
+            self.tile_width,
+        )
+        logger.debug("Raster CRS %s, reprojecting points: %s", self.crs, self.transformer is not None)
+
+    def close(self):
+        self._tiles.clear()
+        self._cached_bytes = 0
+        self.src.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def project(self, lat, lon):
+        """Return raster-CRS ``(x, y)`` arrays for WGS84 latitude/longitude arrays."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        if self.transformer is None:
+            return lon, lat
+        with np.errstate(invalid="ignore"):
+            x, y = self.transformer.transform(lon, lat, errcheck=False)
+        return np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+
+    def pixel_index(self, lat, lon):
+        """Return ``(ok, row, col, inside)`` for coordinate arrays.
+
+        ``ok`` marks points that could be projected to finite raster coordinates, ``inside``
+        the subset that falls on the grid; ``row``/``col`` are only meaningful where inside.
+        """
+        x, y = self.project(lat, lon)
+        inv = self.inverse
+        with np.errstate(invalid="ignore", over="ignore"):
+            col = np.floor(inv.a * x + inv.b * y + inv.c)
+            row = np.floor(inv.d * x + inv.e * y + inv.f)
+        ok = np.isfinite(col) & np.isfinite(row)
+        inside = ok & (col >= 0) & (col < self.width) & (row >= 0) & (row < self.height)
+        row = np.where(inside, row, 0).astype(np.int64)
+        col = np.where(inside, col, 0).astype(np.int64)
+        return ok, row, col, inside
+
+    def valid_cells(self, values):
+        """Mask of raster ``values`` that hold data (not nodata)."""
+        if self.nodata is None:
+            return np.ones(values.shape, dtype=bool)
+        if np.isnan(self.nodata):
+            return ~np.isnan(values)
+        return values != self.nodata
+
+    def _tile(self, tile_id):
+        """Return the pixels of one tile, reading it from disk on a cache miss."""
+        tile = self._tiles.get(tile_id)
+        if tile is not None:
+            self._tiles.move_to_end(tile_id)
+            return tile
+        tile_row, tile_col = divmod(int(tile_id), self.tiles_across)
+        row_off = tile_row * self.tile_height
+        col_off = tile_col * self.tile_width
+        window = Window(
+            col_off,
+            row_off,
+            min(self.tile_width, self.width - col_off),
+            min(self.tile_height, self.height - row_off),
+        )
+        tile = self.src.read(1, window=window)
+        self.tiles_read += 1
+        self._tiles[tile_id] = tile
+        self._cached_bytes += tile.nbytes
+        while self._cached_bytes > self.cache_bytes and len(self._tiles) > 1:
+            _, evicted = self._tiles.popitem(last=False)
+            self._cached_bytes -= evicted.nbytes
+        return tile
+
+    def read_cells(self, row, col):
+        """Gather raster values at pixel index arrays, touching only the tiles they fall in."""
+        values = np.empty(len(row), dtype=self.dtype)
+        if not len(row):
+            return values
+        tile_row, local_row = np.divmod(row, self.tile_height)
+        tile_col, local_col = np.divmod(col, self.tile_width)
+        tile_id = tile_row * self.tiles_across + tile_col
+        order = np.argsort(tile_id, kind="stable")
+        tile_ids, starts = np.unique(tile_id[order], return_index=True)
+        for tile_id_value, members in zip(tile_ids, np.split(order, starts[1:])):
+            tile = self._tile(tile_id_value)
+            values[members] = tile[local_row[members], local_col[members]]
+        return values
+
+    def sample(self, lat, lon, fill=0):
+        """Sample depth at every point.
+
+        Returns ``(ok, hit, depth)``: ``depth`` has the raster dtype and holds ``fill``
+        wherever ``hit`` (on the grid and not nodata) is False.
+        """
+        ok, row, col, inside = self.pixel_index(lat, lon)
+        depth = np.full(len(ok), fill, dtype=self.dtype)
+        hit = inside.copy()
+        if inside.any():
+            values = self.read_cells(row[inside], col[inside])
+            valid = self.valid_cells(values)
+            hit[inside] = valid
+            depth[hit] = values[valid]
+        return ok, hit, depth
@@ -0,0 +1,219 @@
+"""Result table writers for the vectorized FAST engine.
+
+The engine hands a writer whole output columns for one input batch: one column list per
+depth grid, in header order. ``CsvResults`` writes them as the legacy result CSV, text for
+text. ``ParquetResults`` writes typed, zstd-compressed Parquet instead: integer and
+floating-point columns of a Parquet inventory keep their type, FAST's computed amounts and
+the other mapped numeric inventory attributes become float64 (blank or non-numeric values
+become null) and every other column a string, one row group per batch. A column name is
+written once even where the CSV header repeats it.
+
+Either writer can also run without a file (``path=None``) and collect its output for a
+worker process to hand back; ``payload`` returns what was collected and ``append`` adds a
+payload to another writer, so chunks evaluated elsewhere land in input order.
+``ArrowResults`` is a Parquet writer that never writes a file: ``table`` returns the rows
+as an in-memory Arrow table (``run_fast.FastEngine``).
+"""
+
+import csv
+import io
+
+import numpy as np
+
+from fast_options import RESULTS_FORMATS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pq = None
+
+PARQUET_COMPRESSION = "zstd"
+
+# Output fields FAST computes as amounts, stored as float64 in Parquet results.
+NUMERIC_OUTPUT_FIELDS = [
+    "Depth_Grid",
+    "Depth_in_Struc",
+    "flExp",
+    "BldgDmgPct",
+    "BldgLossUSD",
+    "ContentCostUSD",
+    "ContDmgPct",
+    "ContentLossUSD",
+    "InventoryCostUSD",
+    "InvDmgPct",
+    "InventoryLossUSD",
+    "Debris_Fin",
+    "Debris_Struc",
+    "Debris_Found",
+    "Debris_Tot",
+    "Restor_Days_Min",
+    "Restor_Days_Max",
+]
+
+
+def _interleave_grids(grid_rows):
+    """Merge per-grid row iterators so each building's rows are adjacent, in grid order."""
+    for building_rows in zip(*grid_rows):
+        for row in building_rows:
+            yield row
+
+
+class CsvResults(object):
+    """Result rows written as legacy FAST CSV text."""
+
+    suffix = ".csv"
+
+    def __init__(self, path=None, header=None):
+        self.path = path
+        self.header = header
+        self.file_out = open(path, "w") if path is not None else io.StringIO()
+        self.writer = csv.writer(self.file_out, delimiter=",", lineterminator="\n")
+
+    def write_header(self):
+        self.writer.writerow(self.header)
+
+    def write_columns(self, column_sets):
+        """Write one batch; with several grids each building's rows are interleaved."""
+        if len(column_sets) == 1:
+            self.writer.writerows(zip(*column_sets[0]))
+        else:
+            self.writer.writerows(_interleave_grids([zip(*columns) for columns in column_sets]))
+
+    def payload(self):
+        return self.file_out.getvalue()
+
+    def append(self, payload):
+        self.file_out.write(payload)
+
+    def close(self):
+        self.file_out.close()
+
+
+def _float_array(values):
+    """float64 Arrow array of ``values``; blanks and text that is not a number become null."""
+    parsed = np.zeros(len(values), dtype=np.float64)
+    valid = np.ones(len(values), dtype=bool)
+    try:
+        parsed[:] = values.astype(np.float64)
+        # astype reads None as NaN; keep it missing.
+        valid[:] = [value is not None for value in values]
+    except (TypeError, ValueError):
+        for i, value in enumerate(values):
+            try:
+                parsed[i] = float(value)
+            except (TypeError, ValueError):
+                valid[i] = False
+    return pa.array(parsed, mask=~valid)
+
+
+def _interleaved(parts, order):
+    """One object array of the per-grid ``parts`` of a column, in output row order."""
+    values = np.concatenate([np.asarray(list(part) if hasattr(part, "arrow") else part, dtype=object) for part in parts])
+    return values if order is None else values[order]
+
+
+def _typed_array(parts, order, arrow_type):
+    """Concatenate typed input columns (``arrow`` arrays) without leaving Arrow."""
+    array = pa.concat_arrays([part.arrow for part in parts]).cast(arrow_type)
+    return array if order is None else array.take(pa.array(order))
+
+
+def _string_array(values):
+    return pa.array([v if v is None or isinstance(v, str) else str(v) for v in values], type=pa.string())
+
+
+class ParquetResults(object):
+    """Result rows written as a typed Parquet table."""
+
+    suffix = ".parquet"
+
+    def __init__(self, path=None, header=None, numeric_fields=(), input_types=None):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for parquet results.")
+        self.path = path
+        self.header = header
+        numeric = set(numeric_fields)
+        # A repeated name holds the same value in every copy (the legacy writer fills rows from
+        # a dict), and per-grid headers repeat the output fields of earlier grids; keep one.
+        first = {}
+        for index, name in enumerate(header):
+            first.setdefault(name, index)
+        self.positions = sorted(first.values())
+        self.types = []
+        for index in self.positions:
+            name = header[index]
+            if input_types and name in input_types:
+                self.types.append(input_types[name])
+            else:
+                self.types.append(pa.float64() if name in numeric else pa.string())
+        self.schema = pa.schema([pa.field(header[index], t) for index, t in zip(self.positions, self.types)])
+        self.writer = pq.ParquetWriter(path, self.schema, compression=PARQUET_COMPRESSION) if path is not None else None
+        self.batches = []
+
+    def write_header(self):
+        # The schema is part of the file, so there is no header row to add.
+        pass
+
+    def write_columns(self, column_sets):
+        """Write one batch; with several grids each building's rows are interleaved."""
+        n = len(column_sets[0][0]) if column_sets and column_sets[0] else 0
+        order = None
+        if len(column_sets) > 1:
+            order = np.arange(n * len(column_sets)).reshape(len(column_sets), n).T.ravel()
+        arrays = []
+        for index, arrow_type in zip(self.positions, self.types):
+            parts = [columns[index] for columns in column_sets]
+            if all(hasattr(part, "arrow") for part in parts):
+                arrays.append(_typed_array(parts, order, arrow_type))
+            elif arrow_type == pa.string():
+                arrays.append(_string_array(_interleaved(parts, order)))
+            else:
+                arrays.append(_float_array(_interleaved(parts, order)).cast(arrow_type))
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if self.writer is not None:
+            self.writer.write_batch(batch)
+        else:
+            self.batches.append(batch)
+
+    def payload(self):
+        return self.batches
+
+    def append(self, payload):
+        for batch in payload:
+            if self.writer is not None:
+                self.writer.write_batch(batch)
+            else:
+                self.batches.append(batch)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class ArrowResults(ParquetResults):
+    """Result rows kept in memory; ``path`` is the file name the table would have, sans extension."""
+
+    suffix = ""
+
+    def __init__(self, name, header=None, numeric_fields=(), input_types=None):
+        ParquetResults.__init__(self, None, header, numeric_fields, input_types)
+        self.path = name
+
+    def table(self):
+        return pa.Table.from_batches(self.batches, schema=self.schema)
+
+
+def open_results(results_format, results_file, header, numeric_fields, input_types=None):
+    """Writer for ``results_file`` (a path without extension); ``None`` collects in memory."""
+    if results_format == "arrow":
+        return ArrowResults(results_file, header, numeric_fields, input_types)
+    if results_format == "parquet":
+        path = None if results_file is None else results_file + ParquetResults.suffix
+        return ParquetResults(path, header, numeric_fields, input_types)
+    if results_format != "csv":
+        raise ValueError("results_format must be one of: {formats}".format(formats=", ".join(RESULTS_FORMATS)))
+    path = None if results_file is None else results_file + CsvResults.suffix
+    return CsvResults(path, header)
@@ -0,0 +1,285 @@
+"""Long-running FAST worker service fed by a directory queue.
+
+``serve`` keeps a pool of worker processes alive between jobs. Each worker imports the
+engines once and compiles the lookup tables once per project root, so a job pays only for
+reading its inventory and sampling its rasters rather than for interpreter start-up,
+imports and lookup-table loading.
+
+Jobs are JSON objects with the keys ``run_fast.run_job`` takes, one per file in
+``<queue>/incoming/*.json``; write a job under another name (e.g. ``*.json.tmp``) and
+rename it into place so a half-written file is never picked up. The service claims a job
+by renaming it into ``<queue>/running``, runs up to ``jobs`` of them at once in name order,
+and writes the payload ``run_fast.py`` prints to ``<queue>/done/<job>.json``, also by
+rename. Because claims are renames, several services can share one queue. A service leaves
+the jobs it finds in ``running`` alone, since another service may be running them; once the
+service that claimed them was interrupted or killed, start one with ``requeue=True`` to move
+them back to ``incoming``.
+
+A worker that dies (e.g. killed for memory) breaks the whole pool, so the service starts a
+new one. The job that worker was running is reported as failed; the other jobs in flight are
+moved back to ``incoming``. When several jobs were in flight the dead worker's job is not
+known, so they are run one at a time until each has finished or failed on its own.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger("FAST")
+
+QUEUE_DIRS = ("incoming", "running", "done")
+JOB_SUFFIX = ".json"
+DEFAULT_POLL_SECONDS = 1.0
+
+# Compiled lookup tables of this worker process, by lookup-table directory.
+_LOOKUP_TABLES = {}
+
+
+def _lookup_tables(project_root):
+    from fast_lut import compile_lookup_tables
+    from hazus_notinuse import _resolve_lookup_tables_dir, _resolve_project_root
+
+    lookup_tables_dir = _resolve_lookup_tables_dir(_resolve_project_root(project_root))
+    tables = _LOOKUP_TABLES.get(lookup_tables_dir)
+    if tables is None:
+        tables = _LOOKUP_TABLES[lookup_tables_dir] = compile_lookup_tables(lookup_tables_dir)
+    return tables
+
+
+def _init_worker(project_root):
+    """Import the engines and compile the default lookup tables before the first job."""
+    import fast_vectorized  # noqa: F401
+
+    _lookup_tables(project_root)
+
+
+def _error_payload(exc):
+    return {"success": False, "error": str(exc), "row_errors": 0}
+
+
+def _write_json(path, payload):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as output_file:
+        json.dump(payload, output_file)
+    os.replace(temp_path, path)
+
+
+def _run_job_file(job_path, project_root):
+    """Run the job in ``job_path`` and return its payload."""
+    from run_fast import run_job
+
+    try:
+        with open(job_path, "r", encoding="utf-8") as job_file:
+            job = json.load(job_file)
+        if not isinstance(job, dict):
+            raise ValueError("job must be a JSON object.")
+        if job.get("project_root") is None:
+            job["project_root"] = project_root
+        return run_job(job, lookup_tables=_lookup_tables(job["project_root"]))
+    except Exception as exc:
+        return _error_payload(exc)
+
+
+def _claim_jobs(queue, limit, names=None):
+    """Move up to ``limit`` incoming jobs to ``running`` and return their names.
+
+    With ``names``, only those jobs are claimed.
+    """
+    claimed = []
+    for name in sorted(os.listdir(queue["incoming"]) if names is None else names):
+        if len(claimed) >= limit:
+            break
+        if not name.endswith(JOB_SUFFIX):
+            continue
+        try:
+            os.rename(os.path.join(queue["incoming"], name), os.path.join(queue["running"], name))
+        except OSError:
+            # Claimed by another service in the meantime.
+            continue
+        claimed.append(name)
+    return claimed
+
+
+def _requeue_job(queue, name):
+    """Move the job ``name`` from ``running`` back to ``incoming``; return whether it moved."""
+    try:
+        os.rename(os.path.join(queue["running"], name), os.path.join(queue["incoming"], name))
+    except OSError:
+        return False
+    logger.info("FAST service: job {name} requeued".format(name=name))
+    return True
+
+
+def _requeue_jobs(queue):
+    """Move jobs left in ``running`` back to ``incoming`` and return their names."""
+    return [
+        name
+        for name in sorted(os.listdir(queue["running"]))
+        if name.endswith(JOB_SUFFIX) and _requeue_job(queue, name)
+    ]
+
+
+def _write_result(queue, name, payload):
+    _write_json(os.path.join(queue["done"], name), payload)
+    # A service started with requeue may have moved the claim back to incoming meanwhile.
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(os.path.join(queue["running"], name))
+    logger.info("FAST service: job {name} {status}".format(name=name, status="done" if payload["success"] else "failed"))
+    return payload
+
+
+def _finish_job(queue, name, future):
+    try:
+        payload = future.result()
+    except Exception as exc:
+        payload = _error_payload(exc)
+    return _write_result(queue, name, payload)
+
+
+def _create_pool(jobs, project_root):
+    return ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(project_root,))
+
+
+def _is_broken(future):
+    return future.done() and isinstance(future.exception(), BrokenProcessPool)
+
+
+def serve(queue_dir, project_root=None, jobs=1, poll_seconds=DEFAULT_POLL_SECONDS, once=False, requeue=False):
+    """Run queued jobs until interrupted; with ``once``, return when the queue is empty.
+
+    With ``requeue``, jobs an earlier service left in ``running`` are queued again first;
+    only use it when no other service is working on the queue.
+    Returns the number of jobs finished.
+    """
+    if jobs < 1:
+        raise ValueError("jobs must be at least 1.")
+    queue = {name: os.path.join(queue_dir, name) for name in QUEUE_DIRS}
+    for path in queue.values():
+        os.makedirs(path, exist_ok=True)
+    if requeue:
+        _requeue_jobs(queue)
+
+    finished = 0
+    pending = {}
+    # Jobs in flight when a worker died, run one at a time until each has finished.
+    suspects = set()
+    pool = _create_pool(jobs, project_root)
+    try:
+        while True:
+            claimed = []
+            if suspects:
+                claimed = _claim_jobs(queue, 0 if pending else 1, names=suspects)
+                if not pending and not claimed:
+                    # Another service claimed them.
+                    suspects.clear()
+            if not suspects:
+                claimed = _claim_jobs(queue, jobs - len(pending))
+            # Jobs a dead worker may have been running, with the error reported for it.
+            broken = {}
+            for index, name in enumerate(claimed):
+                job_path = os.path.join(queue["running"], name)
+                try:
+                    future = pool.submit(_run_job_file, job_path, project_root)
+                except BrokenProcessPool as exc:
+                    broken[name] = exc
+                    for other in claimed[index + 1:]:
+                        _requeue_job(queue, other)
+                    break
+                pending[future] = name
+                logger.info("FAST service: job {name} started".format(name=name))
+            if not pending and not broken:
+                if once:
+                    return finished
+                time.sleep(poll_seconds)
+                continue
+            if not broken:
+                done, _ = wait(pending, timeout=poll_seconds, return_when=FIRST_COMPLETED)
+                if not any(_is_broken(future) for future in done):
+                    for future in done:
+                        name = pending.pop(future)
+                        _finish_job(queue, name, future)
+                        suspects.discard(name)
+                        finished += 1
+                    continue
+
+            # A worker died. Shutting the pool down settles every pending future, either
+            # with its result or with BrokenProcessPool.
+            pool.shutdown(wait=True)
+            for future, name in pending.items():
+                if _is_broken(future):
+                    broken[name] = future.exception()
+                else:
+                    _finish_job(queue, name, future)
+                    suspects.discard(name)
+                    finished += 1
+            pending.clear()
+            if len(broken) == 1:
+                [(name, exc)] = broken.items()
+                logger.error("FAST service: worker running job {name} died".format(name=name))
+                _write_result(queue, name, _error_payload(exc))
+                suspects.discard(name)
+                finished += 1
+            else:
+                for name in broken:
+                    _requeue_job(queue, name)
+                suspects.update(broken)
+            pool = _create_pool(jobs, project_root)
+    finally:
+        pool.shutdown(wait=True)
+
+
+def _create_parser():
+    parser = argparse.ArgumentParser(
+        prog="run_fast.py serve",
+        description="Run FAST as a long-running service fed by a directory queue of JSON jobs.",
+    )
+    parser.add_argument(
+        "--queue-dir",
+        required=True,
+        help="Queue directory; jobs go in <queue>/incoming, payloads appear in <queue>/done.",
+    )
+    parser.add_argument(
+        "--project-root",
+        default=None,
+        help="FAST project root for jobs that do not name one; its lookup tables are loaded at start.",
+    )
+    parser.add_argument("--log-path", default=None, help="Optional FAST log file path.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of jobs run at the same time.")
+    parser.add_argument(
+        "--poll-seconds",
+        type=float,
+        default=DEFAULT_POLL_SECONDS,
+        help="How often the incoming directory is checked for new jobs.",
+    )
+    parser.add_argument("--once", action="store_true", help="Exit once the queue is empty instead of waiting.")
+    parser.add_argument(
+        "--requeue",
+        action="store_true",
+        help="Move jobs found in <queue>/running back to incoming at start (no other service is running them).",
+    )
+    return parser
+
+
+def main(argv=None):
+    from hazus_notinuse import _configure_logger
+
+    args = _create_parser().parse_args(argv)
+    _configure_logger(log_path=args.log_path, project_root=args.project_root)
+    try:
+        serve(
+            args.queue_dir,
+            project_root=args.project_root,
+            jobs=args.jobs,
+            poll_seconds=args.poll_seconds,
+            once=args.once,
+            requeue=args.requeue,
+        )
+    except KeyboardInterrupt:
+        # Jobs still in <queue>/running were interrupted; a service started with --requeue runs them.
+        pass
+    return 0
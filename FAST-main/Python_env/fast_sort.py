@@ -0,0 +1,127 @@
+"""Bounded-memory sort of FAST result CSVs by depth in structure.
+
+``sort_results_csv`` writes the ``_sorted.csv`` companion of a result file: the same rows,
+deepest Depth_in_Struc first, ties kept in file order. Rows are read in runs of at most
+``run_rows``; each run is sorted, formatted and spilled to a temporary file, and the runs
+are then merged with ``heapq.merge``, so memory is bounded by one run rather than by the
+output.
+An output that fits in one run is sorted in memory without touching disk.
+
+The file written is identical to the earlier ``csv.DictReader`` / ``sorted`` /
+``csv.DictWriter`` implementation, including its handling of duplicate header names
+(the last column of a name wins) and of short rows (missing values written empty).
+"""
+
+import csv
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+
+SORT_FIELD = "Depth_in_Struc"
+DEFAULT_RUN_ROWS = 100000
+
+# Records are pickled to run files in blocks of this many.
+_RUN_BLOCK = 4096
+_OVERFLOW_ERROR = "dict contains fields not in fieldnames: None"
+
+
+class _Lines(list):
+    """File-like sink collecting the formatted text of each row a csv.writer writes."""
+
+    write = list.append
+
+
+def _format_rows(rows):
+    lines = _Lines()
+    csv.writer(lines).writerows(rows)
+    return lines
+
+
+def _write_run(records, directory, number):
+    path = os.path.join(directory, "run_{:05d}.pkl".format(number))
+    with open(path, "wb") as run_file:
+        for start in range(0, len(records), _RUN_BLOCK):
+            pickle.dump(records[start : start + _RUN_BLOCK], run_file, pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(path):
+    with open(path, "rb") as run_file:
+        while True:
+            try:
+                block = pickle.load(run_file)
+            except EOFError:
+                return
+            for record in block:
+                yield record
+
+
+def sort_results_csv(input_csv, output_csv, sort_field=SORT_FIELD, run_rows=DEFAULT_RUN_ROWS):
+    """Write ``input_csv`` sorted by ``sort_field`` (descending, stable) to ``output_csv``."""
+    with open(input_csv, newline="") as source:
+        reader = csv.reader(source)
+        header = next(reader, None)
+        if header is None:
+            # Nothing to sort; DictWriter fails on the missing header just as before.
+            with open(output_csv, "w", newline="") as target:
+                csv.DictWriter(target, fieldnames=None).writeheader()
+            return
+
+        last_index = {name: index for index, name in enumerate(header)}
+        columns = [last_index[name] for name in header]
+        key_index = last_index.get(sort_field)
+        width = len(header)
+
+        run_dir = None
+        runs = []
+        records = []
+        values = []
+        try:
+            seq = 0
+            for row in reader:
+                if row == []:
+                    continue
+                if key_index is None:
+                    raise KeyError(sort_field)
+                depth = float(row[key_index] if key_index < len(row) else None)
+                if len(row) == width and columns[-1] == width - 1 and len(last_index) == width:
+                    values.append(row)
+                else:
+                    values.append([row[index] if index < len(row) else "" for index in columns])
+                # (-depth, seq) orders deepest first and keeps ties in file order; seq is unique,
+                # so records never compare past it.
+                records.append((-depth, seq, len(row) > width))
+                seq += 1
+                if len(records) >= run_rows:
+                    if run_dir is None:
+                        run_dir = tempfile.mkdtemp(prefix="fast_sort_", dir=os.path.dirname(os.path.abspath(output_csv)))
+                    runs.append(_write_run(_sorted_run(records, values), run_dir, len(runs)))
+                    records, values = [], []
+
+            if runs:
+                if records:
+                    runs.append(_write_run(_sorted_run(records, values), run_dir, len(runs)))
+                    records, values = [], []
+                merged = heapq.merge(*[_read_run(path) for path in runs])
+            else:
+                merged = _sorted_run(records, values)
+
+            with open(output_csv, "w", newline="") as target:
+                csv.writer(target).writerow(header)
+                for _, _, overflow, line in merged:
+                    if overflow:
+                        raise ValueError(_OVERFLOW_ERROR)
+                    target.write(line)
+        finally:
+            if run_dir is not None:
+                shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def _sorted_run(records, values):
+    """Sort one run and attach each row's formatted CSV line."""
+    lines = _format_rows(values)
+    records = [record + (line,) for record, line in zip(records, lines)]
+    records.sort()
+    return records
@@ -0,0 +1,1316 @@
+"""Vectorized FAST engine: evaluates flood_damage over whole column batches with NumPy.
+
+``flood_damage_vectorized`` is a drop-in replacement for ``hazus_notinuse.flood_damage``.
+Instead of walking the inventory one dict at a time it reads a batch of rows, parses each
+mapped attribute once into a NumPy column, and computes SOID, depth-in-structure, DDF
+interpolation, losses, debris and restoration days as array expressions; depths come from
+``fast_raster.DepthRaster``, which samples the whole batch in one call. The CSV it writes
+is byte-identical to the row-by-row engine, including the legacy handling of skipped,
+unmatched and failing rows; ``fast_results`` can write the same rows as typed Parquet.
+"""
+
+import csv
+import io
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from fast_lut import MAX_DEPTH, MIN_DEPTH, compile_lookup_tables, depth_breakpoints, map_keys
+from fast_raster import DepthRaster
+from fast_results import NUMERIC_OUTPUT_FIELDS, RESULTS_FORMATS, ArrowResults, CsvResults, open_results
+from hazus_notinuse import (
+    _configure_logger,
+    _format_grid_summary,
+    _get_input_field_names,
+    _is_parquet_input,
+    _normalize_input_value,
+    _resolve_project_root,
+    _write_sorted_results,
+    logger,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pq = None
+
+DEFAULT_BATCH_SIZE = 65536
+
+# Byte range handed to one worker when a CSV inventory is split for a process pool.
+MIN_CHUNK_BYTES = 1 << 20
+MAX_CHUNK_BYTES = 64 << 20
+
+CONTENT_MULTIPLIERS = {}
+for _occ in ["RES1", "RES2", "RES3A", "RES3B", "RES3C", "RES3D", "RES3E", "RES3F", "RES4", "RES5", "RES6", "COM10"]:
+    CONTENT_MULTIPLIERS[_occ] = 0.5
+for _occ in ["COM1", "COM2", "COM3", "COM4", "COM5", "COM8", "COM9", "IND6", "AGR1", "REL1", "GOV1", "EDU1"]:
+    CONTENT_MULTIPLIERS[_occ] = 1.0
+for _occ in ["COM6", "COM7", "IND1", "IND2", "IND3", "IND4", "IND5", "GOV2", "EDU2"]:
+    CONTENT_MULTIPLIERS[_occ] = 1.5
+
+# Occupancies with a default inventory DDF; all others carry no inventory loss.
+INVENTORY_OCCUPANCIES = ["COM1", "COM2", "IND1", "IND2", "IND3", "IND4", "IND5", "IND6", "AGR1"]
+
+# Pipeline stages, in the order the row-by-row engine executes them. A row that stops at
+# stage S (because of an error or an unmatched SOID) carries only the output fields that
+# the legacy engine had already set before S; see _FIELD_SET_AFTER.
+_STAGE_COORDS = 1
+_STAGE_FIRST_FLOOR = 2
+_STAGE_OCCUPANCY = 3
+_STAGE_CONTENT_COST = 4
+_STAGE_INVENTORY_COST = 5
+_STAGE_DEPTH = 6
+_STAGE_BUILDING = 7
+_STAGE_BUILDING_LOSS = 8
+_STAGE_CONTENT = 9
+_STAGE_INVENTORY = 10
+_STAGE_DEBRIS = 11
+_STAGE_RESTORATION = 12
+_STAGE_DONE = 13
+
+_STAGE_ERRORS = {
+    _STAGE_COORDS: "invalid Latitude/Longitude",
+    _STAGE_FIRST_FLOOR: "invalid FirstFloorHt",
+    _STAGE_OCCUPANCY: "invalid OccupancyClass, FoundationType, NumStories or Area",
+    _STAGE_CONTENT_COST: "invalid ContentCost or Cost",
+    _STAGE_INVENTORY_COST: "invalid InvCost or missing inventory economic parameters",
+    _STAGE_DEPTH: "depth in structure is not a number",
+    _STAGE_BUILDING: "invalid user-supplied Building DDF ID",
+    _STAGE_BUILDING_LOSS: "invalid Cost",
+    _STAGE_CONTENT: "invalid or unmatched Content DDF",
+    _STAGE_INVENTORY: "invalid or unmatched Inventory DDF",
+    _STAGE_DEBRIS: "no debris function for the building",
+    _STAGE_RESTORATION: "no restoration function for the building",
+}
+
+
+class _Column(object):
+    """A mapped inventory attribute parsed the way the legacy ``getValue`` parses it.
+
+    ``text`` holds the stripped string ("" for missing), ``value`` the float value (0.0 for
+    blanks, NaN where the text is not numeric) and ``numeric`` marks rows whose ``getValue``
+    result is a float rather than a string.
+    """
+
+    def __init__(self, raw):
+        n = len(raw)
+        if isinstance(raw, _NumberInput):
+            # Every value of a typed column is numeric; text is only read for non-numeric rows.
+            self.text = _objects([""] * n)
+            self.value = raw.value
+            self.numeric = np.ones(n, dtype=bool)
+            return
+        text = np.empty(n, dtype=object)
+        text[:] = ["" if v is None else v.strip() for v in raw]
+        value = np.zeros(n, dtype=np.float64)
+        numeric = np.ones(n, dtype=bool)
+        nonblank = text != ""
+        if nonblank.any():
+            candidates = text[nonblank]
+            try:
+                value[nonblank] = candidates.astype(np.float64)
+            except (TypeError, ValueError):
+                parsed = np.empty(len(candidates), dtype=np.float64)
+                ok = np.ones(len(candidates), dtype=bool)
+                for i, item in enumerate(candidates):
+                    try:
+                        parsed[i] = float(item)
+                    except (TypeError, ValueError):
+                        parsed[i] = np.nan
+                        ok[i] = False
+                value[nonblank] = parsed
+                numeric[nonblank] = ok
+        self.text = text
+        self.value = value
+        self.numeric = numeric
+
+    @property
+    def finite(self):
+        return self.numeric & np.isfinite(self.value)
+
+    def take(self, rows):
+        """The column restricted to ``rows`` (an index array)."""
+        part = _Column.__new__(_Column)
+        part.text = self.text[rows]
+        part.value = self.value[rows]
+        part.numeric = self.numeric[rows]
+        return part
+
+
+class _NumberInput(object):
+    """An integer or floating-point Parquet column, kept typed instead of turned into text.
+
+    ``value`` is what ``getValue`` would parse from the normalized text: the number as
+    float64, or 0.0 where the text is blank (null or NaN cells, flagged in ``missing``).
+    Iterating yields the values the legacy engine writes back: the Python number, or "".
+    """
+
+    def __init__(self, array):
+        self.arrow = array
+        # Integer columns with nulls come back as float64 with NaN in their place.
+        value = np.asarray(array.to_numpy(zero_copy_only=False), dtype=np.float64)
+        self.missing = np.isnan(value)
+        self.value = np.where(self.missing, 0.0, value)
+        self._objects = None
+
+    def __len__(self):
+        return len(self.value)
+
+    def __iter__(self):
+        return iter(self.objects())
+
+    def objects(self):
+        if self._objects is None:
+            values = _objects(self.arrow.to_pylist())
+            values[self.missing] = ""
+            self._objects = values
+        return self._objects
+
+
+def _number_input_types(input_path):
+    """Arrow types of the integer and floating-point columns of a Parquet inventory."""
+    if not _is_parquet_input(input_path):
+        return {}
+    schema = pq.ParquetFile(input_path).schema_arrow
+    types = {}
+    for field in schema:
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            types[field.name] = field.type
+    return types
+
+
+def _missing(raw):
+    if isinstance(raw, _NumberInput):
+        return raw.missing
+    return np.array([v is None or v == "" for v in raw], dtype=bool)
+
+
+class _DepthGrid(object):
+    """A depth raster sampled the way ``getValue(Depth_Grid)`` records it, one batch at a time."""
+
+    def __init__(self, raster):
+        self.raster = raster
+
+    def close(self):
+        self.raster.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def sample(self, lat, lon, columns=None):
+        """Return (ok, cell_values, raster_values) for coordinate arrays.
+
+        ``ok`` is False where a point cannot be located on the grid's CRS. ``cell_values``
+        is an object array holding the raw raster scalar (or int 0 outside the grid / on
+        nodata) as written to Depth_Grid, and ``raster_values`` its float value.
+        """
+        ok, hit, depth = self.raster.sample(lat, lon)
+        return ok, _cell_values(hit, depth), depth.astype(np.float64)
+
+
+class _ColumnDepthGrid(_DepthGrid):
+    """Depth grid values sampled upstream and carried in an inventory column.
+
+    Rows with a null, blank or non-numeric value count as off the grid. A typed Parquet
+    column keeps the raster's type, so the results match sampling the raster itself; text
+    is read as float64.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def close(self):
+        pass
+
+    def sample(self, lat, lon, columns=None):
+        raw = columns[self.name]
+        if isinstance(raw, _NumberInput):
+            # Only nulls are off the grid: a NaN cell value is passed on as sampling would.
+            hit = ~np.asarray(raw.arrow.is_null(), dtype=bool)
+            depth = raw.arrow.fill_null(0).to_numpy(zero_copy_only=False).copy()
+        else:
+            parsed = _Column(raw)
+            hit = parsed.numeric & (parsed.text != "") & np.isfinite(parsed.value)
+            depth = parsed.value.copy()
+        depth[~hit] = 0
+        return np.ones(len(hit), dtype=bool), _cell_values(hit, depth), depth.astype(np.float64)
+
+
+def _cell_values(hit, depth):
+    """Depth_Grid as the legacy engine writes it: the raw scalar where hit, else int 0."""
+    cell_values = np.empty(len(hit), dtype=object)
+    cell_values[:] = 0
+    if hit.any():
+        picked = np.empty(int(hit.sum()), dtype=object)
+        picked[:] = list(depth[hit])
+        cell_values[hit] = picked
+    return cell_values
+
+
+def _open_grid(path, depth_column=None):
+    """The depth source of one grid: the raster at ``path``, or the inventory's ``depth_column``."""
+    if depth_column:
+        return _ColumnDepthGrid(depth_column)
+    return _DepthGrid(DepthRaster(path))
+
+
+def _iter_input_batches(input_path, batch_size, chunk=None):
+    """Yield ``(columns, num_rows, overflow)`` batches of raw inventory values.
+
+    ``columns`` maps field name to the list of values a ``csv.DictReader`` (or, for Parquet,
+    ``_iter_input_rows``) would produce; integer and floating-point Parquet columns are passed
+    as ``_NumberInput`` arrays instead, never converted to text. ``overflow`` is set when the
+    batch stops at a CSV row with more values than the header, which the legacy writer cannot
+    write. ``chunk`` limits
+    the read to one piece from ``_plan_chunks``: a list of Parquet row groups, or a
+    ``(start, end)`` byte range of whole CSV records.
+    """
+    if _is_parquet_input(input_path):
+        if pq is None:
+            raise RuntimeError("pyarrow is required for parquet input support.")
+        parquet_file = pq.ParquetFile(input_path)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, row_groups=chunk):
+            columns = {}
+            for name, array in zip(batch.schema.names, batch.columns):
+                if pa.types.is_integer(array.type) or pa.types.is_floating(array.type):
+                    columns[name] = _NumberInput(array)
+                else:
+                    columns[name] = [_normalize_input_value(v) for v in array.to_pylist()]
+            yield columns, batch.num_rows, False
+        return
+
+    with open(input_path, newline="") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return
+        if chunk is not None:
+            start, end = chunk
+            with open(input_path, "rb") as raw:
+                raw.seek(start)
+                text = raw.read(end - start).decode(csvfile.encoding)
+            reader = csv.reader(io.StringIO(text, newline=""))
+        width = len(header)
+        rows = []
+        for row in reader:
+            if row == []:
+                continue
+            if len(row) > width:
+                yield _transpose(header, rows), len(rows), True
+                return
+            if len(row) < width:
+                row = row + [None] * (width - len(row))
+            rows.append(row)
+            if len(rows) == batch_size:
+                yield _transpose(header, rows), len(rows), False
+                rows = []
+        if rows:
+            yield _transpose(header, rows), len(rows), False
+
+
+def _csv_chunk_ranges(input_path, chunk_bytes):
+    """Split a CSV into ``(start, end)`` byte ranges of whole records, after the header.
+
+    A newline only ends a record when an even number of quote characters precede it, so a
+    quoted field containing a line break is never cut in two.
+    """
+    boundaries = []
+    quotes = 0
+    position = 0
+    target = 0  # the first boundary found is the end of the header
+    with open(input_path, "rb") as raw:
+        while True:
+            block = raw.read(1 << 20)
+            if not block:
+                break
+            search = max(0, target - position)
+            while search < len(block):
+                newline = block.find(b"\n", search)
+                if newline < 0:
+                    break
+                if (quotes + block.count(b'"', 0, newline)) % 2 == 0:
+                    boundaries.append(position + newline + 1)
+                    target = boundaries[-1] + chunk_bytes
+                    search = max(newline + 1, target - position)
+                else:
+                    search = newline + 1
+            quotes += block.count(b'"')
+            position += len(block)
+    ends = boundaries[1:] + [position]
+    return [(start, end) for start, end in zip(boundaries, ends) if start < end]
+
+
+def _plan_chunks(input_path, workers, batch_size):
+    """Split the inventory into pieces for ``workers`` processes, in input order.
+
+    Parquet is split on row-group boundaries (consecutive small groups are merged), CSV on
+    record boundaries into byte ranges. Roughly four chunks per worker keep the pool busy.
+    """
+    if _is_parquet_input(input_path):
+        if pq is None:
+            raise RuntimeError("pyarrow is required for parquet input support.")
+        metadata = pq.ParquetFile(input_path).metadata
+        target_rows = max(batch_size, metadata.num_rows // (workers * 4))
+        chunks, current, current_rows = [], [], 0
+        for index in range(metadata.num_row_groups):
+            current.append(index)
+            current_rows += metadata.row_group(index).num_rows
+            if current_rows >= target_rows:
+                chunks.append(current)
+                current, current_rows = [], 0
+        if current:
+            chunks.append(current)
+        return chunks
+    size = os.path.getsize(input_path)
+    chunk_bytes = min(MAX_CHUNK_BYTES, max(MIN_CHUNK_BYTES, size // (workers * 4)))
+    return _csv_chunk_ranges(input_path, chunk_bytes)
+
+
+def _transpose(header, rows):
+    columns = {}
+    values = list(zip(*rows)) if rows else [()] * len(header)
+    for name, column in zip(header, values):
+        columns[name] = list(column)
+    return columns
+
+
+def _objects(values):
+    out = np.empty(len(values), dtype=object)
+    out[:] = values
+    return out
+
+
+def _mixed(float_values, int_mask, int_values=0):
+    """Object column of Python floats, with ints where ``int_mask`` is set (as the legacy types are)."""
+    out = _objects(float_values.tolist())
+    if np.any(int_mask):
+        out[int_mask] = int_values if np.isscalar(int_values) else _objects(int_values[int_mask].tolist())
+    return out
+
+
+def _as_ints(float_values):
+    """Python ints equal to ``int(v)`` for truncated float values (non-finite entries become 0)."""
+    float_values = np.where(np.isfinite(float_values), float_values, 0.0)
+    if len(float_values) and np.abs(float_values).max() < 2**62:
+        return float_values.astype(np.int64)
+    return _objects([int(v) for v in float_values.tolist()])
+
+
+def _specific_occupancy_ids(occupancy, stories, basement):
+    """SOID per row (object array) and a mask of rows where building it raises in the legacy engine."""
+    n = len(occupancy)
+    failed = np.zeros(n, dtype=bool)
+    uniques, inverse = np.unique(occupancy.astype(str), return_inverse=True)
+    prefixes = np.array([oc[:1] + oc[-(len(oc) - 3):] if oc != "REL1" else "RE1" for oc in uniques.tolist()], dtype=object)
+    kinds = np.array([oc[:4] for oc in uniques.tolist()], dtype=object)[inverse]
+
+    middle = np.where(stories > 6, "H", np.where(stories > 3, "M", "L")).astype(object)
+    res3 = kinds == "RES3"
+    middle[res3] = np.where(stories[res3] > 4, "5", np.where(stories[res3] > 2, "3", "1"))
+    middle[kinds == "RES2"] = "1"
+    res1 = kinds == "RES1"
+    if res1.any():
+        capped = np.where(stories[res1] > 3.0, 3.0, stories[res1])
+        labels = {}
+        bad = set()
+        for value in np.unique(capped).tolist():
+            try:
+                rounded = round(value)
+            except (OverflowError, ValueError):
+                bad.add(value)
+                continue
+            labels[value] = str(rounded) if value - rounded == 0 else "S"
+        res1_middle = np.array([labels.get(v, "") for v in capped.tolist()], dtype=object)
+        if bad:
+            res1_failed = np.isnan(capped) | np.isinf(capped)
+            failed[np.flatnonzero(res1)[res1_failed]] = True
+        middle[res1] = res1_middle
+
+    suffix = np.where(basement, "B", "N").astype(object)
+    return prefixes[inverse] + middle + suffix, failed
+
+
+def _user_ddf_errors(column, full_ids, qc_warning):
+    """Rows where the legacy user-supplied DDF ID branch raises.
+
+    ``getValue`` turns numeric IDs into floats, which never match the string IDs of the full
+    library, so a user DDF ID is never applied: non-numeric IDs that do match fail on
+    ``int(BID)``, and with QC warnings on the warning message itself fails for IDs >= 1.
+    """
+    text_ids = ~column.numeric
+    errors = text_ids & np.array([text in full_ids for text in column.text.tolist()], dtype=bool)
+    if qc_warning:
+        with np.errstate(invalid="ignore"):
+            errors |= text_ids | (column.numeric & (~np.isfinite(column.value) | (column.value >= 1)))
+    return errors
+
+
+class _RunContext(object):
+    """Per-run settings shared by all batches."""
+
+    def __init__(self, fmap, tables, qc_warning):
+        (
+            self.user_defined_flty_id,
+            self.occupancy_class,
+            self.cost,
+            self.area,
+            self.num_stories,
+            self.foundation_type,
+            self.first_floor_ht,
+            self.content_cost,
+            self.bldg_damage_fn_id,
+            self.cont_damage_fn_id,
+            self.inv_damage_fn_id,
+            self.inv_cost,
+            soi,
+            self.latitude,
+            self.longitude,
+            flc,
+        ) = fmap
+        self.tables = tables
+        self.qc_warning = qc_warning
+        self.required = [
+            self.user_defined_flty_id,
+            self.occupancy_class,
+            self.cost,
+            self.area,
+            self.num_stories,
+            self.foundation_type,
+            self.first_floor_ht,
+            self.latitude,
+            self.longitude,
+        ]
+        self.coastal_kind = None
+        if flc == "CAE":
+            self.coastal_kind = "coastalA"
+        elif flc in ("VE", "V"):
+            self.coastal_kind = "coastalV"
+
+        self.soid_field = "SOID" if soi == "" else soi
+        self.bddf_field = "BDDF_ID" if self.bldg_damage_fn_id == "" else self.bldg_damage_fn_id
+        self.cddf_field = "CDDF_ID" if self.cont_damage_fn_id == "" else self.cont_damage_fn_id
+        self.iddf_field = "IDDF_ID" if self.inv_damage_fn_id == "" else self.inv_damage_fn_id
+        self.new_fields = [
+            "Depth_Grid",
+            "Depth_in_Struc",
+            "flExp",
+            self.soid_field,
+            self.bddf_field,
+            "BldgDmgPct",
+            "BldgLossUSD",
+            "ContentCostUSD",
+            self.cddf_field,
+            "ContDmgPct",
+            "ContentLossUSD",
+            "InventoryCostUSD",
+            self.iddf_field,
+            "InvDmgPct",
+            "InventoryLossUSD",
+            "DebrisID",
+            "Debris_Fin",
+            "Debris_Struc",
+            "Debris_Found",
+            "Debris_Tot",
+            "Restor_Days_Min",
+            "Restor_Days_Max",
+            "GridName",
+        ]
+        # Stage after which the legacy engine has set each output field.
+        self.field_set_after = {
+            "Depth_Grid": _STAGE_COORDS,
+            self.soid_field: _STAGE_OCCUPANCY,
+            "ContentCostUSD": _STAGE_INVENTORY_COST,
+            "InventoryCostUSD": _STAGE_INVENTORY_COST,
+            "flExp": _STAGE_INVENTORY_COST,
+            "Depth_in_Struc": _STAGE_INVENTORY_COST,
+            self.bddf_field: _STAGE_BUILDING,
+            "BldgDmgPct": _STAGE_BUILDING,
+            "BldgLossUSD": _STAGE_BUILDING_LOSS,
+            self.cddf_field: _STAGE_CONTENT,
+            "ContDmgPct": _STAGE_CONTENT,
+            "ContentLossUSD": _STAGE_CONTENT,
+            self.iddf_field: _STAGE_INVENTORY,
+            "InvDmgPct": _STAGE_INVENTORY,
+            "InventoryLossUSD": _STAGE_INVENTORY,
+            "DebrisID": _STAGE_DEBRIS,
+            "Debris_Fin": _STAGE_DEBRIS,
+            "Debris_Struc": _STAGE_DEBRIS,
+            "Debris_Found": _STAGE_DEBRIS,
+            "Debris_Tot": _STAGE_DEBRIS,
+            "Restor_Days_Min": _STAGE_RESTORATION,
+            "Restor_Days_Max": _STAGE_RESTORATION,
+            "GridName": _STAGE_RESTORATION,
+        }
+        # Typed as float64 in Parquet results, next to NUMERIC_OUTPUT_FIELDS.
+        numeric_inputs = [
+            self.cost,
+            self.area,
+            self.num_stories,
+            self.foundation_type,
+            self.first_floor_ht,
+            self.content_cost,
+            self.inv_cost,
+            self.latitude,
+            self.longitude,
+        ]
+        self.numeric_fields = NUMERIC_OUTPUT_FIELDS + [name for name in numeric_inputs if name != ""]
+        # Arrow types of typed Parquet input columns that Parquet results pass through as is.
+        self.input_types = {}
+        # Set once a row passes the required-field check; until then the legacy setValue is undefined.
+        self.set_value_defined = False
+        self._parsed = {}
+
+    def read_input_types(self, input_path):
+        self.input_types = {
+            name: arrow_type
+            for name, arrow_type in _number_input_types(input_path).items()
+            if name not in self.new_fields
+        }
+
+    def begin_batch(self):
+        """Forget the columns parsed for the previous batch."""
+        self._parsed = {}
+
+    def column(self, columns, name, n):
+        # Parsed once per batch, however many grids the batch is evaluated against.
+        parsed = self._parsed.get(name)
+        if parsed is None:
+            raw = columns.get(name)
+            parsed = self._parsed[name] = _Column(raw if raw is not None else [""] * n)
+        return parsed
+
+
+class _BatchResult(object):
+    def __init__(self, n):
+        self.stop = np.full(n, _STAGE_DONE, dtype=np.int64)
+        self.skipped = np.zeros(n, dtype=bool)
+        self.unmatched = np.zeros(n, dtype=bool)
+        self.exposed = np.zeros(n, dtype=bool)
+        self.values = {}
+
+    def fail(self, mask, stage):
+        self.stop[mask & (self.stop == _STAGE_DONE)] = stage
+
+    def alive(self):
+        return self.stop == _STAGE_DONE
+
+
+def _evaluate_batch(columns, n, ctx, grid, grid_name):
+    """Compute every FAST output field for one batch of inventory rows."""
+    tables = ctx.tables
+    result = _BatchResult(n)
+
+    # Required fields: missing values skip the row (Depth_in_Struc = -99999) once setValue
+    # exists; before the first complete row the legacy engine fails on the undefined setValue.
+    missing = np.zeros(n, dtype=bool)
+    for name in ctx.required:
+        if name not in columns:
+            result.fail(np.ones(n, dtype=bool), _STAGE_COORDS)
+            return result
+        missing |= _missing(columns[name])
+    undefined = np.zeros(n, dtype=bool)
+    if not ctx.set_value_defined:
+        passed = np.flatnonzero(~missing)
+        first = passed[0] if len(passed) else n
+        undefined[:first] = True
+        ctx.set_value_defined = len(passed) > 0
+    result.fail(missing & undefined, _STAGE_COORDS)
+    result.skipped = missing & ~undefined
+    result.stop[result.skipped] = _STAGE_COORDS
+
+    lat = ctx.column(columns, ctx.latitude, n)
+    lon = ctx.column(columns, ctx.longitude, n)
+    result.fail(~lat.numeric | ~lon.numeric, _STAGE_COORDS)
+    sample_ok, cell_values, raster_value = grid.sample(lat.value, lon.value, columns)
+    result.fail(~sample_ok, _STAGE_COORDS)
+
+    first_floor = ctx.column(columns, ctx.first_floor_ht, n)
+    result.fail(~first_floor.numeric, _STAGE_FIRST_FLOOR)
+    depth = raster_value - first_floor.value
+
+    occupancy = ctx.column(columns, ctx.occupancy_class, n)
+    foundation = ctx.column(columns, ctx.foundation_type, n)
+    stories = ctx.column(columns, ctx.num_stories, n)
+    area = ctx.column(columns, ctx.area, n)
+    result.fail(occupancy.numeric | ~foundation.numeric | ~stories.numeric | ~area.numeric, _STAGE_OCCUPANCY)
+    oc = np.where(occupancy.numeric, "", occupancy.text)
+    soid, soid_failed = _specific_occupancy_ids(oc, stories.value, foundation.value == 4)
+    result.fail(soid_failed, _STAGE_OCCUPANCY)
+
+    # Content cost: user value unless absent (-1), else Cost x occupancy multiplier.
+    cost = ctx.column(columns, ctx.cost, n)
+    multiplier = np.array([CONTENT_MULTIPLIERS.get(v, 0) for v in oc.tolist()], dtype=np.float64)
+    uses_default_content = np.ones(n, dtype=bool)
+    user_content = np.zeros(n, dtype=np.float64)
+    if ctx.content_cost != "":
+        content = ctx.column(columns, ctx.content_cost, n)
+        result.fail(~content.finite, _STAGE_CONTENT_COST)
+        with np.errstate(invalid="ignore"):
+            user_content = np.trunc(content.value)
+        uses_default_content = user_content == -1
+    result.fail(uses_default_content & ~cost.finite, _STAGE_CONTENT_COST)
+    truncated_cost = np.trunc(np.where(cost.finite, cost.value, 0.0))
+    content_cost = np.where(uses_default_content, truncated_cost * multiplier, user_content)
+    content_cost_is_int = ~uses_default_content | (multiplier == 0)
+
+    # Inventory cost: Hazus sales x inventory share x area for inventory occupancies, else the user value.
+    with_inventory = np.isin(oc, INVENTORY_OCCUPANCIES)
+    inv_value = np.full(n, -1.0)
+    inv_numeric = np.ones(n, dtype=bool)
+    if ctx.inv_cost != "":
+        inventory = ctx.column(columns, ctx.inv_cost, n)
+        inv_value = inventory.value
+        inv_numeric = inventory.numeric
+    default_inventory = with_inventory & inv_numeric & (inv_value == -1)
+    result.fail(~inv_numeric & ~default_inventory, _STAGE_INVENTORY_COST)
+    params = np.array(
+        [tables.inventory_value.get(v, (np.nan, np.nan)) for v in oc.tolist()], dtype=np.float64
+    ).reshape(n, 2)
+    result.fail(default_inventory & np.isnan(params[:, 0]), _STAGE_INVENTORY_COST)
+    with np.errstate(invalid="ignore"):
+        user_inventory = inv_numeric & ~default_inventory & (inv_value > -1)
+    inventory_cost = np.where(
+        default_inventory,
+        params[:, 0] * params[:, 1] * area.value / 100,
+        np.where(user_inventory, inv_value, 0.0),
+    )
+    inventory_cost_is_int = ~default_inventory & ~user_inventory
+
+    # Exposure is decided on the raster value; NaN compares False and counts as exposed.
+    with np.errstate(invalid="ignore"):
+        exposed = ~(raster_value <= 0)
+    result.exposed = exposed
+    result.fail(exposed & np.isnan(depth), _STAGE_DEPTH)
+    clamped = np.clip(np.nan_to_num(depth, nan=0.0), MIN_DEPTH, MAX_DEPTH)
+
+    # Only exposed rows go through the DDF, debris and restoration lookups; a dry row's fields
+    # from here on are constants (0, "" or None), so the work follows the flooded buildings
+    # rather than every building on the grid. Arrays named *_x hold the exposed rows only.
+    wet_rows = np.flatnonzero(exposed)
+    m = len(wet_rows)
+    oc_x = oc[wet_rows]
+    soid_x = soid[wet_rows]
+    clamped_x = clamped[wet_rows]
+    lower_index, upper_index, frac = depth_breakpoints(clamped_x)
+    is_res = np.array([v[:3] == "RES" for v in oc_x.tolist()], dtype=bool)
+
+    def _spread(mask_x):
+        mask = np.zeros(n, dtype=bool)
+        mask[wet_rows] = mask_x
+        return mask
+
+    def _default_ddf(kind_tables, full_ids, user_column_name):
+        user_column = ctx.column(columns, user_column_name, n).take(wet_rows) if user_column_name != "" else None
+        errors = (
+            _user_ddf_errors(user_column, full_ids, ctx.qc_warning)
+            if user_column is not None
+            else np.zeros(m, dtype=bool)
+        )
+        index = kind_tables["riverine"].lookup(soid_x)
+        table_of_row = np.zeros(m, dtype=np.int64)
+        tables_in_use = [kind_tables["riverine"]]
+        if ctx.coastal_kind is not None:
+            coastal = kind_tables[ctx.coastal_kind]
+            index = np.where(is_res, coastal.lookup(soid_x), index)
+            table_of_row = np.where(is_res, 1, 0)
+            tables_in_use.append(coastal)
+        damage = np.zeros(n, dtype=np.float64)
+        ddf_ids = np.empty(n, dtype=object)
+        ddf_ids[:] = 0
+        for t, table in enumerate(tables_in_use):
+            rows = (table_of_row == t) & (index >= 0)
+            if rows.any():
+                picked = index[rows]
+                damage[wet_rows[rows]] = table.interpolate(picked, lower_index[rows], upper_index[rows], frac[rows])
+                ddf_ids[wet_rows[rows]] = table.ids[picked]
+        ddf_ids[wet_rows[index < 0]] = ""
+        return _spread(errors), _spread(index >= 0), damage, ddf_ids
+
+    # Building
+    errors, matched, building_damage, building_ids = _default_ddf(
+        tables.building, tables.building_full.index, ctx.bldg_damage_fn_id
+    )
+    result.fail(exposed & errors, _STAGE_BUILDING)
+    unmatched = exposed & ~matched & result.alive()
+    result.unmatched = unmatched
+    result.stop[unmatched] = _STAGE_BUILDING
+    result.fail(exposed & ~cost.finite, _STAGE_BUILDING_LOSS)
+    building_loss = building_damage * truncated_cost
+
+    # Content
+    errors, matched, content_damage, content_ids = _default_ddf(
+        tables.content, tables.content_full.index, ctx.cont_damage_fn_id
+    )
+    result.fail(exposed & (errors | ~matched), _STAGE_CONTENT)
+    content_loss = content_damage * content_cost
+
+    # Inventory (riverine table only, and only for inventory occupancies)
+    inv_errors = (
+        _user_ddf_errors(
+            ctx.column(columns, ctx.inv_damage_fn_id, n).take(wet_rows), tables.inventory_full.index, ctx.qc_warning
+        )
+        if ctx.inv_damage_fn_id != ""
+        else np.zeros(m, dtype=bool)
+    )
+    with_inventory_x = with_inventory[wet_rows]
+    inv_index = tables.inventory.lookup(soid_x)
+    result.fail(_spread(inv_errors | (with_inventory_x & (inv_index < 0))), _STAGE_INVENTORY)
+    inventory_damage = np.zeros(n, dtype=np.float64)
+    inventory_ids = np.empty(n, dtype=object)
+    inventory_ids[:] = 0
+    rows = with_inventory_x & (inv_index >= 0)
+    if rows.any():
+        picked = inv_index[rows]
+        inventory_damage[wet_rows[rows]] = tables.inventory.interpolate(
+            picked, lower_index[rows], upper_index[rows], frac[rows]
+        )
+        inventory_ids[wet_rows[rows]] = tables.inventory.ids[picked]
+    with np.errstate(invalid="ignore"):
+        inventory_loss = inventory_damage * inventory_cost
+
+    # Debris and restoration only for a positive depth in structure.
+    wet_x = clamped_x > 0
+    wet = _spread(wet_x)
+    foundation_x = foundation.value[wet_rows]
+    basement_table = np.isin(oc_x, ["RES1", "COM6"]) & (foundation_x == 4)
+    bsm = np.where(basement_table & (oc_x == "RES1"), "B", "NB").astype(object)
+    fnd = np.where((foundation_x == 4) | (foundation_x == 7), "SG", "FT").astype(object)
+    basement_suffix = np.select(
+        [clamped_x < -4, clamped_x < 0, clamped_x < 4, clamped_x < 6, clamped_x < 8], ["-8", "-4", "0", "4", "6"], "8"
+    )
+    other_suffix = np.select([clamped_x < 1, clamped_x < 4, clamped_x < 8, clamped_x < 12], ["0", "1", "4", "8"], "12")
+    dsuf = np.where(basement_table, basement_suffix, other_suffix).astype(object)
+    dsuf[(oc_x == "RES2") & (clamped_x < 0)] = ""
+    debris_key = oc_x.astype(object) + bsm + fnd + dsuf
+    debris_index = map_keys(debris_key, tables.debris_index)
+    result.fail(_spread(wet_x & (debris_index < 0)), _STAGE_DEBRIS)
+    rates = tables.debris_rates[debris_index]
+    area_x = area.value[wet_rows]
+    debris_fin = area_x * rates[:, 0] / 1000
+    debris_struc = area_x * rates[:, 1] / 1000
+    debris_found = area_x * rates[:, 2] / 1000
+    debris_tot = debris_fin + debris_struc + debris_found
+
+    rest_suffix = np.select(
+        [clamped_x < 0, clamped_x < 1, clamped_x < 4, clamped_x < 8, clamped_x < 12], ["0", "1", "4", "8", "12"], "24"
+    ).astype(object)
+    rest_index = map_keys(oc_x.astype(object) + rest_suffix, tables.restoration_index)
+    result.fail(_spread(wet_x & (rest_index < 0)), _STAGE_RESTORATION)
+
+    # Assemble output columns with the legacy value types.
+    dry = ~exposed
+    values = result.values
+    values["Depth_Grid"] = cell_values
+    depth_out = _objects(depth.tolist())
+    depth_out[result.skipped] = -99999
+    values["Depth_in_Struc"] = depth_out
+    values["flExp"] = _objects(exposed.astype(np.int64).tolist())
+    soid_out = soid.copy()
+    values[ctx.soid_field] = soid_out
+
+    ids = building_ids
+    ids[result.unmatched] = "Unmatched"
+    values[ctx.bddf_field] = ids
+    values["BldgDmgPct"] = _mixed(building_damage * 100, dry)
+    values["BldgLossUSD"] = _mixed(building_loss, dry)
+
+    user_content_rows = content_cost_is_int & ~uses_default_content
+    values["ContentCostUSD"] = _mixed(
+        content_cost, user_content_rows, _as_ints(np.where(user_content_rows, content_cost, 0.0))
+    )
+    values["ContentCostUSD"][content_cost_is_int & uses_default_content] = 0
+    values[ctx.cddf_field] = content_ids
+    values["ContDmgPct"] = _mixed(content_damage * 100, dry)
+    values["ContentLossUSD"] = _mixed(content_loss, dry)
+
+    values["InventoryCostUSD"] = _mixed(inventory_cost, inventory_cost_is_int)
+    values[ctx.iddf_field] = inventory_ids
+    values["InvDmgPct"] = _mixed(inventory_damage * 100, dry | ~with_inventory)
+    # 0 * cost stays an int only when both factors are ints (no inventory DDF and no cost).
+    values["InventoryLossUSD"] = _mixed(inventory_loss, dry | (~with_inventory & inventory_cost_is_int))
+
+    debris_ids = _objects([None] * n)
+    debris_ids[wet] = debris_key[wet_x]
+    debris_ids[dry] = ""
+    values["DebrisID"] = debris_ids
+    for name, amount in (
+        ("Debris_Fin", debris_fin),
+        ("Debris_Struc", debris_struc),
+        ("Debris_Found", debris_found),
+        ("Debris_Tot", debris_tot),
+    ):
+        column = _objects([None] * n)
+        column[wet] = _objects(amount[wet_x].tolist())
+        values[name] = column
+
+    days = np.zeros((n, 2), dtype=tables.restoration_days.dtype)
+    days[wet_rows] = tables.restoration_days[rest_index]
+    values["Restor_Days_Min"] = _objects(np.where(wet, days[:, 0], 0).tolist())
+    values["Restor_Days_Max"] = _objects(np.where(wet, days[:, 1], 0).tolist())
+    values["GridName"] = _objects([grid_name] * n)
+    return result
+
+
+def _output_columns(columns, n, ctx, result, field_names):
+    """Merge input and computed columns into the legacy DictWriter column order."""
+    merged = {}
+    for name, values in columns.items():
+        merged[name] = values
+    for name in ctx.new_fields:
+        if name not in result.values:
+            continue
+        if name == "Depth_in_Struc":
+            ready = (result.stop > _STAGE_INVENTORY_COST) | result.skipped
+        elif name == ctx.soid_field:
+            ready = (result.stop > _STAGE_OCCUPANCY) & ~result.skipped
+        else:
+            ready = result.stop > ctx.field_set_after[name]
+        fallback = columns.get(name)
+        if isinstance(fallback, _NumberInput):
+            fallback = fallback.objects()
+        column = np.empty(n, dtype=object)
+        column[:] = fallback if fallback is not None else [None] * n
+        column[ready] = result.values[name][ready]
+        if name == ctx.bddf_field:
+            column[result.unmatched] = "Unmatched"
+        merged[name] = column
+    return [merged[name] if name in merged else [None] * n for name in field_names]
+
+
+class _GridTally(object):
+    """Row counts for one depth grid, as reported in the end-of-run summary."""
+
+    def __init__(self, path):
+        self.path = path
+        self.grid_name = os.path.split(path)[1]
+        self.processed = 0
+        self.errors = 0
+        self.flooded = 0
+        self.unmatched = 0
+        self.set_value_defined = False
+        self.row_errors = []
+
+    def evaluate(self, columns, n, ctx, grid):
+        ctx.set_value_defined = self.set_value_defined
+        with np.errstate(invalid="ignore", over="ignore", divide="ignore"):
+            result = _evaluate_batch(columns, n, ctx, grid, self.grid_name)
+        self.set_value_defined = ctx.set_value_defined
+        return result
+
+    def record(self, result, n):
+        """Count a batch and queue its failing rows; returns the mask of fully successful rows."""
+        errors = (result.stop < _STAGE_DONE) & ~result.skipped & ~result.unmatched
+        success = (result.stop == _STAGE_DONE) & ~result.skipped
+        for i in np.flatnonzero(errors):
+            self.row_errors.append((self.processed + i + 1, _STAGE_ERRORS.get(int(result.stop[i]), "invalid record")))
+        self.processed += n
+        self.errors += int(errors.sum())
+        self.unmatched += int(result.unmatched.sum())
+        self.flooded += int((success & result.exposed).sum())
+        return success
+
+    def report(self):
+        """Print the queued row errors to stderr, like the row-by-row engine does."""
+        for num, reason in self.row_errors:
+            print("FAST row error: record {num}: {reason}".format(num=num, reason=reason), file=sys.stderr)
+        self.row_errors = []
+
+    def absorb(self, chunk):
+        """Add the tally of the next input chunk, renumbering its rows after ours."""
+        for num, reason in chunk.row_errors:
+            self.row_errors.append((self.processed + num, reason))
+        self.processed += chunk.processed
+        self.errors += chunk.errors
+        self.flooded += chunk.flooded
+        self.unmatched += chunk.unmatched
+        self.report()
+
+    def summary(self, output_path):
+        return [self.processed, self.errors, self.flooded, self.unmatched, self.grid_name, output_path]
+
+
+def _finish_results(table, results_file):
+    """Add the ``_sorted.csv`` companion of a CSV table; Parquet results are left as written."""
+    if isinstance(table, CsvResults):
+        _write_sorted_results(table.path, results_file)
+    elif isinstance(table, ArrowResults):
+        logger.info("Results kept in memory as " + os.path.basename(table.path))
+    else:
+        logger.info("Results saved into " + table.path)
+
+
+def _run_per_grid(
+    UDFOrig, ResultsDir, DepthGrids, ctx, field_names, batch_size, results_format, depth_column=None
+):
+    """One inventory pass and one result table per grid, exactly like the row-by-row engine."""
+    log = []
+    written = []
+    UDFRoot = os.path.basename(UDFOrig)
+    for dgp in DepthGrids:
+        tally = _GridTally(dgp)
+        ResultsFile = os.path.join(ResultsDir, UDFRoot.split(".")[0] + "_" + tally.grid_name.split(".")[0])
+        # Like the legacy engine, each grid appends the output fields to the running header.
+        field_names = field_names + ctx.new_fields
+        with _open_grid(dgp, depth_column) as grid:
+            table = open_results(results_format, ResultsFile, field_names, ctx.numeric_fields, ctx.input_types)
+            try:
+                for columns, n, overflow in _iter_input_batches(UDFOrig, batch_size):
+                    ctx.begin_batch()
+                    result = tally.evaluate(columns, n, ctx, grid)
+                    first_batch = tally.processed == 0
+                    success = tally.record(result, n)
+                    tally.report()
+                    if first_batch and n > 0 and success[0]:
+                        table.write_header()
+                    table.write_columns([_output_columns(columns, n, ctx, result, field_names)])
+                    if overflow:
+                        raise ValueError("dict contains fields not in fieldnames: None")
+            finally:
+                table.close()
+
+        logger.info("Loss calculations complete for the selected grid...")
+        _finish_results(table, ResultsFile)
+        log.append(tally.summary(table.path))
+        written.append(table)
+    return log, written
+
+
+def _run_single_pass(
+    UDFOrig, ResultsDir, DepthGrids, ctx, field_names, batch_size, results_format, depth_column=None
+):
+    """Read the inventory once and evaluate every batch against all grids.
+
+    Writes one long table, ``<inventory>_all_grids.csv``, with one row per building and grid:
+    each building's rows are adjacent, in the order the grids were given, and are told apart
+    by the GridName column.
+    """
+    ResultsFile = os.path.join(ResultsDir, os.path.basename(UDFOrig).split(".")[0] + "_all_grids")
+    field_names = field_names + ctx.new_fields
+    tallies = [_GridTally(dgp) for dgp in DepthGrids]
+    grids = []
+    try:
+        for dgp in DepthGrids:
+            grids.append(_open_grid(dgp, depth_column))
+        table = open_results(results_format, ResultsFile, field_names, ctx.numeric_fields, ctx.input_types)
+        try:
+            table.write_header()
+            for columns, n, overflow in _iter_input_batches(UDFOrig, batch_size):
+                ctx.begin_batch()
+                column_sets = []
+                for tally, grid in zip(tallies, grids):
+                    result = tally.evaluate(columns, n, ctx, grid)
+                    tally.record(result, n)
+                    tally.report()
+                    column_sets.append(_output_columns(columns, n, ctx, result, field_names))
+                table.write_columns(column_sets)
+                if overflow:
+                    raise ValueError("dict contains fields not in fieldnames: None")
+        finally:
+            table.close()
+    finally:
+        for grid in grids:
+            grid.close()
+
+    logger.info("Loss calculations complete for %d grids in one pass...", len(tallies))
+    _finish_results(table, ResultsFile)
+    return [tally.summary(table.path) for tally in tallies], [table]
+
+
+def _output_tables(UDFOrig, ResultsDir, DepthGrids, field_names, new_fields, single_pass):
+    """``(results_file, header)`` of every table a run writes, as the serial paths name them."""
+    stem = os.path.basename(UDFOrig).split(".")[0]
+    if single_pass:
+        return [(os.path.join(ResultsDir, stem + "_all_grids"), field_names + new_fields)]
+    tables = []
+    for dgp in DepthGrids:
+        field_names = field_names + new_fields
+        tables.append((os.path.join(ResultsDir, stem + "_" + os.path.split(dgp)[1].split(".")[0]), field_names))
+    return tables
+
+
+class _ChunkOutput(object):
+    """The rows and counts one input chunk produced, ready to be appended in input order."""
+
+    def __init__(self, tallies, table_count):
+        self.tallies = tallies
+        self.payloads = [None] * table_count
+        self.first_success = [None] * len(tallies)
+        self.set_value_defined = False
+        self.overflow = False
+
+
+class _ChunkEvaluator(object):
+    """Warm per-process state for evaluating input chunks: compiled LUTs and open rasters."""
+
+    def __init__(
+        self,
+        UDFOrig,
+        LUT_Dir,
+        DepthGrids,
+        QC_Warning,
+        fmap,
+        headers,
+        single_pass,
+        batch_size,
+        results_format,
+        depth_column=None,
+    ):
+        self.input_path = UDFOrig
+        self.grid_paths = list(DepthGrids)
+        self.headers = headers
+        self.single_pass = single_pass
+        self.batch_size = batch_size
+        self.results_format = results_format
+        # compile_lookup_tables loads the on-disk cache, so every worker shares one compile.
+        self.ctx = _RunContext(fmap, compile_lookup_tables(LUT_Dir), QC_Warning.lower() == "true")
+        self.ctx.read_input_types(UDFOrig)
+        self.grids = []
+        for path in self.grid_paths:
+            self.grids.append(_open_grid(path, depth_column))
+
+    def close(self):
+        for grid in self.grids:
+            grid.close()
+
+    def evaluate(self, chunk, set_value_defined):
+        """Evaluate one chunk against every grid, assuming ``set_value_defined`` on entry."""
+        tallies = [_GridTally(path) for path in self.grid_paths]
+        for tally in tallies:
+            tally.set_value_defined = set_value_defined
+        output = _ChunkOutput(tallies, len(self.headers))
+        tables = [
+            open_results(self.results_format, None, header, self.ctx.numeric_fields, self.ctx.input_types)
+            for header in self.headers
+        ]
+        for columns, n, overflow in _iter_input_batches(self.input_path, self.batch_size, chunk):
+            self.ctx.begin_batch()
+            column_sets = []
+            for index, (tally, grid) in enumerate(zip(tallies, self.grids)):
+                result = tally.evaluate(columns, n, self.ctx, grid)
+                success = tally.record(result, n)
+                if n > 0 and output.first_success[index] is None:
+                    output.first_success[index] = bool(success[0])
+                header = self.headers[0 if self.single_pass else index]
+                column_sets.append(_output_columns(columns, n, self.ctx, result, header))
+            if self.single_pass:
+                tables[0].write_columns(column_sets)
+            else:
+                for table, columns_out in zip(tables, column_sets):
+                    table.write_columns([columns_out])
+            if overflow:
+                output.overflow = True
+                break
+        output.payloads = [table.payload() for table in tables]
+        output.set_value_defined = tallies[0].set_value_defined if tallies else set_value_defined
+        return output
+
+
+def _remove_tables(tables):
+    for table in tables:
+        table.close()
+        if os.path.exists(table.path):
+            os.remove(table.path)
+
+
+_worker_evaluator = None
+
+
+def _init_worker(*args):
+    global _worker_evaluator
+    _worker_evaluator = _ChunkEvaluator(*args)
+
+
+def _evaluate_in_worker(chunk, set_value_defined):
+    return _worker_evaluator.evaluate(chunk, set_value_defined)
+
+
+def _run_parallel(
+    UDFOrig,
+    LUT_Dir,
+    ResultsDir,
+    DepthGrids,
+    QC_Warning,
+    fmap,
+    ctx,
+    field_names,
+    batch_size,
+    single_pass,
+    workers,
+    results_format,
+    depth_column=None,
+):
+    """Evaluate inventory chunks on a process pool and append their rows in input order.
+
+    Writes the same tables as the serial paths. Each chunk is evaluated against every grid
+    by one worker; the parent writes finished chunks strictly in input order, so the files
+    do not depend on scheduling. A worker assumes some earlier row already passed the
+    required-field check (true for every real inventory); a chunk for which that turns out
+    to be false is re-evaluated here with the correct state.
+    """
+    tables = _output_tables(UDFOrig, ResultsDir, DepthGrids, field_names, ctx.new_fields, single_pass)
+    headers = [header for _, header in tables]
+    init_args = (
+        UDFOrig,
+        LUT_Dir,
+        DepthGrids,
+        QC_Warning,
+        fmap,
+        headers,
+        single_pass,
+        batch_size,
+        results_format,
+        depth_column,
+    )
+    chunks = _plan_chunks(UDFOrig, workers, batch_size)
+    logger.info("Evaluating %d input chunks on %d worker processes...", len(chunks), workers)
+
+    # The local evaluator opens every input up front (so bad paths fail with a clear error)
+    # and re-runs chunks whose set_value_defined assumption was wrong.
+    local = _ChunkEvaluator(*init_args)
+    tallies = [_GridTally(dgp) for dgp in DepthGrids]
+    files = []
+    try:
+        for results_file, header in tables:
+            files.append(open_results(results_format, results_file, header, ctx.numeric_fields, ctx.input_types))
+        if single_pass:
+            files[0].write_header()
+        set_value_defined = False
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            pending = deque()
+            remaining = iter(enumerate(chunks))
+            for index, chunk in islice(remaining, 2 * workers):
+                pending.append((chunk, index > 0, pool.submit(_evaluate_in_worker, chunk, index > 0)))
+            while pending:
+                chunk, assumed, future = pending.popleft()
+                output = future.result()
+                for index, chunk_next in islice(remaining, 1):
+                    pending.append((chunk_next, True, pool.submit(_evaluate_in_worker, chunk_next, True)))
+                if assumed != set_value_defined:
+                    output = local.evaluate(chunk, set_value_defined)
+                set_value_defined = output.set_value_defined
+
+                for index, (tally, chunk_tally) in enumerate(zip(tallies, output.tallies)):
+                    # Per-grid tables get a header only if the inventory's first row succeeds.
+                    if not single_pass and tally.processed == 0 and output.first_success[index]:
+                        files[index].write_header()
+                    tally.absorb(chunk_tally)
+                for table, payload in zip(files, output.payloads):
+                    table.append(payload)
+                if output.overflow:
+                    raise ValueError("dict contains fields not in fieldnames: None")
+    except Exception:
+        # A serial per-grid run stops inside the first grid; drop the tables it never starts.
+        _remove_tables(files[1:])
+        raise
+    finally:
+        for file_out in files:
+            file_out.close()
+        local.close()
+
+    logger.info("Loss calculations complete for %d grids on %d workers...", len(tallies), workers)
+    for index, (results_file, _) in enumerate(tables):
+        try:
+            _finish_results(files[index], results_file)
+        except Exception:
+            _remove_tables(files[index + 1 :])
+            raise
+    if single_pass:
+        log = [tally.summary(files[0].path) for tally in tallies]
+    else:
+        log = [tally.summary(table.path) for tally, table in zip(tallies, files)]
+    return log, files
+
+
+def flood_damage_vectorized(
+    UDFOrig,
+    LUT_Dir,
+    ResultsDir,
+    DepthGrids,
+    QC_Warning,
+    fmap,
+    batch_size=DEFAULT_BATCH_SIZE,
+    single_pass=False,
+    workers=1,
+    results_format="csv",
+    lookup_tables=None,
+    depth_column=None,
+):
+    """Vectorized equivalent of ``hazus_notinuse.flood_damage`` with the same arguments and result.
+
+    With ``single_pass`` the inventory is read once for all ``DepthGrids`` and the results go
+    to a single long table with a GridName column instead of one CSV per grid. ``workers``
+    above 1 splits the inventory into chunks evaluated on a process pool; the files written
+    are the same as with one worker. ``results_format="parquet"`` writes each table as typed
+    Parquet (``fast_results.ParquetResults``) with no ``_sorted`` companion; ``"arrow"`` writes
+    nothing and adds a fourth result item, ``{table name: pyarrow.Table}``. ``lookup_tables``
+    reuses an already compiled ``fast_lut.LookupTables``. ``depth_column`` names an inventory
+    column holding each building's depth grid value, sampled upstream (e.g. by
+    ``scripts/duckdb_fast_pipeline.py --sample-depth``); the single depth grid path then only
+    names the grid and is not read.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1.")
+    if results_format not in RESULTS_FORMATS:
+        raise ValueError("results_format must be one of: {formats}".format(formats=", ".join(RESULTS_FORMATS)))
+    if len(logger.handlers) == 0:
+        _configure_logger(project_root=_resolve_project_root())
+
+    logger.info("\n")
+    logger.info("Calculation FL Building & Content Losses (vectorized engine)...")
+    try:
+        start_time = time.time()
+        qc_warning = QC_Warning.lower() == "true"
+        field_names = _get_input_field_names(UDFOrig)
+        if depth_column:
+            if len(DepthGrids) != 1:
+                raise ValueError("depth_column holds the values of exactly one depth grid.")
+            if depth_column not in field_names:
+                raise ValueError("depth column {name} is not in the inventory.".format(name=depth_column))
+        if lookup_tables is None:
+            lookup_tables = compile_lookup_tables(LUT_Dir)
+        ctx = _RunContext(fmap, lookup_tables, qc_warning)
+        ctx.read_input_types(UDFOrig)
+
+        if workers > 1:
+            log, written = _run_parallel(
+                UDFOrig,
+                LUT_Dir,
+                ResultsDir,
+                DepthGrids,
+                QC_Warning,
+                fmap,
+                ctx,
+                field_names,
+                batch_size,
+                single_pass,
+                workers,
+                results_format,
+                depth_column,
+            )
+        else:
+            run = _run_single_pass if single_pass else _run_per_grid
+            log, written = run(
+                UDFOrig, ResultsDir, DepthGrids, ctx, field_names, batch_size, results_format, depth_column
+            )
+        row_error_count = sum(entry[1] for entry in log)
+
+        logger.info("Vectorized engine finished in %.2f s", time.time() - start_time)
+        if results_format == "arrow":
+            message = _format_grid_summary(log, written[-1].path, saved_to="\n Results kept in memory as: ")
+            return (True, message, row_error_count, {os.path.basename(table.path): table.table() for table in written})
+        message = _format_grid_summary(log, written[-1].path)
+        return (True, message, row_error_count)
+    except Exception as e:
+        logger.info(e)
+        print(f"FAST fatal error: {e}", file=sys.stderr)
+        return (False, str(e), 0)
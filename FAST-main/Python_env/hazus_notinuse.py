@@ -70,13 +70,13 @@
 
 # UKS - all logging statements added
 import logging
-import os, csv, sys, time, math, datetime, subprocess, numpy as np, utm
-import rasterio
+import os, csv, sys, time, math, datetime
 
-try:
-    import pyarrow.parquet as pq
-except Exception:
-    pq = None
+# Damage engines selectable through local_with_options (shared with run_fast.py).
+from fast_options import ENGINES
+
+# numpy, rasterio (fast_raster) and pyarrow are imported by the functions that use them, so
+# importing this module, building a field map or rejecting bad arguments stays cheap.
 
 
 logger = logging.getLogger("FAST")
@@ -210,8 +210,13 @@ def _normalize_input_value(value):
         if stripped.lower() in ("nan", "none", "null"):
             return ""
         return stripped
+    if type(value) in (int, float):
+        return "" if value != value else str(value)
     if isinstance(value, float) and math.isnan(value):
         return ""
+    # Only numpy scalars are left to tell apart; they exist only once numpy is loaded.
+    import numpy as np
+
     if isinstance(value, np.floating) and np.isnan(value):
         return ""
     if isinstance(value, bytes):
@@ -223,12 +228,17 @@ def _normalize_input_value(value):
     return str(value).strip()
 
 
+def _parquet_module():
+    try:
+        import pyarrow.parquet as pq
+    except Exception:
+        raise RuntimeError("pyarrow is required for parquet input support.")
+    return pq
+
+
 def _get_input_field_names(input_path):
     if _is_parquet_input(input_path):
-        if pq is None:
-            raise RuntimeError("pyarrow is required for parquet input support.")
-        parquet_file = pq.ParquetFile(input_path)
-        return parquet_file.schema.names
+        return _parquet_module().ParquetFile(input_path).schema.names
     with open(input_path, "r", newline="") as f:
         reader = csv.reader(f)
         return next(reader)
@@ -236,9 +246,7 @@ def _get_input_field_names(input_path):
 
 def _iter_input_rows(input_path):
     if _is_parquet_input(input_path):
-        if pq is None:
-            raise RuntimeError("pyarrow is required for parquet input support.")
-        parquet_file = pq.ParquetFile(input_path)
+        parquet_file = _parquet_module().ParquetFile(input_path)
         for batch in parquet_file.iter_batches(batch_size=4096):
             data = batch.to_pydict()
             cols = list(data.keys())
@@ -256,18 +264,59 @@ def _iter_input_rows(input_path):
                 yield normalized_row
 
 
+def _write_sorted_results(output_csv, results_file):
+    """Write ``<results_file>_sorted.csv``: the result rows ordered by Depth_in_Struc, deepest first.
+
+    Uses fast_sort's external merge sort, so memory stays bounded however large the output is.
+    """
+    from fast_sort import sort_results_csv
+
+    logger.info("Sorting reults by Depth in structure...")
+    logger.info("Results saved into " + results_file + ".csv")
+    sort_results_csv(output_csv, results_file + "_sorted.csv")
+
+
+def _format_grid_summary(log, output_csv, saved_to="\n File saved to: "):
+    """Build the end-of-run message from per-grid ``[processed, errors, flooded, unmatched, grid, file]`` entries."""
+    message = ""
+    for grid in log:  # CBH
+        message += (
+            "For depth-grid: "
+            + str(grid[4])
+            + "\n"
+            + str(grid[0])
+            + " records processed of "
+            + str(grid[1])
+            + " records total.\n"
+            + "Total records with flooding: "
+            + str(grid[2])
+            + "\n"
+            + "Total number of records with unmatched Specific Occupancy IDs found: "
+            + str(grid[3])
+            + saved_to
+            + os.path.realpath(os.path.join(os.path.dirname(output_csv), str(grid[5])))
+            + "\n\n"
+        )  # UKS - modified for complete file name #CBH - change added 8/28/19
+    return message
+
+
 #########################################################################################################
 # Main function. Five parameters See end for main procedure.
 #########################################################################################################
 
 
-def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
+def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap, lookup_tables=None):
     log = []  # CBH
     # UDFOrig = USer-supplied UDF input file. Full pathname required
     # LUT_Dir = folder name where the Lookup table libraries reside
     # ResultsDir = Where the output file geodatabase will be created. Folder (dir) must exist, else fail
     # DepthGrids = one or more flood depth grids
     # QC_Warning = Boolean, report on informative inconsistency observations if selected, otherwise suppress them
+    # lookup_tables = optional fast_lut.LookupTables already compiled from LUT_Dir (e.g. by a warm service worker)
+    import numpy as np
+
+    from fast_lut import compile_lookup_tables
+    from fast_raster import DepthRaster
 
     if len(logger.handlers) == 0:
         _configure_logger(project_root=_resolve_project_root())
@@ -403,40 +452,29 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
         Debris = os.path.join(LUT_Dir, DebrisX)
         Rest = os.path.join(LUT_Dir, RestFnc)
 
-        # Process the look-up tables into a list of Dictionary elements
+        # Compile the look-up tables (fast_lut): every table keeps its rows as Dictionary elements,
+        # plus a hash index on its key column so each lookup below is a dict hit instead of a scan.
         # Note the standard (default) Lookup Tables were separately developed.
         # Yes, they are a subset of the full lookup table
-        bddf_lut_riverine = [row for row in csv.DictReader(open(BRP))]
-        bddf_lut_coastalA = [row for row in csv.DictReader(open(BCAP))]
-        bddf_lut_coastalV = [row for row in csv.DictReader(open(BCVP))]
-        bddf_lut_full = [row for row in csv.DictReader(open(BFP))]
-
-        cddf_lut_riverine = [row for row in csv.DictReader(open(CRP))]
-        cddf_lut_coastalA = [row for row in csv.DictReader(open(CCAP))]
-        cddf_lut_coastalV = [row for row in csv.DictReader(open(CCVP))]
-        cddf_lut_full = [row for row in csv.DictReader(open(CFP))]
-
-        iddf_lut_riverine = [row for row in csv.DictReader(open(IRP))]
-        iddf_lut_full = [row for row in csv.DictReader(open(IFP))]
-        iecon_lut = [row for row in csv.DictReader(open(IEP))]
-
-        debris_lut = [row for row in csv.DictReader(open(Debris))]
-        rest_lut = [row for row in csv.DictReader(open(Rest))]
-
-        # Build up lists to use for checking legitimate user-supplied DDF_ID values
-        bddf_lut_full_list = []
-        cddf_lut_full_list = []
-        iddf_lut_full_list = []
-        for x in bddf_lut_full:
-            bddf_lut_full_list.append(
-                x["BldgDmgFnID"]
-            )  # Yes, the capitalization is due to a quirk in the [dbo].[flBldgStructDmgFn].
-        for x in cddf_lut_full:
-            cddf_lut_full_list.append(
-                x["ContDmgFnId"]
-            )  # Yes, the case is inconsistent with Building column name. That's the way the Hazus database is.
-        for x in iddf_lut_full:
-            iddf_lut_full_list.append(x["InvDmgFnId"])
+        luts = lookup_tables if lookup_tables is not None else compile_lookup_tables(LUT_Dir)
+        bddf_lut_riverine = luts.building["riverine"]
+        bddf_lut_coastalA = luts.building["coastalA"]
+        bddf_lut_coastalV = luts.building["coastalV"]
+        bddf_lut_full = luts.building_full
+
+        cddf_lut_riverine = luts.content["riverine"]
+        cddf_lut_coastalA = luts.content["coastalA"]
+        cddf_lut_coastalV = luts.content["coastalV"]
+        cddf_lut_full = luts.content_full
+
+        iddf_lut_riverine = luts.inventory
+        iddf_lut_full = luts.inventory_full
+
+        # Indexes used for checking legitimate user-supplied DDF_ID values.
+        # Yes, the capitalization of the key columns differs (BldgDmgFnID / ContDmgFnId / InvDmgFnId). That's the way the Hazus database is.
+        bddf_lut_full_list = bddf_lut_full.index
+        cddf_lut_full_list = cddf_lut_full.index
+        iddf_lut_full_list = iddf_lut_full.index
 
         Content_x_0p5 = [
             "RES1",
@@ -580,28 +618,7 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
             file_out = open(outputDir, "w")
 
             print(dgp)
-            _raster_src = rasterio.open(dgp)
-
-            noData = _raster_src.nodata
-            cols = _raster_src.width
-            rows = _raster_src.height
-            _t = _raster_src.transform
-            xOrigin = _t.c
-            yOrigin = _t.f
-            pixelWidth = _t.a
-            pixelHeight = -_t.e
-            data = _raster_src.read(1)
-            logger.debug(
-                "Loaded raster band with shape %s and dtype %s",
-                getattr(data, "shape", None),
-                getattr(data, "dtype", None),
-            )
-
-            IsUTM = (
-                _raster_src.crs is not None and _raster_src.crs.is_projected and _raster_src.crs.linear_units == "metre"
-            )
-            _raster_src.close()
-            logger.debug("Is raster in projected UTM coordinates? %s", IsUTM)
+            depth_raster = DepthRaster(dgp)
 
             """
             inProj = Proj(init='epsg:3857')
@@ -666,18 +683,13 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
                             else:
                                 X = float(getValue(longitude))
                                 Y = float(getValue(latitude))
-                                # print(utm.from_latlon(Y, X),list(utm.from_latlon(Y, X))[:2])
-                                X, Y = list(utm.from_latlon(Y, X)[:2]) if IsUTM else [X, Y]
-                                # print('X,Y = ', X,Y)
-                                col = int((X - xOrigin) / pixelWidth)
-                                roww = int((yOrigin - Y) / pixelHeight)
+                                # fast_raster reprojects into the raster CRS and masks off-grid/nodata cells
+                                ok, hit, depth = depth_raster.sample(np.array([Y]), np.array([X]))
+                                if not ok[0]:
+                                    raise ValueError("coordinates cannot be located on the depth grid: {}, {}".format(Y, X))
 
                                 # If incorrect depth grid used the depth is set to 0
-                                val = (
-                                    data[roww][col]
-                                    if 0 <= col < cols and 0 <= roww < rows and data[roww][col] != noData
-                                    else 0
-                                )
+                                val = depth[0] if hit[0] else 0
                                 # val = retrieve_pixel_value((Y,X))
 
                                 row[name] = val
@@ -792,16 +804,15 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
                         xt = xt if xt is not None else -1  #  Clean up case where InvCost is supplied but is null
                         if OWDI and xt == -1:
                             # Use default cost formula
-                            for lutrow in iecon_lut:
-                                if lutrow["Occupancy"] == OC:
-                                    GrossSales = lutrow["AnnualSalesPerSqFt"]
-                                    BusinessInv = lutrow["BusinessInvPctofSales"]
-                                    # Table imports as string type (?!) so we must convert tabular data to a float type
-                                    # Yes, raw data is typically in Integer format, be flexible for future data which may be available in dollars.cents
-                                    # Must divide by 100, as BusinessInv in the input table is a Percent figure
-                                    # Area is in Square Feet
-                                    icost = float(GrossSales) * float(BusinessInv) * area / 100
-                                    break
+                            if OC in luts.iecon_index:
+                                lutrow = luts.iecon_rows[luts.iecon_index[OC]]
+                                GrossSales = lutrow["AnnualSalesPerSqFt"]
+                                BusinessInv = lutrow["BusinessInvPctofSales"]
+                                # Table imports as string type (?!) so we must convert tabular data to a float type
+                                # Yes, raw data is typically in Integer format, be flexible for future data which may be available in dollars.cents
+                                # Must divide by 100, as BusinessInv in the input table is a Percent figure
+                                # Area is in Square Feet
+                                icost = float(GrossSales) * float(BusinessInv) * area / 100
                         # If a user-supplied Inventory Cost is supplied, use it.
                         elif xt > -1:
                             icost = getValue(InvCost)
@@ -903,28 +914,25 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
                                 # 'gotcha' checks for no hits - set a check bit - that should not happen, given the membership test with bddf_lut_full_list.
                                 # For more efficiency, break out of the loop if it is found
                                 gotcha = 0
-                                for lutrow in bddf_lut_full:
-                                    if (
-                                        lutrow["BldgDmgFnID"] == BID
-                                    ):  # This is a string match. For completeness and trailing spaces, may want to make it an integer?
-                                        gotcha += 1
-                                        ddf1 = lutrow
-                                        # Notify user if the OccupancyClass associated with the user-specified DDFID is inconsistent with the user-supplied OccupancyClass
-                                        # This is not harmful; DOGAMI script has chosen to just process it (Hazus silently reverts back to the default!)
-                                        # Simple notification
-                                        OccClsCheck = ddf1["Occupancy"]
-                                        if OccClsCheck != OC and QC_Warning:
-                                            print(
-                                                "FYI: User-supplied Building DDFID "
-                                                + BID
-                                                + " Occupancy Class is inconsistent with UDF Occupancy Class "
-                                                + OC
-                                                + " versus "
-                                                + OccClsCheck
-                                                + "  "
-                                                + userDefinedFltyId
-                                            )
-                                        break
+                                lutrow = bddf_lut_full.row(BID)
+                                if lutrow is not None:  # This is a string match. For completeness and trailing spaces, may want to make it an integer?
+                                    gotcha += 1
+                                    ddf1 = lutrow
+                                    # Notify user if the OccupancyClass associated with the user-specified DDFID is inconsistent with the user-supplied OccupancyClass
+                                    # This is not harmful; DOGAMI script has chosen to just process it (Hazus silently reverts back to the default!)
+                                    # Simple notification
+                                    OccClsCheck = ddf1["Occupancy"]
+                                    if OccClsCheck != OC and QC_Warning:
+                                        print(
+                                            "FYI: User-supplied Building DDFID "
+                                            + BID
+                                            + " Occupancy Class is inconsistent with UDF Occupancy Class "
+                                            + OC
+                                            + " versus "
+                                            + OccClsCheck
+                                            + "  "
+                                            + userDefinedFltyId
+                                        )
                                 d_lower = float(ddf1[l_index])
                                 d_upper = float(ddf1[u_index])
                                 ddf_id = int(
@@ -959,12 +967,11 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
                                         blut = bddf_lut_coastalV
 
                                 # Now do the lookup in the Default DDF
-                                for lutrow in blut:
-                                    if lutrow["SpecificOccupId"] == SpecificOccupId:
-                                        gotcha += 1
-                                        ddf1 = lutrow
-                                        ddf_id = lutrow["DDF_ID"]  # For the Record. Will go in the Results file.
-                                        break  # Quit once you found it.
+                                lutrow = blut.row(SpecificOccupId)
+                                if lutrow is not None:
+                                    gotcha += 1
+                                    ddf1 = lutrow
+                                    ddf_id = lutrow["DDF_ID"]  # For the Record. Will go in the Results file.
                                 if gotcha == 0:
                                     # This should not occur
                                     print(
@@ -1028,28 +1035,25 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
                                 # 'gotcha' checks for no hits - set a check bit - that should not happen, given the membership test with bddf_lut_full_list.
                                 # For more efficiency, break out of the loop if it is found
                                 gotcha = 0
-                                for lutrow in cddf_lut_full:
-                                    if (
-                                        lutrow["ContDmgFnId"] == BID
-                                    ):  # This is a string match. For completeness and trailing spaces, may want to make it an integer?
-                                        gotcha += 1
-                                        ddf1 = lutrow
-                                        # Notify user if the OccupancyClass associated with the user-specified DDFID is inconsistent with the user-supplied OccupancyClass
-                                        # This is not harmful; DOGAMI script has chosen to just process it (Hazus silently reverts back to the default!)
-                                        # Simple notification
-                                        OccClsCheck = ddf1["Occupancy"]
-                                        if OccClsCheck != OC and QC_Warning:
-                                            print(
-                                                "FYI: User-supplied Content  DDFID "
-                                                + BID
-                                                + " Occupancy Class is inconsistent with UDF Occupancy Class "
-                                                + OC
-                                                + " versus "
-                                                + OccClsCheck
-                                                + "  "
-                                                + userDefinedFltyId
-                                            )
-                                        break
+                                lutrow = cddf_lut_full.row(BID)
+                                if lutrow is not None:  # This is a string match. For completeness and trailing spaces, may want to make it an integer?
+                                    gotcha += 1
+                                    ddf1 = lutrow
+                                    # Notify user if the OccupancyClass associated with the user-specified DDFID is inconsistent with the user-supplied OccupancyClass
+                                    # This is not harmful; DOGAMI script has chosen to just process it (Hazus silently reverts back to the default!)
+                                    # Simple notification
+                                    OccClsCheck = ddf1["Occupancy"]
+                                    if OccClsCheck != OC and QC_Warning:
+                                        print(
+                                            "FYI: User-supplied Content  DDFID "
+                                            + BID
+                                            + " Occupancy Class is inconsistent with UDF Occupancy Class "
+                                            + OC
+                                            + " versus "
+                                            + OccClsCheck
+                                            + "  "
+                                            + userDefinedFltyId
+                                        )
                                 d_lower = float(ddf1[l_index])
                                 d_upper = float(ddf1[u_index])
                                 ddf_id = int(
@@ -1084,12 +1088,11 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
                                     if CoastalZoneCode == "VE" or CoastalZoneCode == "V":
                                         clut = cddf_lut_coastalV
 
-                                for lutrow in clut:
-                                    if lutrow["SpecificOccupId"] == SpecificOccupId:
-                                        gotcha += 1
-                                        ddf1 = lutrow
-                                        ddf_id = lutrow["DDF_ID"]  # For the Record. Will go in the Results file.
-                                        break  # Quit once you found it.
+                                lutrow = clut.row(SpecificOccupId)
+                                if lutrow is not None:
+                                    gotcha += 1
+                                    ddf1 = lutrow
+                                    ddf_id = lutrow["DDF_ID"]  # For the Record. Will go in the Results file.
                                 if gotcha == 0:
                                     # This should not occur
                                     print(
@@ -1140,28 +1143,25 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
                                 # 'gotcha' checks for no hits - set a check bit - that should not happen, given the membership test with bddf_lut_full_list.
                                 # For more efficiency, break out of the loop if it is found
                                 gotcha = 0
-                                for lutrow in iddf_lut_full:
-                                    if (
-                                        lutrow["InvDmgFnId"] == BID
-                                    ):  # This is a string match. For completeness and trailing spaces, may want to make it an integer?
-                                        gotcha += 1
-                                        ddf1 = lutrow
-                                        # Notify user if the OccupancyClass associated with the user-specified DDFID is inconsistent with the user-supplied OccupancyClass
-                                        # This is not harmful; DOGAMI script has chosen to just process it (Hazus silently reverts back to the default!)
-                                        # Simple notification
-                                        OccClsCheck = ddf1["Occupancy"]
-                                        if OccClsCheck != OC and QC_Warning:
-                                            print(
-                                                "FYI: User-supplied Inventory DDFID "
-                                                + BID
-                                                + " Occupancy Class is inconsistent with UDF Occupancy Class "
-                                                + OC
-                                                + " versus "
-                                                + OccClsCheck
-                                                + "  "
-                                                + userDefinedFltyId
-                                            )
-                                        break
+                                lutrow = iddf_lut_full.row(BID)
+                                if lutrow is not None:  # This is a string match. For completeness and trailing spaces, may want to make it an integer?
+                                    gotcha += 1
+                                    ddf1 = lutrow
+                                    # Notify user if the OccupancyClass associated with the user-specified DDFID is inconsistent with the user-supplied OccupancyClass
+                                    # This is not harmful; DOGAMI script has chosen to just process it (Hazus silently reverts back to the default!)
+                                    # Simple notification
+                                    OccClsCheck = ddf1["Occupancy"]
+                                    if OccClsCheck != OC and QC_Warning:
+                                        print(
+                                            "FYI: User-supplied Inventory DDFID "
+                                            + BID
+                                            + " Occupancy Class is inconsistent with UDF Occupancy Class "
+                                            + OC
+                                            + " versus "
+                                            + OccClsCheck
+                                            + "  "
+                                            + userDefinedFltyId
+                                        )
                                 d_lower = float(ddf1[l_index])
                                 d_upper = float(ddf1[u_index])
                                 frac = depth - math.floor(depth)
@@ -1193,12 +1193,11 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
 
                                 # Default Inventory DDF defined only for a subset of OccupancyClass types
                                 if OC in Inventory_List:
-                                    for lutrow in ilut:
-                                        if lutrow["SpecificOccupId"] == SpecificOccupId:
-                                            gotcha += 1
-                                            ddf1 = lutrow
-                                            ddf_id = lutrow["DDF_ID"]  # For the Record. Will go in the Results file.
-                                            break  # Quit once you found it.
+                                    lutrow = ilut.row(SpecificOccupId)
+                                    if lutrow is not None:
+                                        gotcha += 1
+                                        ddf1 = lutrow
+                                        ddf_id = lutrow["DDF_ID"]  # For the Record. Will go in the Results file.
                                     if gotcha == 0:
                                         # This should not occur
                                         print(
@@ -1304,12 +1303,9 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
                                     dsuf = ""
 
                                 debriskey = OC + bsm + fnd + dsuf
-                                for lutrow in debris_lut:
-                                    if (
-                                        lutrow["DebrisID"] == debriskey
-                                    ):  # This is a string match. For completeness and trailing spaces, may want to make it an integer?
-                                        gotcha += 1
-                                        ddf1 = lutrow
+                                if debriskey in luts.debris_index:  # The last matching row wins, as in the original full scan
+                                    gotcha += 1
+                                    ddf1 = luts.debris_rows[luts.debris_index[debriskey]]
 
                                 dfin_rate = float(ddf1["Finishes"])
                                 dstruc_rate = float(ddf1["Structure"])
@@ -1352,12 +1348,8 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
                                     else "24"
                                 )
                                 RsFnkey = OC + dsuf
-                                for lutrow in rest_lut:
-                                    if (
-                                        lutrow["RestFnID"] == RsFnkey
-                                    ):  # This is a string match. For completeness and trailing spaces, may want to make it an integer?
-                                        ddf1 = lutrow
-                                        break
+                                if RsFnkey in luts.restoration_index:
+                                    ddf1 = luts.restoration_rows[luts.restoration_index[RsFnkey]]
                                 restdays_min = int(
                                     ddf1["Min_Restor_Days"]
                                 )  # This is the maximum days out (flRsFnGBS has a min and a max)
@@ -1393,23 +1385,8 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
             file_out.close()
             # UKS - Sorting and logging
             logger.info("Loss calculations complete for the selected grid...")
-            logger.info("Sorting reults by Depth in structure...")
-            del data
-            csv_input = csv.DictReader(open(outputDir, "r", newline=""))  # csv.DictReader(f_input)
-            data = sorted(
-                csv.DictReader(open(outputDir, "r", newline="")),
-                key=lambda row: float(row["Depth_in_Struc"]),
-                reverse=True,
-            )
-            # f_input.close()
-
-            # os.unlink(ResultsFile + '.csv')
-            logger.info("Results saved into " + ResultsFile + ".csv")
-            with open(ResultsFile + "_sorted.csv", "w", newline="") as f_output:
-                csv_output = csv.DictWriter(f_output, fieldnames=csv_input.fieldnames)
-                csv_output.writeheader()
-                csv_output.writerows(data)
-            f_output.close()
+            depth_raster.close()
+            _write_sorted_results(outputDir, ResultsFile)
 
             # logger.info('Total records processed: ' + str(counter) + ' of ' + str(counter2) + ' records total.' + 'Total records with flooding: ' + str(recCountNonZeroDepth))
 
@@ -1420,27 +1397,7 @@ def flood_damage(UDFOrig, LUT_Dir, ResultsDir, DepthGrids, QC_Warning, fmap):
             )
 
             # recCountNonZeroDepth counter logged, concatenated to the message and reset
-        message = ""
-        for grid in log:  # CBH
-            message += (
-                "For depth-grid: "
-                + str(grid[4])
-                + "\n"
-                + str(grid[0])
-                + " records processed of "
-                + str(grid[1])
-                + " records total.\n"
-                + "Total records with flooding: "
-                + str(grid[2])
-                + "\n"
-                + "Total number of records with unmatched Specific Occupancy IDs found: "
-                + str(grid[3])
-                + "\n File saved to: "
-                + os.path.realpath(os.path.join(os.path.dirname(outputDir), str(grid[5])))
-                + "\n\n"
-            )  # UKS - modified for complete file name #CBH - change added 8/28/19
-
-            recCountNonZeroDepth = 0
+        message = _format_grid_summary(log, outputDir)
 
         # return(True, [counter,counter2,recCountNonZeroDepth,invalidSOID]) #UKS Commented
         return (True, message, row_error_count)
@@ -1483,6 +1440,12 @@ def local_with_options(
     project_root=None,
     log_path=None,
     qc_warning="False",
+    engine="legacy",
+    single_pass=False,
+    workers=1,
+    results_format="csv",
+    lookup_tables=None,
+    depth_column=None,
 ):
     if not inventory_path:
         raise ValueError("inventory_path is required.")
@@ -1506,7 +1469,28 @@ def local_with_options(
     _configure_logger(log_path=log_path, project_root=project_root)
     full_map = normalized_field_map + [_normalize_flood_type(flood_type)]
     argv = (inventory_path, lookup_tables_dir, output_dir, raster_paths, str(qc_warning), full_map)
-    return flood_damage(*argv)
+    if engine == "vectorized":
+        from fast_vectorized import flood_damage_vectorized
+
+        return flood_damage_vectorized(
+            *argv,
+            single_pass=single_pass,
+            workers=workers,
+            results_format=results_format,
+            lookup_tables=lookup_tables,
+            depth_column=depth_column,
+        )
+    if engine != "legacy":
+        raise ValueError("engine must be one of: {engines}".format(engines=", ".join(ENGINES)))
+    if single_pass:
+        raise ValueError("single_pass requires the vectorized engine.")
+    if workers != 1:
+        raise ValueError("workers > 1 requires the vectorized engine.")
+    if results_format != "csv":
+        raise ValueError("results_format {fmt} requires the vectorized engine.".format(fmt=results_format))
+    if depth_column:
+        raise ValueError("depth_column requires the vectorized engine.")
+    return flood_damage(*argv, lookup_tables=lookup_tables)
 
 
 def local(spreadsheet, fmap, project_root=None, log_path=None):
@@ -5,6 +5,8 @@ import json
 import os
 import sys
 
+from fast_options import ENGINES, FILE_RESULTS_FORMATS
+
 DEFAULT_FIELD_MAP_KEYS = [
     "UserDefinedFltyId",
     "OCC",
@@ -65,8 +67,24 @@ def run_fast(
     project_root=None,
     log_path=None,
     qc_warning=False,
+    engine="legacy",
+    single_pass=False,
+    workers=1,
+    results_format="csv",
+    lookup_tables=None,
+    depth_column=None,
 ):
-    """Execute FAST for one inventory input (CSV or Parquet) and one/more rasters."""
+    """Execute FAST for one inventory input (CSV or Parquet) and one/more rasters.
+
+    ``engine`` selects the damage engine: ``"legacy"`` (row by row) or ``"vectorized"``
+    (columnar NumPy, identical output). ``single_pass`` (vectorized only) reads the
+    inventory once for all rasters and writes one ``<inventory>_all_grids.csv``.
+    ``workers`` (vectorized only) evaluates inventory chunks on that many processes.
+    ``results_format="parquet"`` (vectorized only) writes typed Parquet result tables.
+    ``lookup_tables`` reuses tables from ``fast_lut.compile_lookup_tables``.
+    ``depth_column`` (vectorized only, one raster) reads each building's depth grid value from
+    that inventory column instead of sampling the raster, which then only names the grid.
+    """
     from hazus_notinuse import local_with_options
 
     field_map = _build_field_map(mapping) if isinstance(mapping, dict) else mapping
@@ -79,9 +97,122 @@ def run_fast(
         project_root=project_root,
         log_path=log_path,
         qc_warning="True" if qc_warning else "False",
+        engine=engine,
+        single_pass=single_pass,
+        workers=workers,
+        results_format=results_format,
+        lookup_tables=lookup_tables,
+        depth_column=depth_column,
     )
 
 
+def run_job(job, lookup_tables=None):
+    """Run one FAST job described by a dict and return the JSON payload ``main`` prints.
+
+    ``job`` uses the CLI option names: ``inventory``, ``mapping`` (an object, or a JSON file
+    path / inline JSON string), ``flc`` and ``rasters`` are required; ``output_dir``,
+    ``project_root``, ``log_path``, ``qc_warning``, ``engine``, ``single_pass``, ``workers``,
+    ``results_format`` and ``depth_column`` take the CLI defaults. Errors are reported in the payload.
+    """
+    try:
+        for key in ("inventory", "mapping", "flc", "rasters"):
+            if job.get(key) is None:
+                raise ValueError("job is missing {key}.".format(key=key))
+        mapping = job["mapping"] if isinstance(job["mapping"], dict) else _load_mapping(job["mapping"])
+        raster_args = job["rasters"] if isinstance(job["rasters"], (list, tuple)) else [job["rasters"]]
+        rasters = _normalize_rasters(raster_args)
+        results_format = job.get("results_format") or "csv"
+        if results_format not in FILE_RESULTS_FORMATS:
+            raise ValueError("results_format must be one of: {formats}".format(formats=", ".join(FILE_RESULTS_FORMATS)))
+        engine = job.get("engine") or "legacy"
+        single_pass = bool(job.get("single_pass", False))
+        workers = int(job.get("workers", 1))
+        output_dir = job.get("output_dir")
+        project_root = job.get("project_root")
+        result = run_fast(
+            inventory_path=job["inventory"],
+            mapping=mapping,
+            flc=job["flc"],
+            rasters=rasters,
+            output_dir=output_dir,
+            project_root=project_root,
+            log_path=job.get("log_path"),
+            qc_warning=bool(job.get("qc_warning", False)),
+            engine=engine,
+            single_pass=single_pass,
+            workers=workers,
+            results_format=results_format,
+            lookup_tables=lookup_tables,
+            depth_column=job.get("depth_column"),
+        )
+        success, message = result[0], result[1]
+        row_errors = result[2] if len(result) > 2 else 0
+        return {
+            "success": bool(success),
+            "message": message,
+            "row_errors": row_errors,
+            "inventory": os.path.abspath(job["inventory"]),
+            "rasters": rasters,
+            "flc": job["flc"],
+            "engine": engine,
+            "single_pass": single_pass,
+            "workers": workers,
+            "results_format": results_format,
+            "output_dir": os.path.abspath(output_dir) if output_dir else os.path.dirname(os.path.abspath(job["inventory"])),
+            "project_root": os.path.abspath(project_root) if project_root else None,
+        }
+    except Exception as exc:
+        return {"success": False, "error": str(exc), "row_errors": 0}
+
+
+class FastEngine(object):
+    """Warm FAST runner for repeated in-process runs (scenario loops, notebooks).
+
+    Resolves the project root, configures logging and compiles the lookup tables once, so
+    each ``run`` pays only for reading the inventory and sampling the rasters. Runs use the
+    vectorized engine and keep their results in memory instead of writing files.
+    """
+
+    def __init__(self, mapping, project_root=None, log_path=None, qc_warning=False):
+        from fast_lut import compile_lookup_tables
+        from hazus_notinuse import _configure_logger, _resolve_lookup_tables_dir, _resolve_project_root
+
+        self.mapping = mapping
+        self.project_root = _resolve_project_root(project_root)
+        self.log_path = _configure_logger(log_path=log_path, project_root=self.project_root)
+        self.qc_warning = qc_warning
+        self.lookup_tables = compile_lookup_tables(_resolve_lookup_tables_dir(self.project_root))
+
+    def run(self, inventory, rasters, flc, single_pass=False, workers=1, depth_column=None):
+        """Run FAST for one inventory (CSV or Parquet path) against one or more rasters.
+
+        Returns ``(success, message, row_errors, results)``, where ``results`` maps each
+        result table's name (the file name ``--results-format`` would give it, without the
+        extension) to a ``pyarrow.Table``; it is empty when the run fails.
+        """
+        from hazus_notinuse import local_with_options
+
+        field_map = _build_field_map(self.mapping) if isinstance(self.mapping, dict) else self.mapping
+        result = local_with_options(
+            inventory_path=inventory,
+            field_map=field_map,
+            raster_names_or_paths=_normalize_rasters(rasters if isinstance(rasters, (list, tuple)) else [rasters]),
+            flood_type=flc,
+            project_root=self.project_root,
+            log_path=self.log_path,
+            qc_warning="True" if self.qc_warning else "False",
+            engine="vectorized",
+            single_pass=single_pass,
+            workers=workers,
+            results_format="arrow",
+            lookup_tables=self.lookup_tables,
+            depth_column=depth_column,
+        )
+        if len(result) < 4:
+            return (result[0], result[1], result[2], {})
+        return result
+
+
 def _create_parser():
     parser = argparse.ArgumentParser(description="Run FAST headless with CSV or Parquet inventory input.")
     parser.add_argument("--inventory", required=True, help="Path to inventory file (.csv or .parquet).")
@@ -105,50 +236,77 @@ def _create_parser():
     parser.add_argument("--project-root", default=None, help="FAST project root containing Lookuptables and rasters.")
     parser.add_argument("--log-path", default=None, help="Optional FAST log file path.")
     parser.add_argument("--qc-warning", action="store_true", help="Enable QC warnings.")
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="legacy",
+        help="Damage engine: legacy (row by row) or vectorized (columnar NumPy, same output).",
+    )
+    parser.add_argument(
+        "--single-pass",
+        action="store_true",
+        help="Vectorized engine only: read the inventory once for all rasters and write one long table "
+        "(<inventory>_all_grids.csv, one row per building and grid).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Vectorized engine only: number of worker processes; output is identical for any count.",
+    )
+    parser.add_argument(
+        "--results-format",
+        choices=FILE_RESULTS_FORMATS,
+        default="csv",
+        help="Vectorized engine only: result table format. parquet writes typed, compressed "
+        "<inventory>_<grid>.parquet files (no _sorted companion).",
+    )
+    parser.add_argument(
+        "--depth-column",
+        default=None,
+        help="Vectorized engine only, one raster: read each building's depth grid value from this inventory "
+        "column (e.g. Depth_Grid from duckdb_fast_pipeline.py --sample-depth) instead of sampling the raster.",
+    )
     parser.add_argument("--pretty", action="store_true", help="Pretty-print JSON result.")
     return parser
 
 
 def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] == "serve":
+        from fast_service import main as serve_main
+
+        return serve_main(argv[1:])
+
     parser = _create_parser()
     args = parser.parse_args(argv)
 
     try:
         mapping = _load_mapping(args.mapping_json)
-        rasters = _normalize_rasters(args.rasters)
-        result = run_fast(
-            inventory_path=args.inventory,
-            mapping=mapping,
-            flc=args.flc,
-            rasters=rasters,
-            output_dir=args.output_dir,
-            project_root=args.project_root,
-            log_path=args.log_path,
-            qc_warning=args.qc_warning,
-        )
-        success, message = result[0], result[1]
-        row_errors = result[2] if len(result) > 2 else 0
-        payload = {
-            "success": bool(success),
-            "message": message,
-            "row_errors": row_errors,
-            "inventory": os.path.abspath(args.inventory),
-            "rasters": rasters,
-            "flc": args.flc,
-            "output_dir": os.path.abspath(args.output_dir)
-            if args.output_dir
-            else os.path.dirname(os.path.abspath(args.inventory)),
-            "project_root": os.path.abspath(args.project_root) if args.project_root else None,
-        }
-        print(json.dumps(payload, indent=2 if args.pretty else None))
-        if not success:
-            print(f"FAST error: {message}", file=sys.stderr)
-        return 0 if success else 1
     except Exception as exc:
         payload = {"success": False, "error": str(exc), "row_errors": 0}
-        print(json.dumps(payload, indent=2 if args.pretty else None))
-        print(f"FAST error: {exc}", file=sys.stderr)
-        return 1
+    else:
+        payload = run_job(
+            {
+                "inventory": args.inventory,
+                "mapping": mapping,
+                "flc": args.flc,
+                "rasters": args.rasters,
+                "output_dir": args.output_dir,
+                "project_root": args.project_root,
+                "log_path": args.log_path,
+                "qc_warning": args.qc_warning,
+                "engine": args.engine,
+                "single_pass": args.single_pass,
+                "workers": args.workers,
+                "results_format": args.results_format,
+                "depth_column": args.depth_column,
+            }
+        )
+    print(json.dumps(payload, indent=2 if args.pretty else None))
+    if not payload["success"]:
+        print("FAST error: {error}".format(error=payload.get("error", payload.get("message"))), file=sys.stderr)
+    return 0 if payload["success"] else 1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+"""Checks that the compiled lookup tables agree with the lookup CSVs they are built from."""
+
+import csv
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+class CompiledLookupTablesTest(unittest.TestCase):
+    def setUp(self):
+        self.project_root = Path(__file__).resolve().parents[1]
+        self.lut_dir = self.project_root / "Lookuptables"
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+
+    def test_ddf_rows_and_interpolation_match_csv(self):
+        from fast_lut import DEPTH_COLUMNS, compile_lookup_tables, depth_breakpoints
+
+        luts = compile_lookup_tables(str(self.lut_dir))
+        with open(self.lut_dir / "Building_DDF_Riverine_LUT_Hazus4p0.csv") as lut_file:
+            rows = list(csv.DictReader(lut_file))
+
+        table = luts.building["riverine"]
+        first = rows[0]
+        self.assertIs(table.row(first["SpecificOccupId"]), table.rows[0])
+        self.assertIsNone(table.row("NOPE"))
+
+        index = table.lookup(np.array([first["SpecificOccupId"], "NOPE"], dtype=object))
+        self.assertEqual(index.tolist(), [0, -1])
+        self.assertEqual(table.ids[0], first["DDF_ID"])
+        self.assertEqual(table.damage[0].tolist(), [float(first[column]) for column in DEPTH_COLUMNS])
+
+        depth = np.array([-4.0, 2.25, 24.0])
+        lower, upper, frac = depth_breakpoints(depth)
+        damage = table.interpolate(np.zeros(3, dtype=np.int64), lower, upper, frac)
+        expected_mid = (float(first["p2"]) + 0.25 * (float(first["p3"]) - float(first["p2"]))) / 100
+        self.assertEqual(damage.tolist(), [float(first["m4"]) / 100, expected_mid, float(first["p24"]) / 100])
+
+    def test_debris_and_restoration_indexes(self):
+        from fast_lut import compile_lookup_tables
+
+        luts = compile_lookup_tables(str(self.lut_dir))
+        with open(self.lut_dir / "flDebris_LUT.csv") as lut_file:
+            debris = list(csv.DictReader(lut_file))
+        with open(self.lut_dir / "flRsFnGBS_LUT.csv") as lut_file:
+            restoration = list(csv.DictReader(lut_file))
+
+        key = debris[5]["DebrisID"]
+        rates = luts.debris_rates[luts.debris_index[key]].tolist()
+        self.assertEqual(rates, [float(debris[5][name]) for name in ("Finishes", "Structure", "Foundation")])
+
+        key = restoration[3]["RestFnID"]
+        days = luts.restoration_days[luts.restoration_index[key]].tolist()
+        self.assertEqual(days, [int(restoration[3]["Min_Restor_Days"]), int(restoration[3]["Max_Restor_Days"])])
+
+    def test_legacy_rows_come_from_the_cache_without_reading_csvs(self):
+        import fast_lut
+        from fast_lut import DEPTH_COLUMNS
+
+        temp_dir = Path(tempfile.mkdtemp(prefix="fast_lut_rows_test_"))
+        try:
+            lut_dir = temp_dir / "Lookuptables"
+            shutil.copytree(self.lut_dir, lut_dir, ignore=shutil.ignore_patterns(".cache"))
+            fast_lut.compile_lookup_tables(str(lut_dir))
+
+            original_read_lut = fast_lut._read_lut
+            fast_lut._read_lut = lambda path: self.fail("read {}".format(path))
+            try:
+                cached = fast_lut.compile_lookup_tables(str(lut_dir))
+                row = cached.building_full.row("213")
+                iecon = cached.iecon_rows[cached.iecon_index["COM1"]]
+                restoration = cached.restoration_rows[0]
+            finally:
+                fast_lut._read_lut = original_read_lut
+
+            with open(lut_dir / "flBldgStructDmgFn.csv") as lut_file:
+                expected = next(r for r in csv.DictReader(lut_file) if r["BldgDmgFnID"] == "213")
+            self.assertEqual(row["Occupancy"], expected["Occupancy"])
+            self.assertEqual([row[column] for column in DEPTH_COLUMNS], [float(expected[c]) for c in DEPTH_COLUMNS])
+            with open(lut_dir / "flBldgEconParamSalesAndInv.csv") as lut_file:
+                expected = next(r for r in csv.DictReader(lut_file) if r["Occupancy"] == "COM1")
+            self.assertEqual(float(iecon["AnnualSalesPerSqFt"]), float(expected["AnnualSalesPerSqFt"]))
+            self.assertEqual(float(iecon["BusinessInvPctofSales"]), float(expected["BusinessInvPctofSales"]))
+            with open(lut_dir / "flRsFnGBS_LUT.csv") as lut_file:
+                expected = next(csv.DictReader(lut_file))
+            self.assertEqual(restoration["RestFnID"], expected["RestFnID"])
+            self.assertEqual(int(restoration["Max_Restor_Days"]), int(expected["Max_Restor_Days"]))
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def test_cache_is_reused_and_invalidated_by_csv_changes(self):
+        import fast_lut
+
+        temp_dir = Path(tempfile.mkdtemp(prefix="fast_lut_cache_test_"))
+        try:
+            lut_dir = temp_dir / "Lookuptables"
+            shutil.copytree(self.lut_dir, lut_dir, ignore=shutil.ignore_patterns(".cache"))
+            compiled = fast_lut.compile_lookup_tables(str(lut_dir))
+            cache_path = Path(fast_lut.lookup_tables_cache_path(str(lut_dir)))
+            self.assertTrue(cache_path.is_file())
+
+            cached = fast_lut.compile_lookup_tables(str(lut_dir))
+            self.assertEqual(cached.building["riverine"].index, compiled.building["riverine"].index)
+            self.assertTrue(np.array_equal(cached.building["riverine"].damage, compiled.building["riverine"].damage))
+            self.assertEqual(cached.debris_index, compiled.debris_index)
+            self.assertEqual(cached.building["riverine"].row("R11N"), compiled.building["riverine"].row("R11N"))
+            self.assertEqual(cached.debris_rows, compiled.debris_rows)
+
+            # Editing a table changes the digest: the next run recompiles and replaces the old cache.
+            debris_csv = lut_dir / "flDebris_LUT.csv"
+            debris_csv.write_text(debris_csv.read_text().replace("RES1NBFT0,", "RES1NBFT0X,", 1))
+            recompiled = fast_lut.compile_lookup_tables(str(lut_dir))
+            self.assertIn("RES1NBFT0X", recompiled.debris_index)
+            self.assertFalse(cache_path.exists())
+            self.assertTrue(Path(fast_lut.lookup_tables_cache_path(str(lut_dir))).is_file())
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+"""Checks batched depth sampling against pixel positions computed by hand."""
+
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+class DepthRasterSamplingTest(unittest.TestCase):
+    def setUp(self):
+        self.project_root = Path(__file__).resolve().parents[1]
+        self.temp_dir = Path(tempfile.mkdtemp(prefix="fast_raster_test_"))
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write_raster(self, path, data, crs, transform, nodata):
+        import rasterio
+
+        with rasterio.open(
+            path,
+            "w",
+            driver="GTiff",
+            height=data.shape[0],
+            width=data.shape[1],
+            count=1,
+            dtype=str(data.dtype),
+            crs=crs,
+            transform=transform,
+            nodata=nodata,
+        ) as dst:
+            dst.write(data, 1)
+
+    def test_geographic_grid_masks_off_grid_and_nodata_cells(self):
+        try:
+            from rasterio.transform import from_origin
+        except Exception as exc:
+            self.skipTest("rasterio is required: {}".format(exc))
+        from fast_raster import DepthRaster
+
+        data = np.arange(12, dtype=np.float32).reshape(3, 4)
+        data[1, 2] = -9999.0
+        path = self.temp_dir / "geo.tif"
+        self._write_raster(path, data, "EPSG:4326", from_origin(-100.0, 40.0, 0.5, 0.5), -9999.0)
+
+        lat = np.array([39.9, 39.4, 39.3, 38.6, 41.0, 39.9, np.inf])
+        lon = np.array([-99.9, -98.4, -98.9, -98.1, -99.9, -100.1, -99.9])
+        with DepthRaster(str(path)) as raster:
+            self.assertIsNone(raster.transformer)
+            ok, hit, depth = raster.sample(lat, lon)
+
+        self.assertEqual(ok.tolist(), [True] * 6 + [False])
+        self.assertEqual(hit.tolist(), [True, True, False, True, False, False, False])
+        self.assertEqual(depth.dtype, np.float32)
+        self.assertEqual(depth.tolist(), [0.0, 7.0, 0.0, 11.0, 0.0, 0.0, 0.0])
+
+    def test_projected_grid_reprojects_the_whole_batch(self):
+        try:
+            from pyproj import Transformer
+            from rasterio.transform import from_origin
+        except Exception as exc:
+            self.skipTest("rasterio and pyproj are required: {}".format(exc))
+        from fast_raster import DepthRaster
+
+        # 20 x 20 grid of 100 m cells in UTM zone 17N around Tampa, FL.
+        to_utm = Transformer.from_crs("EPSG:4326", "EPSG:32617", always_xy=True)
+        easting, northing = to_utm.transform(-82.5, 28.0)
+        origin_e, origin_n = easting - 1000.0, northing + 1000.0
+        data = np.arange(400, dtype=np.float64).reshape(20, 20)
+        path = self.temp_dir / "utm.tif"
+        self._write_raster(path, data, "EPSG:32617", from_origin(origin_e, origin_n, 100.0, 100.0), None)
+
+        rng = np.random.default_rng(7)
+        lon = -82.5 + rng.uniform(-0.012, 0.012, 50)
+        lat = 28.0 + rng.uniform(-0.012, 0.012, 50)
+        with DepthRaster(str(path)) as raster:
+            ok, hit, depth = raster.sample(lat, lon)
+
+        x, y = to_utm.transform(lon, lat)
+        col = np.floor((x - origin_e) / 100.0).astype(int)
+        row = np.floor((origin_n - y) / 100.0).astype(int)
+        inside = (col >= 0) & (col < 20) & (row >= 0) & (row < 20)
+        self.assertTrue(ok.all())
+        self.assertTrue(inside.any() and not inside.all())
+        self.assertEqual(hit.tolist(), inside.tolist())
+        self.assertEqual(depth[inside].tolist(), data[row[inside], col[inside]].tolist())
+        self.assertTrue((depth[~inside] == 0).all())
+
+    def test_only_tiles_under_the_points_are_read(self):
+        try:
+            import rasterio
+            from rasterio.transform import from_origin
+        except Exception as exc:
+            self.skipTest("rasterio is required: {}".format(exc))
+        from fast_raster import DepthRaster
+
+        rng = np.random.default_rng(3)
+        data = rng.uniform(0, 20, size=(300, 400)).astype(np.float32)
+        path = self.temp_dir / "tiled.tif"
+        with rasterio.open(
+            path,
+            "w",
+            driver="GTiff",
+            height=300,
+            width=400,
+            count=1,
+            dtype="float32",
+            crs="EPSG:4326",
+            transform=from_origin(-100.0, 40.0, 0.01, 0.01),
+            tiled=True,
+            blockxsize=32,
+            blockysize=32,
+        ) as dst:
+            dst.write(data, 1)
+
+        # Points clustered in the north-west corner plus one in the far south-east.
+        lat = np.concatenate([40.0 - rng.uniform(0, 1.0, 200), [37.005]])
+        lon = np.concatenate([-100.0 + rng.uniform(0, 1.0, 200), [-96.005]])
+        row = np.floor((40.0 - lat) / 0.01).astype(int)
+        col = np.floor((lon + 100.0) / 0.01).astype(int)
+
+        with DepthRaster(str(path), cache_bytes=3 * 64 * 64 * 4, tile_size=64) as raster:
+            self.assertEqual((raster.tile_height, raster.tile_width), (64, 64))
+            ok, hit, depth = raster.sample(lat, lon)
+            self.assertTrue(hit.all())
+            self.assertEqual(depth.tolist(), data[row, col].tolist())
+            # A 64-pixel tile grid over 300 x 400 has 35 tiles; the points touch five.
+            self.assertEqual(raster.tiles_read, 5)
+            self.assertLessEqual(len(raster._tiles), 3)
+
+            # Sampling the same points again re-reads only the tiles the cache evicted.
+            raster.sample(lat[:1], lon[:1])
+            self.assertLessEqual(raster.tiles_read, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+"""The queue service must report each job with the payload ``run_fast.py`` prints for it."""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+MAPPING = {
+    "UserDefinedFltyId": "FltyId",
+    "OCC": "Occ",
+    "Cost": "Cost",
+    "Area": "Area",
+    "NumStories": "NumStories",
+    "FoundationType": "FoundationType",
+    "FirstFloorHt": "FirstFloorHt",
+    "ContentCost": "ContentCost",
+    "Latitude": "Latitude",
+    "Longitude": "Longitude",
+}
+
+
+def _crash_or_succeed(job_path, project_root):
+    """Stand-in for ``fast_service._run_job_file``: jobs named ``*crash*`` kill their worker."""
+    name = os.path.basename(job_path)
+    if "crash" in name:
+        os._exit(1)
+    return {"success": True, "job": name}
+
+
+def _wait_or_succeed(job_path, project_root):
+    """Stand-in for ``fast_service._run_job_file``: a job naming ``wait_for`` runs until that file exists."""
+    with open(job_path, "r", encoding="utf-8") as job_file:
+        wait_for = json.load(job_file).get("wait_for")
+    while wait_for is not None and not os.path.exists(wait_for):
+        time.sleep(0.05)
+    return {"success": True, "job": os.path.basename(job_path)}
+
+
+class FastServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.project_root = Path(__file__).resolve().parents[1]
+        self.temp_dir = Path(tempfile.mkdtemp(prefix="fast_service_test_"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write_raster(self, path):
+        import rasterio
+        from rasterio.transform import from_origin
+
+        data = np.random.default_rng(7).uniform(-3, 20, size=(160, 360)).astype(np.float32)
+        with rasterio.open(
+            path,
+            "w",
+            driver="GTiff",
+            height=data.shape[0],
+            width=data.shape[1],
+            count=1,
+            dtype="float32",
+            crs="EPSG:4326",
+            transform=from_origin(-101.40, 48.30, 0.0005, 0.0005),
+            nodata=-9999.0,
+        ) as dst:
+            dst.write(data, 1)
+
+    def test_queued_jobs_get_the_cli_payload(self):
+        try:
+            import rasterio  # noqa: F401
+        except Exception as exc:
+            self.skipTest("rasterio is required: {}".format(exc))
+
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+        from fast_service import serve
+        from run_fast import main
+
+        raster_path = self.temp_dir / "advisory.tif"
+        self._write_raster(raster_path)
+        inventory = str(self.project_root / "UDF" / "ND_Minot_UDF.csv")
+        jobs = {
+            "a_csv.json": {"output_dir": str(self.temp_dir / "csv")},
+            "b_parquet.json": {
+                "output_dir": str(self.temp_dir / "parquet"),
+                "engine": "vectorized",
+                "results_format": "parquet",
+            },
+            "c_missing.json": {
+                "output_dir": str(self.temp_dir / "missing"),
+                "inventory": str(self.temp_dir / "none.csv"),
+            },
+        }
+        incoming = self.temp_dir / "queue" / "incoming"
+        incoming.mkdir(parents=True)
+        # A job an interrupted service left behind in running/ is queued again.
+        running = self.temp_dir / "queue" / "running"
+        running.mkdir()
+        for name, options in jobs.items():
+            job = {"inventory": inventory, "mapping": MAPPING, "flc": "Riverine", "rasters": [str(raster_path)]}
+            job.update(options)
+            jobs[name] = job
+            ((running if name == "a_csv.json" else incoming) / name).write_text(json.dumps(job))
+        (incoming / "d_broken.json").write_text("{")
+        (incoming / "e_partial.json.tmp").write_text("{")
+
+        finished = serve(
+            str(self.temp_dir / "queue"), project_root=str(self.project_root), jobs=2, once=True, requeue=True
+        )
+        self.assertEqual(finished, 4)
+        self.assertEqual(sorted(path.name for path in incoming.iterdir()), ["e_partial.json.tmp"])
+        self.assertEqual(list(running.iterdir()), [])
+
+        done = self.temp_dir / "queue" / "done"
+        self.assertEqual(sorted(path.name for path in done.iterdir()), sorted(jobs) + ["d_broken.json"])
+        broken = json.loads((done / "d_broken.json").read_text())
+        self.assertFalse(broken["success"])
+        for name, job in jobs.items():
+            argv = ["--inventory", job["inventory"], "--mapping-json", json.dumps(MAPPING), "--flc", "Riverine"]
+            argv += ["--rasters", str(raster_path), "--output-dir", job["output_dir"]]
+            argv += ["--project-root", str(self.project_root)]
+            argv += ["--engine", job.get("engine", "legacy"), "--results-format", job.get("results_format", "csv")]
+            printed = io.StringIO()
+            with contextlib.redirect_stdout(printed), contextlib.redirect_stderr(io.StringIO()):
+                main(argv)
+            expected = json.loads(printed.getvalue().strip().splitlines()[-1])
+            self.assertEqual(json.loads((done / name).read_text()), expected, msg=name)
+        self.assertTrue(json.loads((done / "b_parquet.json").read_text())["success"])
+
+    def test_a_dead_worker_fails_only_its_job(self):
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+        import fast_service
+
+        incoming = self.temp_dir / "queue" / "incoming"
+        incoming.mkdir(parents=True)
+        for name in ("a_crash.json", "b_ok.json", "c_ok.json"):
+            (incoming / name).write_text("{}")
+
+        # Two jobs share the pool when the worker dies, so the service cannot tell whose
+        # worker it was until it runs them again one at a time.
+        with mock.patch.object(fast_service, "_run_job_file", _crash_or_succeed):
+            finished = fast_service.serve(
+                str(self.temp_dir / "queue"), project_root=str(self.project_root), jobs=2, once=True
+            )
+        self.assertEqual(finished, 3)
+        self.assertEqual(list(incoming.iterdir()), [])
+        self.assertEqual(list((self.temp_dir / "queue" / "running").iterdir()), [])
+
+        done = self.temp_dir / "queue" / "done"
+        self.assertEqual(sorted(path.name for path in done.iterdir()), ["a_crash.json", "b_ok.json", "c_ok.json"])
+        crashed = json.loads((done / "a_crash.json").read_text())
+        self.assertFalse(crashed["success"])
+        self.assertIn("terminated abruptly", crashed["error"])
+        for name in ("b_ok.json", "c_ok.json"):
+            self.assertEqual(json.loads((done / name).read_text()), {"success": True, "job": name})
+
+    def test_a_second_service_leaves_running_jobs_alone(self):
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+        import fast_service
+
+        queue_dir = self.temp_dir / "queue"
+        incoming = queue_dir / "incoming"
+        running = queue_dir / "running"
+        incoming.mkdir(parents=True)
+        release = self.temp_dir / "release"
+        (incoming / "a_slow.json").write_text(json.dumps({"wait_for": str(release)}))
+
+        results = {}
+
+        def serve_first():
+            results["first"] = fast_service.serve(str(queue_dir), project_root=str(self.project_root), once=True)
+
+        with mock.patch.object(fast_service, "_run_job_file", _wait_or_succeed):
+            first = threading.Thread(target=serve_first)
+            first.start()
+            try:
+                deadline = time.monotonic() + 30
+                while not (running / "a_slow.json").exists():
+                    self.assertLess(time.monotonic(), deadline, "first service never claimed the job")
+                    time.sleep(0.05)
+                (incoming / "b_ok.json").write_text("{}")
+                # The second service runs the new job and leaves the first service's claim alone.
+                second = fast_service.serve(str(queue_dir), project_root=str(self.project_root), once=True)
+                self.assertEqual(second, 1)
+                self.assertEqual([path.name for path in running.iterdir()], ["a_slow.json"])
+            finally:
+                release.write_text("")
+                first.join(60)
+        self.assertFalse(first.is_alive())
+        self.assertEqual(results["first"], 1)
+        self.assertEqual(list(running.iterdir()), [])
+        done = queue_dir / "done"
+        for name in ("a_slow.json", "b_ok.json"):
+            self.assertEqual(json.loads((done / name).read_text()), {"success": True, "job": name})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Checks the external merge sort behind the ``_sorted.csv`` result files."""
+
+import csv
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+class ResultsSortTest(unittest.TestCase):
+    def setUp(self):
+        self.project_root = Path(__file__).resolve().parents[1]
+        self.temp_dir = Path(tempfile.mkdtemp(prefix="fast_sort_test_"))
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _expected(self, path):
+        # The original implementation: DictReader, a stable sort, DictWriter.
+        with open(path, newline="") as source:
+            reader = csv.DictReader(source)
+            rows = sorted(reader, key=lambda row: float(row["Depth_in_Struc"]), reverse=True)
+            fieldnames = reader.fieldnames
+        expected = self.temp_dir / "expected.csv"
+        with open(expected, "w", newline="") as target:
+            writer = csv.DictWriter(target, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        return expected.read_bytes()
+
+    def test_spilled_runs_merge_to_the_in_memory_order(self):
+        from fast_sort import sort_results_csv
+
+        rng = random.Random(5)
+        path = self.temp_dir / "results.csv"
+        with open(path, "w", newline="") as target:
+            writer = csv.writer(target, lineterminator="\n")
+            writer.writerow(["FltyId", "Depth_in_Struc", "Occ", "FltyId"])
+            for index in range(1000):
+                depth = rng.choice(["0", "0.0", "-0.0", "2.5", "-99999", str(rng.uniform(-4, 24))])
+                writer.writerow([index, depth, rng.choice(["RES1", "COM1", 'say "hi", twice']), "dup{}".format(index)])
+
+        expected = self._expected(path)
+        for run_rows in (1000000, 64, 1):
+            output = self.temp_dir / "sorted_{}.csv".format(run_rows)
+            sort_results_csv(str(path), str(output), run_rows=run_rows)
+            self.assertEqual(output.read_bytes(), expected, msg="run_rows={}".format(run_rows))
+        # Spilled runs are cleaned up.
+        self.assertEqual(sorted(p.name for p in self.temp_dir.iterdir() if p.is_dir()), [])
+
+    def test_blank_depth_fails_before_writing(self):
+        from fast_sort import sort_results_csv
+
+        path = self.temp_dir / "results.csv"
+        path.write_text("FltyId,Depth_in_Struc\n1,2.0\n2,\n")
+        output = self.temp_dir / "sorted.csv"
+        with self.assertRaisesRegex(ValueError, "could not convert string to float: ''"):
+            sort_results_csv(str(path), str(output), run_rows=1)
+        self.assertFalse(output.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
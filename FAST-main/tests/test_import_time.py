@@ -0,0 +1,65 @@
+"""Cold-start budget: the headless entrypoint must not load the engines' heavy dependencies.
+
+``run_fast.py --help``, argument errors and building a field map only need the standard
+library; numpy, rasterio, pyproj and pyarrow are imported by the code paths that use them.
+Measured with ``python -X importtime`` in a fresh interpreter. Wall-clock import time depends
+on the machine, so the time budget is only checked when ``FAST_IMPORT_BUDGET_US`` is set.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+HEAVY_MODULES = ("numpy", "rasterio", "pyproj", "pyarrow", "fast_lut", "fast_raster", "fast_vectorized")
+
+# Budget for the cumulative import time of run_fast and hazus_notinuse together, in
+# microseconds (about 10 ms when measured; numpy, rasterio and pyarrow alone took over 100 ms).
+IMPORT_BUDGET_ENV = "FAST_IMPORT_BUDGET_US"
+
+
+def _import_times(python_env_dir, *args):
+    """Return ``{module: cumulative microseconds}`` for a fresh ``python -X importtime`` run."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime"] + list(args),
+        cwd=str(python_env_dir),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class ImportTimeTest(unittest.TestCase):
+    def setUp(self):
+        self.python_env_dir = Path(__file__).resolve().parents[1] / "Python_env"
+
+    def test_entrypoint_does_not_load_the_engines(self):
+        times = _import_times(self.python_env_dir, "-c", "import run_fast, hazus_notinuse")
+        self.assertEqual([name for name in HEAVY_MODULES if name in times], [])
+
+    @unittest.skipUnless(os.environ.get(IMPORT_BUDGET_ENV), "set {} to check the import time".format(IMPORT_BUDGET_ENV))
+    def test_entrypoint_imports_within_budget(self):
+        budget = int(os.environ[IMPORT_BUDGET_ENV])
+        code = "import run_fast, hazus_notinuse"
+        # The first run may compile the modules to bytecode; measure the second.
+        _import_times(self.python_env_dir, "-c", code)
+        times = _import_times(self.python_env_dir, "-c", code)
+        total = times["run_fast"] + times["hazus_notinuse"]
+        self.assertLess(total, budget, msg="import took {} us".format(total))
+
+    def test_help_does_not_load_the_engines(self):
+        times = _import_times(self.python_env_dir, "run_fast.py", "--help")
+        self.assertEqual([name for name in HEAVY_MODULES + ("hazus_notinuse",) if name in times], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
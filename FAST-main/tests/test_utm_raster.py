@@ -2,7 +2,7 @@
 
 The existing parity test uses a geographic (NAD83) raster where IsUTM=False.
 This test creates a synthetic UTM Zone 17N (EPSG:32617) raster to exercise
-the IsUTM=True branch where utm.from_latlon is called for coordinate conversion.
+the branch where building coordinates are reprojected into the raster CRS.
 """
 
 import csv
@@ -0,0 +1,592 @@
+"""Parity test: the vectorized engine must write the same files as the row-by-row engine.
+
+Runs the Minot sample inventory (plus a handful of deliberately odd rows: blanks, padded
+numbers, unknown occupancies, points off the grid) through both engines against a synthetic
+geographic depth grid and compares the result CSVs byte for byte.
+"""
+
+import csv
+import hashlib
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as input_file:
+        digest.update(input_file.read())
+    return digest.hexdigest()
+
+
+MAPPING = {
+    "UserDefinedFltyId": "FltyId",
+    "OCC": "Occ",
+    "Cost": "Cost",
+    "Area": "Area",
+    "NumStories": "NumStories",
+    "FoundationType": "FoundationType",
+    "FirstFloorHt": "FirstFloorHt",
+    "ContentCost": "ContentCost",
+    "BDDF_ID": "",
+    "CDDF_ID": "",
+    "IDDF_ID": "",
+    "InvCost": "",
+    "SOID": "",
+    "Latitude": "Latitude",
+    "Longitude": "Longitude",
+}
+
+
+class VectorizedEngineParityTest(unittest.TestCase):
+    def setUp(self):
+        self.project_root = Path(__file__).resolve().parents[1]
+        self.sample_source_csv = self.project_root / "UDF" / "ND_Minot_UDF.csv"
+        self.temp_dir = Path(tempfile.mkdtemp(prefix="fast_vectorized_test_"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write_raster(self, path):
+        import rasterio
+        from rasterio.transform import from_origin
+
+        rng = np.random.default_rng(42)
+        data = rng.uniform(-3, 30, size=(160, 360)).astype(np.float32)
+        data[rng.random(data.shape) < 0.1] = -9999.0
+        data[rng.random(data.shape) < 0.2] = 0
+        data[rng.random(data.shape) < 0.05] = 12.0
+        with rasterio.open(
+            path,
+            "w",
+            driver="GTiff",
+            height=data.shape[0],
+            width=data.shape[1],
+            count=1,
+            dtype="float32",
+            crs="EPSG:4326",
+            transform=from_origin(-101.40, 48.30, 0.0005, 0.0005),
+            nodata=-9999.0,
+        ) as dst:
+            dst.write(data, 1)
+
+    def _write_inventory(self, path):
+        with open(self.sample_source_csv, newline="") as source:
+            rows = list(csv.reader(source))
+        header, body = rows[0], rows[1:]
+        column = {name: index for index, name in enumerate(header)}
+        odd_values = [
+            ("Occ", "XYZ1"),
+            ("Occ", " REL1 "),
+            ("NumStories", "2.5"),
+            ("FirstFloorHt", "-2.75"),
+            ("ContentCost", "-1"),
+            ("ContentCost", ""),
+            ("Cost", " 98000 "),
+            ("Latitude", "95"),
+            ("Longitude", "-101.0"),
+        ]
+        for index, (name, value) in enumerate(odd_values):
+            body[index * 7][column[name]] = value
+        with open(path, "w", newline="") as target:
+            writer = csv.writer(target)
+            writer.writerow(header)
+            writer.writerows(body)
+
+    def test_vectorized_outputs_are_byte_identical(self):
+        try:
+            import rasterio  # noqa: F401
+        except Exception as exc:
+            self.skipTest("rasterio is required: {}".format(exc))
+
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+        from run_fast import run_fast
+
+        raster_path = self.temp_dir / "synthetic_depth.tif"
+        inventory_path = self.temp_dir / "inventory.csv"
+        self._write_raster(raster_path)
+        self._write_inventory(inventory_path)
+
+        for flc in ("Riverine", "CoastalA", "CoastalV"):
+            results = {}
+            for engine in ("legacy", "vectorized"):
+                output_dir = self.temp_dir / flc / engine
+                success, message, row_errors = run_fast(
+                    inventory_path=str(inventory_path),
+                    mapping=MAPPING,
+                    flc=flc,
+                    rasters=[str(raster_path)],
+                    output_dir=str(output_dir),
+                    project_root=str(self.project_root),
+                    engine=engine,
+                )
+                results[engine] = (success, message.replace(str(output_dir), "<out>"), row_errors, output_dir)
+
+            legacy, vectorized = results["legacy"], results["vectorized"]
+            self.assertTrue(legacy[0], msg="legacy FAST run failed: {}".format(legacy[1]))
+            self.assertEqual(legacy[:3], vectorized[:3], msg="{}: run results differ".format(flc))
+            legacy_files = sorted(path.name for path in legacy[3].glob("*.csv"))
+            self.assertEqual(legacy_files, sorted(path.name for path in vectorized[3].glob("*.csv")))
+            for name in legacy_files:
+                self.assertEqual(
+                    _sha256(legacy[3] / name),
+                    _sha256(vectorized[3] / name),
+                    msg="{}: {} differs between engines".format(flc, name),
+                )
+
+    def test_user_ddf_and_soid_rows_match_on_wet_and_dry_buildings(self):
+        # The vectorized engine runs the DDF, debris and restoration lookups on exposed rows only;
+        # user-supplied DDF IDs and SOIDs must still come out the same for wet, dry and off-grid rows.
+        try:
+            import rasterio  # noqa: F401
+        except Exception as exc:
+            self.skipTest("rasterio is required: {}".format(exc))
+
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+        from run_fast import run_fast
+
+        raster_path = self.temp_dir / "synthetic_depth.tif"
+        inventory_path = self.temp_dir / "inventory.csv"
+        self._write_raster(raster_path)
+        with open(self.sample_source_csv, newline="") as source:
+            rows = list(csv.reader(source))[:2001]
+        header = rows[0] + ["BldgDDF", "ContDDF", "InvDDF", "UserSOID", "InvCost"]
+        user_values = [
+            ("213", "1", "1", "", ""),
+            ("99999", "", "", "", "2500"),
+            ("", "99999", "99999", "R11N", ""),
+            ("", "", "", "XXXX", "-1"),
+            ("", "", "", "", ""),
+        ]
+        body = []
+        for index, row in enumerate(rows[1:]):
+            if index % 50 == 0:
+                row[1], row[2] = "-100.0", "47.0"  # off the grid
+            body.append(row + list(user_values[index % len(user_values)]))
+        with open(inventory_path, "w", newline="") as target:
+            writer = csv.writer(target)
+            writer.writerow(header)
+            writer.writerows(body)
+        mapping = dict(MAPPING, BDDF_ID="BldgDDF", CDDF_ID="ContDDF", IDDF_ID="InvDDF", SOID="UserSOID")
+        mapping["InvCost"] = "InvCost"
+
+        for flc in ("Riverine", "CoastalV"):
+            results = {}
+            for engine in ("legacy", "vectorized"):
+                output_dir = self.temp_dir / "user_ddf" / flc / engine
+                success, message, row_errors = run_fast(
+                    inventory_path=str(inventory_path),
+                    mapping=mapping,
+                    flc=flc,
+                    rasters=[str(raster_path)],
+                    output_dir=str(output_dir),
+                    project_root=str(self.project_root),
+                    engine=engine,
+                )
+                results[engine] = (success, message.replace(str(output_dir), "<out>"), row_errors, output_dir)
+
+            legacy, vectorized = results["legacy"], results["vectorized"]
+            self.assertTrue(legacy[0], msg="legacy FAST run failed: {}".format(legacy[1]))
+            self.assertEqual(legacy[:3], vectorized[:3], msg="{}: run results differ".format(flc))
+            with open(legacy[3] / "inventory_synthetic_depth.csv", newline="") as result_file:
+                exposure = {row["flExp"] for row in csv.DictReader(result_file)}
+            self.assertEqual(exposure, {"0", "1"}, msg="{}: batch must mix wet and dry rows".format(flc))
+            legacy_files = sorted(path.name for path in legacy[3].glob("*.csv"))
+            self.assertEqual(legacy_files, sorted(path.name for path in vectorized[3].glob("*.csv")))
+            for name in legacy_files:
+                self.assertEqual(
+                    _sha256(legacy[3] / name),
+                    _sha256(vectorized[3] / name),
+                    msg="{}: {} differs between engines".format(flc, name),
+                )
+
+    def test_single_pass_matches_per_grid_runs(self):
+        try:
+            import rasterio
+        except Exception as exc:
+            self.skipTest("rasterio is required: {}".format(exc))
+
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+        from run_fast import run_fast
+
+        raster_paths = [self.temp_dir / "advisory_a.tif", self.temp_dir / "advisory_b.tif"]
+        for path in raster_paths:
+            self._write_raster(path)
+        with rasterio.open(raster_paths[1], "r+") as dst:
+            dst.write(dst.read(1) * 0.5, 1)
+        inventory_path = self.temp_dir / "inventory.csv"
+        self._write_inventory(inventory_path)
+
+        runs = {}
+        for single_pass in (False, True):
+            output_dir = self.temp_dir / ("single" if single_pass else "per_grid")
+            success, message, row_errors = run_fast(
+                inventory_path=str(inventory_path),
+                mapping=MAPPING,
+                flc="Riverine",
+                rasters=[str(path) for path in raster_paths],
+                output_dir=str(output_dir),
+                project_root=str(self.project_root),
+                engine="vectorized",
+                single_pass=single_pass,
+            )
+            self.assertTrue(success, msg=message)
+            runs[single_pass] = (message, row_errors, output_dir)
+
+        with open(runs[True][2] / "inventory_all_grids.csv", newline="") as combined_file:
+            combined = list(csv.DictReader(combined_file))
+        self.assertEqual(runs[True][1], runs[False][1])
+        for path in raster_paths:
+            with open(runs[False][2] / "inventory_{}.csv".format(path.stem), newline="") as grid_file:
+                expected = list(csv.DictReader(grid_file))
+            self.assertEqual([row for row in combined if row["GridName"] == path.name], expected)
+            self.assertIn("For depth-grid: {}\n".format(path.name), runs[True][0])
+
+    def test_worker_pool_writes_the_same_files(self):
+        try:
+            import rasterio  # noqa: F401
+        except Exception as exc:
+            self.skipTest("rasterio is required: {}".format(exc))
+
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+        import fast_vectorized
+        from run_fast import run_fast
+
+        raster_paths = [self.temp_dir / "advisory_a.tif", self.temp_dir / "advisory_b.tif"]
+        for path in raster_paths:
+            self._write_raster(path)
+        inventory_path = self.temp_dir / "inventory.csv"
+        self._write_inventory(inventory_path)
+        # A quoted line break must not be taken for a chunk boundary.
+        with open(inventory_path, newline="") as source:
+            rows = list(csv.reader(source))
+        rows[100][0] = "first line\nsecond line"
+        with open(inventory_path, "w", newline="") as target:
+            csv.writer(target).writerows(rows)
+
+        chunks = fast_vectorized._csv_chunk_ranges(str(inventory_path), 4096)
+        self.assertGreater(len(chunks), 10)
+
+        for single_pass in (False, True):
+            outputs = {}
+            for workers in (1, 3):
+                output_dir = self.temp_dir / "workers_{}_{}".format(workers, single_pass)
+                with mock.patch.object(fast_vectorized, "MIN_CHUNK_BYTES", 4096):
+                    success, message, row_errors = run_fast(
+                        inventory_path=str(inventory_path),
+                        mapping=MAPPING,
+                        flc="Riverine",
+                        rasters=[str(path) for path in raster_paths],
+                        output_dir=str(output_dir),
+                        project_root=str(self.project_root),
+                        engine="vectorized",
+                        single_pass=single_pass,
+                        workers=workers,
+                    )
+                self.assertTrue(success, msg=message)
+                outputs[workers] = (message.replace(str(output_dir), "<out>"), row_errors, output_dir)
+
+            self.assertEqual(outputs[1][:2], outputs[3][:2])
+            names = sorted(path.name for path in outputs[1][2].glob("*.csv"))
+            self.assertEqual(names, sorted(path.name for path in outputs[3][2].glob("*.csv")))
+            for name in names:
+                self.assertEqual(_sha256(outputs[1][2] / name), _sha256(outputs[3][2] / name), msg=name)
+
+    def test_parquet_results_hold_the_csv_values_typed(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            import rasterio  # noqa: F401
+        except Exception as exc:
+            self.skipTest("rasterio and pyarrow are required: {}".format(exc))
+
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+        import fast_vectorized
+        from run_fast import run_fast
+
+        raster_paths = [self.temp_dir / "advisory_a.tif", self.temp_dir / "advisory_b.tif"]
+        for path in raster_paths:
+            self._write_raster(path)
+        inventory_path = self.temp_dir / "inventory.csv"
+        self._write_inventory(inventory_path)
+
+        runs = {}
+        for single_pass, results_format, workers in [
+            (False, "csv", 1),
+            (False, "parquet", 1),
+            (True, "parquet", 1),
+            (True, "parquet", 3),
+        ]:
+            output_dir = self.temp_dir / "{}_{}_{}".format(results_format, single_pass, workers)
+            with mock.patch.object(fast_vectorized, "MIN_CHUNK_BYTES", 4096):
+                success, message, row_errors = run_fast(
+                    inventory_path=str(inventory_path),
+                    mapping=MAPPING,
+                    flc="Riverine",
+                    rasters=[str(path) for path in raster_paths],
+                    output_dir=str(output_dir),
+                    project_root=str(self.project_root),
+                    engine="vectorized",
+                    single_pass=single_pass,
+                    workers=workers,
+                    results_format=results_format,
+                )
+            self.assertTrue(success, msg=message)
+            runs[single_pass, results_format, workers] = (row_errors, output_dir)
+
+        csv_dir, parquet_dir = runs[False, "csv", 1][1], runs[False, "parquet", 1][1]
+        self.assertEqual(runs[False, "csv", 1][0], runs[False, "parquet", 1][0])
+        parquet_names = sorted(path.name for path in parquet_dir.iterdir())
+        self.assertEqual(parquet_names, ["inventory_advisory_a.parquet", "inventory_advisory_b.parquet"])
+        for path in raster_paths:
+            csv_path = csv_dir / "inventory_{}.csv".format(path.stem)
+            parquet_path = parquet_dir / "inventory_{}.parquet".format(path.stem)
+            table = pq.read_table(parquet_path)
+            self.assertLess(parquet_path.stat().st_size, csv_path.stat().st_size / 2)
+            self.assertEqual(table.schema.field("FltyId").type, pa.string())
+            self.assertEqual(table.schema.field("Cost").type, pa.float64())
+            self.assertEqual(table.schema.field("Depth_in_Struc").type, pa.float64())
+            with open(csv_path, newline="") as csv_file:
+                expected = list(csv.reader(csv_file))
+            # The second grid's CSV header repeats the output fields; Parquet keeps one copy.
+            self.assertEqual(table.column_names, list(dict.fromkeys(expected[0])))
+            self.assertEqual(table.num_rows, len(expected) - 1)
+            for name in table.column_names:
+                values = table.column(name).to_pylist()
+                index = expected[0].index(name)
+                for row, value in zip(expected[1:], values):
+                    if pa.types.is_floating(table.schema.field(name).type):
+                        try:
+                            number = float(row[index])
+                        except ValueError:
+                            number = None
+                        if value is not None and number is not None:
+                            # Depth_Grid keeps the raster's float32 cell exactly; the CSV has its repr.
+                            value, number = np.float32(value), np.float32(number)
+                        self.assertEqual(value, number, msg=name)
+                    else:
+                        self.assertEqual("" if value is None else value, row[index], msg=name)
+
+        # The single-pass table interleaves the per-grid rows, whatever the worker count.
+        combined = pq.read_table(runs[True, "parquet", 1][1] / "inventory_all_grids.parquet")
+        self.assertTrue(combined.equals(pq.read_table(runs[True, "parquet", 3][1] / "inventory_all_grids.parquet")))
+        per_grid = [pq.read_table(parquet_dir / "inventory_{}.parquet".format(path.stem)) for path in raster_paths]
+        grid_names = combined.column("GridName").to_pylist()
+        for path, table in zip(raster_paths, per_grid):
+            rows = [index for index, name in enumerate(grid_names) if name == path.name]
+            self.assertTrue(combined.take(rows).equals(table.select(combined.column_names)))
+
+    def test_typed_parquet_input_matches_the_row_engine(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            import rasterio  # noqa: F401
+        except Exception as exc:
+            self.skipTest("rasterio and pyarrow are required: {}".format(exc))
+
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+        from run_fast import run_fast
+
+        raster_path = self.temp_dir / "synthetic_depth.tif"
+        self._write_raster(raster_path)
+        with open(self.sample_source_csv, newline="") as source:
+            rows = list(csv.DictReader(source))
+        # Numeric columns stay numeric, with the nulls, NaNs and narrow types real files have.
+        rng = np.random.default_rng(9)
+
+        def numbers(name, arrow_type, blanks):
+            values = [float(row[name]) for row in rows]
+            return pa.array([None if rng.random() < blanks else v for v in values]).cast(arrow_type)
+
+        first_floor = np.array([float(row["FirstFloorHt"]) for row in rows], dtype=np.float32)
+        first_floor[rng.random(len(rows)) < 0.03] = np.nan
+        table = pa.table(
+            {
+                "FltyId": pa.array([int(row["FltyId"]) for row in rows], type=pa.int64()),
+                "Occ": pa.array([row["Occ"] for row in rows]),
+                "Cost": numbers("Cost", pa.int64(), 0.03),
+                "Area": numbers("Area", pa.int64(), 0.03),
+                "NumStories": numbers("NumStories", pa.int32(), 0.0),
+                "FoundationType": numbers("FoundationType", pa.int64(), 0.0),
+                "FirstFloorHt": pa.array(first_floor),
+                "ContentCost": numbers("ContentCost", pa.float64(), 0.02),
+                "Latitude": numbers("Latitude", pa.float64(), 0.02),
+                "Longitude": numbers("Longitude", pa.float64(), 0.0),
+            }
+        )
+        inventory_path = self.temp_dir / "inventory.parquet"
+        pq.write_table(table, inventory_path, row_group_size=500)
+
+        runs = {}
+        for engine, results_format in [("legacy", "csv"), ("vectorized", "csv"), ("vectorized", "parquet")]:
+            output_dir = self.temp_dir / "{}_{}".format(engine, results_format)
+            success, message, row_errors = run_fast(
+                inventory_path=str(inventory_path),
+                mapping=MAPPING,
+                flc="CoastalA",
+                rasters=[str(raster_path)],
+                output_dir=str(output_dir),
+                project_root=str(self.project_root),
+                engine=engine,
+                results_format=results_format,
+            )
+            self.assertTrue(success, msg=message)
+            runs[engine, results_format] = (row_errors, output_dir)
+
+        legacy, vectorized = runs["legacy", "csv"], runs["vectorized", "csv"]
+        self.assertEqual(legacy[0], vectorized[0])
+        for name in ("inventory_synthetic_depth.csv", "inventory_synthetic_depth_sorted.csv"):
+            self.assertEqual(_sha256(legacy[1] / name), _sha256(vectorized[1] / name), msg=name)
+
+        # Parquet results pass the typed input columns through unchanged.
+        results = pq.read_table(runs["vectorized", "parquet"][1] / "inventory_synthetic_depth.parquet")
+        self.assertEqual(results.schema.field("FltyId").type, pa.int64())
+        self.assertEqual(results.schema.field("NumStories").type, pa.int32())
+        self.assertEqual(results.schema.field("FirstFloorHt").type, pa.float32())
+        for name in table.column_names:
+            if name == "Occ":
+                continue
+            # Compared as raw buffers so that NaN cells count as equal.
+            self.assertEqual(
+                results.column(name).to_numpy(zero_copy_only=False).tobytes(),
+                table.column(name).to_numpy(zero_copy_only=False).tobytes(),
+                msg=name,
+            )
+
+    def test_depth_column_matches_sampling_the_raster(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            import rasterio  # noqa: F401
+        except Exception as exc:
+            self.skipTest("rasterio and pyarrow are required: {}".format(exc))
+
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+        from fast_raster import DepthRaster
+        from run_fast import run_fast
+
+        raster_path = self.temp_dir / "synthetic_depth.tif"
+        self._write_raster(raster_path)
+        csv_path = self.temp_dir / "inventory.csv"
+        self._write_inventory(csv_path)
+        with open(csv_path, newline="") as source:
+            rows = list(csv.DictReader(source))
+        columns = {name: pa.array([row[name] for row in rows]) for name in rows[0]}
+
+        # Depth_Grid as sampled upstream: the raster value, null off the grid or on nodata.
+        def coordinates(name):
+            return np.array([float(row[name]) for row in rows])
+
+        with DepthRaster(str(raster_path)) as raster:
+            _, hit, depth = raster.sample(coordinates("Latitude"), coordinates("Longitude"))
+        columns["Depth_Grid"] = pa.array(depth, mask=~hit)
+        inventory_path = self.temp_dir / "inventory.parquet"
+        pq.write_table(pa.table(columns), inventory_path)
+
+        outputs = {}
+        for depth_column in (None, "Depth_Grid"):
+            output_dir = self.temp_dir / "depth_{}".format(depth_column)
+            success, message, row_errors = run_fast(
+                inventory_path=str(inventory_path),
+                mapping=MAPPING,
+                flc="CoastalA",
+                rasters=[str(raster_path)],
+                output_dir=str(output_dir),
+                project_root=str(self.project_root),
+                engine="vectorized",
+                depth_column=depth_column,
+            )
+            self.assertTrue(success, msg=message)
+            outputs[depth_column] = (row_errors, output_dir)
+
+        self.assertEqual(outputs[None][0], outputs["Depth_Grid"][0])
+        for name in ("inventory_synthetic_depth.csv", "inventory_synthetic_depth_sorted.csv"):
+            self.assertEqual(
+                _sha256(outputs[None][1] / name), _sha256(outputs["Depth_Grid"][1] / name), msg=name
+            )
+
+        success, message, _ = run_fast(
+            inventory_path=str(inventory_path),
+            mapping=MAPPING,
+            flc="CoastalA",
+            rasters=[str(raster_path), str(raster_path)],
+            output_dir=str(self.temp_dir / "two_grids"),
+            project_root=str(self.project_root),
+            engine="vectorized",
+            depth_column="Depth_Grid",
+        )
+        self.assertFalse(success)
+
+    def test_fast_engine_returns_the_parquet_tables_in_memory(self):
+        try:
+            import pyarrow.parquet as pq
+            import rasterio  # noqa: F401
+        except Exception as exc:
+            self.skipTest("rasterio and pyarrow are required: {}".format(exc))
+
+        python_env_dir = self.project_root / "Python_env"
+        if str(python_env_dir) not in sys.path:
+            sys.path.insert(0, str(python_env_dir))
+        import fast_vectorized
+        from run_fast import FastEngine, run_fast
+
+        raster_paths = [self.temp_dir / "advisory_a.tif", self.temp_dir / "advisory_b.tif"]
+        for path in raster_paths:
+            self._write_raster(path)
+        inventory_dir = self.temp_dir / "inventory"
+        inventory_dir.mkdir()
+        inventory_path = inventory_dir / "inventory.csv"
+        self._write_inventory(inventory_path)
+
+        engine = FastEngine(MAPPING, project_root=str(self.project_root))
+        runs = {}
+        # Lookup tables are compiled once, by the constructor.
+        with mock.patch.object(fast_vectorized, "compile_lookup_tables", side_effect=AssertionError):
+            for flc in ("Riverine", "CoastalV"):
+                runs[flc] = engine.run(str(inventory_path), [str(path) for path in raster_paths], flc)
+
+        for flc, (success, message, row_errors, results) in runs.items():
+            self.assertTrue(success, msg=message)
+            self.assertEqual(sorted(results), ["inventory_advisory_a", "inventory_advisory_b"])
+            output_dir = self.temp_dir / flc
+            expected = run_fast(
+                inventory_path=str(inventory_path),
+                mapping=MAPPING,
+                flc=flc,
+                rasters=[str(path) for path in raster_paths],
+                output_dir=str(output_dir),
+                project_root=str(self.project_root),
+                engine="vectorized",
+                results_format="parquet",
+            )
+            self.assertEqual(expected[2], row_errors)
+            for name, table in results.items():
+                self.assertTrue(table.equals(pq.read_table(output_dir / (name + ".parquet"))), msg=name)
+        self.assertEqual(sorted(path.name for path in inventory_dir.iterdir()), ["inventory.csv"])
+
+        failed = engine.run(str(self.temp_dir / "missing.csv"), [str(raster_paths[0])], "Riverine")
+        self.assertFalse(failed[0])
+        self.assertEqual(failed[3], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
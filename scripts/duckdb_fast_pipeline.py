@@ -1,10 +1,25 @@
 """DuckDB-based FAST CSV pipeline — replaces row-by-row Python with a single SQL pass."""
 
 import argparse
+import glob
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
 
 import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import rasterio
 from rasterio.warp import transform_bounds
+from rasterio.windows import Window
+
+try:  # For `python -m scripts.duckdb_fast_pipeline` and `python scripts/duckdb_fast_pipeline.py`.
+    from .h3_spatial_index import h3_column, raster_to_h3_array
+    from .nsi_raw_to_parquet import has_unique_bids, stored_h3_resolutions
+except ImportError:  # pragma: no cover - exercised when the script is run directly.
+    from h3_spatial_index import h3_column, raster_to_h3_array  # type: ignore[import-not-found]
+    from nsi_raw_to_parquet import has_unique_bids, stored_h3_resolutions  # type: ignore[import-not-found]
 
 FAST_INPUT_COLUMNS = [
     "FltyId",
@@ -19,6 +34,20 @@ FAST_INPUT_COLUMNS = [
     "Longitude",
 ]
 
+# NSI columns the pipeline reads; every other column is left unread in the Parquet files.
+NSI_INPUT_COLUMNS = [
+    "bid",
+    "occtype",
+    "val_struct",
+    "sqft",
+    "num_story",
+    "found_type",
+    "found_ht",
+    "val_cont",
+    "latitude",
+    "longitude",
+]
+
 # Canonical NSI found_type -> FAST FoundationType mapping (single source of truth).
 # Both the DuckDB pipeline (SQL CASE) and the notebook (pandas .map) use this dict.
 FOUND_TYPE_MAP: dict[str, int] = {
@@ -46,6 +75,36 @@ FOUND_TYPE_MAP: dict[str, int] = {
 }
 FOUND_TYPE_DEFAULT = 7
 
+# Table registered by register_flood_cells: the raster's wet H3 cells, one UBIGINT per row.
+FLOOD_CELLS_TABLE = "fast_flood_cells"
+# SQL function registered by register_wet_cell_filter: (longitude, latitude) -> BOOLEAN.
+WET_CELL_FUNCTION = "fast_on_wet_cell"
+# SQL function registered by register_depth_sampler: (longitude, latitude) -> raster value.
+DEPTH_FUNCTION = "fast_depth"
+# Column the sampled depth is written to; run FAST with --depth-column Depth_Grid to use it.
+DEPTH_COLUMN = "Depth_Grid"
+
+# DuckDB type of the sampled value for each raster band dtype.
+DEPTH_SQL_TYPES: dict[str, str] = {
+    "float32": "FLOAT",
+    "float64": "DOUBLE",
+    "int8": "TINYINT",
+    "int16": "SMALLINT",
+    "int32": "INTEGER",
+    "int64": "BIGINT",
+    "uint8": "UTINYINT",
+    "uint16": "USMALLINT",
+    "uint32": "UINTEGER",
+}
+DEPTH_TILE_SIZE = 512
+DEPTH_CACHE_TILES = 64
+
+# COPY options of each output format build_fast_csv_duckdb can write.
+OUTPUT_FORMAT_OPTIONS: dict[str, str] = {
+    "csv": "HEADER, DELIMITER ','",
+    "parquet": "FORMAT parquet, COMPRESSION zstd",
+}
+
 
 def _found_type_sql_case() -> str:
     """Generate SQL CASE expression from FOUND_TYPE_MAP."""
@@ -65,33 +124,394 @@ def _raster_bbox_wgs84(raster_path: str):
     return bounds  # (left, bottom, right, top)
 
 
+def _parquet_bbox(path: str):
+    """Return (min_lon, min_lat, max_lon, max_lat) from the row-group statistics of an NSI
+    Parquet file, or None if the file has no rows or any row group lacks the statistics."""
+    metadata = pq.ParquetFile(path).metadata
+    names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+    if "longitude" not in names or "latitude" not in names or metadata.num_row_groups == 0:
+        return None
+    bounds = []
+    for name in ("longitude", "latitude"):
+        index = names.index(name)
+        low, high = [], []
+        for group in range(metadata.num_row_groups):
+            stats = metadata.row_group(group).column(index).statistics
+            if stats is None or not stats.has_min_max:
+                return None
+            low.append(stats.min)
+            high.append(stats.max)
+        bounds.append((min(low), max(high)))
+    (min_lon, max_lon), (min_lat, max_lat) = bounds
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def parquet_files_in_bbox(parquet_glob: str, bbox) -> list[str] | None:
+    """Local Parquet files matched by `parquet_glob` whose buildings can fall inside `bbox`.
+
+    `bbox` is (min_lon, min_lat, max_lon, max_lat). Files are judged by their footer
+    statistics only, so with the `state=<Name>/` layout every state outside the bbox is
+    skipped without reading its data; files without statistics are kept. Returns None for
+    remote globs (hf://, s3://, ...) and globs matching no local file: DuckDB then expands
+    the glob itself and can still skip row groups by their statistics.
+    """
+    if "://" in parquet_glob:
+        return None
+    paths = sorted(glob.glob(parquet_glob, recursive=True))
+    if not paths:
+        return None
+    min_lon, min_lat, max_lon, max_lat = bbox
+    kept = []
+    for path in paths:
+        bounds = _parquet_bbox(path)
+        if bounds is None or (
+            bounds[0] <= max_lon
+            and bounds[2] >= min_lon
+            and bounds[1] <= max_lat
+            and bounds[3] >= min_lat
+        ):
+            kept.append(path)
+    return kept
+
+
+def _cell_locator(src) -> Callable[[pa.ChunkedArray, pa.ChunkedArray], tuple[np.ndarray, ...]]:
+    """Return ``locate(lon, lat) -> (inside, row, col)`` for WGS84 point arrays on ``src``.
+
+    Points are reprojected into the raster CRS the way FAST's ``DepthRaster`` does (not at
+    all for unreferenced or WGS84 grids) and mapped to cells through the inverse affine
+    transform; ``row``/``col`` are 0 where the point is off the grid.
+    """
+    inverse = ~src.transform
+    width, height = src.width, src.height
+    transformer = None
+    if src.crs is not None:
+        from pyproj import CRS, Transformer
+
+        raster_crs = CRS.from_user_input(src.crs.to_wkt())
+        if not raster_crs.equals("EPSG:4326", ignore_axis_order=True):
+            transformer = Transformer.from_crs("EPSG:4326", raster_crs, always_xy=True)
+
+    def locate(lon: pa.ChunkedArray, lat: pa.ChunkedArray) -> tuple[np.ndarray, ...]:
+        x = lon.to_numpy().astype(np.float64)
+        y = lat.to_numpy().astype(np.float64)
+        if transformer is not None:
+            with np.errstate(invalid="ignore"):
+                x, y = transformer.transform(x, y, errcheck=False)
+            x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        with np.errstate(invalid="ignore", over="ignore"):
+            col = np.floor(inverse.a * x + inverse.b * y + inverse.c)
+            row = np.floor(inverse.d * x + inverse.e * y + inverse.f)
+            inside = (col >= 0) & (col < width) & (row >= 0) & (row < height)
+        row = np.where(inside, row, 0).astype(np.int64)
+        col = np.where(inside, col, 0).astype(np.int64)
+        return inside, row, col
+
+    return locate
+
+
+def _dilate(mask: np.ndarray, radius: int) -> np.ndarray:
+    """Grow a boolean mask by ``radius`` cells in every direction (a square window)."""
+    for axis in (0, 1):
+        grown = mask.copy()
+        for shift in range(1, radius + 1):
+            if axis == 0:
+                grown[shift:] |= mask[:-shift]
+                grown[:-shift] |= mask[shift:]
+            else:
+                grown[:, shift:] |= mask[:, :-shift]
+                grown[:, :-shift] |= mask[:, shift:]
+        mask = grown
+    return mask
+
+
+def raster_wet_cells(raster_path: str, buffer_pixels: int = 0) -> np.ndarray:
+    """Sorted flat indexes (``row * width + col``) of the cells with depth > 0.
+
+    With ``buffer_pixels`` every cell within that many pixels of a wet cell (a square
+    window) counts as wet too. The band is read in block-aligned row strips plus a halo of
+    ``buffer_pixels`` rows, so memory follows the wet footprint, not the grid size.
+    """
+    if buffer_pixels < 0:
+        raise ValueError("buffer_pixels must be >= 0")
+    keys = []
+    with rasterio.open(raster_path) as src:
+        nodata = src.nodata
+        block_rows = src.block_shapes[0][0]
+        strip_rows = max(block_rows, (512 // block_rows) * block_rows)
+        for row_off in range(0, src.height, strip_rows):
+            rows = min(strip_rows, src.height - row_off)
+            top = max(0, row_off - buffer_pixels)
+            bottom = min(src.height, row_off + rows + buffer_pixels)
+            data = src.read(1, window=Window(0, top, src.width, bottom - top))
+            with np.errstate(invalid="ignore"):
+                wet = data > 0
+            if nodata is not None:
+                wet &= data != nodata
+            wet = _dilate(wet, buffer_pixels)[row_off - top : row_off - top + rows]
+            wet_rows, wet_cols = np.nonzero(wet)
+            keys.append((wet_rows.astype(np.int64) + row_off) * src.width + wet_cols)
+    return np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+
+
+def register_wet_cell_filter(
+    con: duckdb.DuckDBPyConnection,
+    raster_path: str,
+    buffer_pixels: int = 0,
+    name: str = WET_CELL_FUNCTION,
+) -> int:
+    """Register ``name(longitude, latitude)`` on ``con``: true where the point's raster cell is wet.
+
+    Points are reprojected into the raster CRS with pyproj and mapped to cells through the
+    inverse affine transform, a DuckDB vector at a time; points off the grid are false.
+    Returns the number of wet cells (after the buffer).
+    """
+    keys = raster_wet_cells(raster_path, buffer_pixels)
+    with rasterio.open(raster_path) as src:
+        width = src.width
+        locate = _cell_locator(src)
+
+    def on_wet_cell(lon: pa.ChunkedArray, lat: pa.ChunkedArray) -> pa.Array:
+        inside, row, col = locate(lon, lat)
+        key = row * width + col
+        wet = np.zeros(len(key), dtype=bool)
+        if len(keys):
+            found = np.minimum(np.searchsorted(keys, key), len(keys) - 1)
+            wet = inside & (keys[found] == key)
+        return pa.array(wet)
+
+    con.create_function(name, on_wet_cell, ["DOUBLE", "DOUBLE"], "BOOLEAN", type="arrow")
+    return len(keys)
+
+
+class DepthSampler:
+    """Band 1 of a depth raster sampled at WGS84 points, as a vectorized DuckDB function.
+
+    Values are read in ``tile_size`` windows kept in a small least-recently-used cache, so
+    the band is never read whole. A point gets the raw cell value FAST's ``DepthRaster``
+    would read, or NULL where FAST would find no value (off the grid or on nodata).
+    """
+
+    def __init__(
+        self,
+        raster_path: str,
+        tile_size: int = DEPTH_TILE_SIZE,
+        cache_tiles: int = DEPTH_CACHE_TILES,
+    ):
+        self.src = rasterio.open(raster_path)
+        self.dtype = np.dtype(self.src.dtypes[0])
+        if self.dtype.name not in DEPTH_SQL_TYPES:
+            self.src.close()
+            raise ValueError(f"unsupported raster data type {self.dtype.name}")
+        self.sql_type = DEPTH_SQL_TYPES[self.dtype.name]
+        self.nodata = self.src.nodata
+        self.locate = _cell_locator(self.src)
+        self.tile_size = tile_size
+        self.tiles_across = -(-self.src.width // tile_size)
+        self.cache_tiles = cache_tiles
+        self._tiles: OrderedDict[int, np.ndarray] = OrderedDict()
+
+    def close(self) -> None:
+        self._tiles.clear()
+        self.src.close()
+
+    def _tile(self, tile_id: int) -> np.ndarray:
+        tile = self._tiles.get(tile_id)
+        if tile is not None:
+            self._tiles.move_to_end(tile_id)
+            return tile
+        row_off = (tile_id // self.tiles_across) * self.tile_size
+        col_off = (tile_id % self.tiles_across) * self.tile_size
+        window = Window(
+            col_off,
+            row_off,
+            min(self.tile_size, self.src.width - col_off),
+            min(self.tile_size, self.src.height - row_off),
+        )
+        tile = self._tiles[tile_id] = self.src.read(1, window=window)
+        if len(self._tiles) > self.cache_tiles:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def __call__(self, lon: pa.ChunkedArray, lat: pa.ChunkedArray) -> pa.Array:
+        inside, row, col = self.locate(lon, lat)
+        values = np.zeros(len(inside), dtype=self.dtype)
+        points = np.flatnonzero(inside)
+        tile_rows, tile_cols = row[points] // self.tile_size, col[points] // self.tile_size
+        tile_ids = tile_rows * self.tiles_across + tile_cols
+        for tile_id in np.unique(tile_ids).tolist():
+            picked = points[tile_ids == tile_id]
+            tile = self._tile(tile_id)
+            values[picked] = tile[row[picked] % self.tile_size, col[picked] % self.tile_size]
+        hit = inside
+        if self.nodata is not None:
+            hit = inside & (~np.isnan(values) if np.isnan(self.nodata) else values != self.nodata)
+        return pa.array(values, mask=~hit)
+
+
+def register_depth_sampler(
+    con: duckdb.DuckDBPyConnection, raster_path: str, name: str = DEPTH_FUNCTION
+) -> DepthSampler:
+    """Register ``name(longitude, latitude)`` on ``con``, returning the raster value at each point.
+
+    The returned sampler holds the raster open; close it once the queries are done.
+    """
+    sampler = DepthSampler(raster_path)
+    # "special" null handling lets the function return NULL (and see NULL coordinates).
+    con.create_function(
+        name, sampler, ["DOUBLE", "DOUBLE"], sampler.sql_type, type="arrow", null_handling="special"
+    )
+    return sampler
+
+
+def register_flood_cells(
+    con: duckdb.DuckDBPyConnection,
+    raster_path: str,
+    resolution: int,
+    name: str = FLOOD_CELLS_TABLE,
+    use_cache: bool = False,
+) -> tuple[int, int] | None:
+    """Register table ``name(cell UBIGINT)`` on ``con``: the H3 cells at ``resolution`` holding
+    a wet pixel of the raster (see ``raster_to_h3_array``; with ``use_cache`` they are cached
+    next to the raster).
+
+    Returns the (lowest, highest) cell, which bound a filter on a stored ``h3_r{N}`` column
+    that the Parquet scan can check against row-group statistics, or None without cells.
+    """
+    cells = raster_to_h3_array(raster_path, resolution, use_cache=use_cache)
+    con.register(name, pa.table({"cell": pa.array(cells, type=pa.uint64())}))
+    return (int(cells[0]), int(cells[-1])) if len(cells) else None
+
+
+def files_missing_h3_column(files: list[str] | None, resolution: int) -> list[str]:
+    """Those of `files` without the stored `h3_r{resolution}` column."""
+    return [path for path in files or [] if resolution not in stored_h3_resolutions(path)]
+
+
+def files_have_unique_bids(files: list[str] | None) -> bool:
+    """Whether no bid can appear twice across `files`, so the pipeline may skip its dedup.
+
+    Each file must carry the uniqueness flag `nsi_raw_to_parquet` writes and sit in a
+    `state=<Name>/` directory, with no two files of the same state: NSI assigns every
+    structure to one state, so distinct `state=` partitions never share a bid, but two
+    files of one state could, even from different directories (e.g. two ingests).
+    """
+    if not files:
+        return False
+    states = set()
+    for path in files:
+        key, _, state = Path(path).parent.name.partition("=")
+        if key != "state" or not state or state in states:
+            return False
+        states.add(state)
+    return all(has_unique_bids(path) for path in files)
+
+
 def build_fast_csv_duckdb(
     parquet_glob: str,
     raster_path: str,
     output_csv: str,
     flc: str = "CoastalA",
     occupancy_csv: str | None = None,
+    wet_only: bool = False,
+    wet_buffer_pixels: int = 0,
+    sample_depth: bool = False,
+    output_format: str = "csv",
+    h3_resolution: int | None = None,
+    cache_flood_cells: bool = False,
 ) -> int:
     """Build FAST CSV from NSI parquet files using DuckDB.
 
     `flc` and `occupancy_csv` are accepted for backward compatibility with older
     callers, but the DuckDB extraction step does not use them.
+
+    Buildings are selected by the raster's WGS84 bounding box. Only the NSI columns listed
+    in `NSI_INPUT_COLUMNS` are read, the bbox predicates are pushed into the Parquet scan
+    (row groups outside it are skipped by their statistics), `state=<Name>/` directories
+    are read as Hive partitions, and local files entirely outside the bbox are not opened
+    by the query at all (see `parquet_files_in_bbox`).
+
+    A bid that appears more than once is written once, with its highest `val_struct`. When
+    every file read was deduplicated at ingest (see `files_have_unique_bids`) this step is
+    skipped; otherwise it is an `arg_max` aggregate per bid.
+
+    With `h3_resolution`, only buildings whose H3 cell at that resolution holds a wet
+    pixel are read: the raster's wet cells (see `register_flood_cells`) are semi-joined
+    with the `h3_r{N}` column `nsi_raw_to_parquet` stores, and row groups whose cell range
+    misses them are skipped, so no coordinate is indexed at run time. Local files without
+    the column raise ValueError (add it with `add_h3_columns`). With `cache_flood_cells`,
+    the wet cells are cached next to the raster for later runs.
+
+    With `wet_only`, only buildings whose raster cell has depth > 0, or lies within
+    `wet_buffer_pixels` pixels of such a cell, are written (see
+    `register_wet_cell_filter`); the others would be reported by FAST as not exposed.
+
+    With `sample_depth`, each building's raster value is sampled during the same pass and
+    written as a `Depth_Grid` column (empty off the grid or on nodata), so FAST can take
+    it with `--depth-column Depth_Grid` instead of sampling the raster again.
+
+    `output_format="parquet"` writes a zstd-compressed Parquet file with typed columns
+    instead of CSV; `run_fast.py` reads either. Returns the number of rows written, as
+    reported by the COPY itself.
     """
     _ = flc, occupancy_csv
-    min_lon, min_lat, max_lon, max_lat = _raster_bbox_wgs84(raster_path)
+    if output_format not in OUTPUT_FORMAT_OPTIONS:
+        raise ValueError(
+            f"output_format must be one of {sorted(OUTPUT_FORMAT_OPTIONS)}, got {output_format!r}"
+        )
+    min_lon, min_lat, max_lon, max_lat = bbox = _raster_bbox_wgs84(raster_path)
+    files = parquet_files_in_bbox(parquet_glob, bbox)
+    if h3_resolution is not None:
+        # With no file in the bbox DuckDB binds the query against the glob's own files.
+        checked = files if files != [] else sorted(glob.glob(parquet_glob, recursive=True))
+        missing = files_missing_h3_column(checked, h3_resolution)
+        if missing:
+            raise ValueError(
+                f"{len(missing)} Parquet file(s) lack the {h3_column(h3_resolution)} column, "
+                f"e.g. {missing[0]}; add it with nsi_raw_to_parquet.add_h3_columns"
+            )
+    # With no file left, the glob still gives DuckDB the schema; the bbox filter then skips
+    # every row group by its statistics.
+    source = "[" + ", ".join(f"'{path}'" for path in files) + "]" if files else f"'{parquet_glob}'"
+    if files_have_unique_bids(files):
+        buildings_sql = "SELECT * FROM raw"
+    else:
+        # One row per bid, the one with the highest val_struct (ties broken arbitrarily).
+        buildings_sql = "SELECT unnest(arg_max(raw, val_struct)) FROM raw GROUP BY bid"
 
     con = duckdb.connect()
     con.install_extension("spatial")
     con.load_extension("spatial")
+    h3_filter = ""
+    if h3_resolution is not None:
+        cell_range = register_flood_cells(
+            con, raster_path, h3_resolution, use_cache=cache_flood_cells
+        )
+        column = h3_column(h3_resolution)
+        if cell_range is None:
+            h3_filter = "AND FALSE"
+        else:
+            # The constant range is checked against row-group statistics; the semi-join is exact.
+            h3_filter = (
+                f"AND {column} BETWEEN {cell_range[0]} AND {cell_range[1]}\n"
+                f"              AND {column} IN (SELECT cell FROM {FLOOD_CELLS_TABLE})"
+            )
+    wet_filter = ""
+    if wet_only:
+        register_wet_cell_filter(con, raster_path, wet_buffer_pixels)
+        wet_filter = f"WHERE {WET_CELL_FUNCTION}(longitude, latitude)"
+    depth_select = ""
+    sampler = None
+    if sample_depth:
+        sampler = register_depth_sampler(con, raster_path)
+        depth_select = (
+            f",\n            {DEPTH_FUNCTION}(longitude, latitude)       AS {DEPTH_COLUMN}"
+        )
 
     sql = f"""
     COPY (
         WITH raw AS (
-            SELECT *,
-                ROW_NUMBER() OVER (
-                    PARTITION BY bid ORDER BY val_struct DESC
-                ) AS _rn
-            FROM read_parquet('{parquet_glob}')
+            SELECT {", ".join(NSI_INPUT_COLUMNS)}
+            FROM read_parquet({source}, hive_partitioning = true)
             WHERE latitude  BETWEEN {min_lat} AND {max_lat}
               AND longitude BETWEEN {min_lon} AND {max_lon}
               AND bid        IS NOT NULL
@@ -103,6 +523,10 @@ def build_fast_csv_duckdb(
               AND found_ht   IS NOT NULL
               AND latitude   IS NOT NULL
               AND longitude  IS NOT NULL
+              {h3_filter}
+        ),
+        buildings AS (
+            {buildings_sql}
         )
         SELECT
             bid                                          AS FltyId,
@@ -114,15 +538,19 @@ def build_fast_csv_duckdb(
             found_ht                                     AS FirstFloorHt,
             COALESCE(val_cont, 0)                        AS ContentCost,
             latitude                                     AS Latitude,
-            longitude                                    AS Longitude
-        FROM raw
-        WHERE _rn = 1
-    ) TO '{output_csv}' (HEADER, DELIMITER ',');
+            longitude                                    AS Longitude{depth_select}
+        FROM buildings
+        {wet_filter}
+    ) TO '{output_csv}' ({OUTPUT_FORMAT_OPTIONS[output_format]});
     """
 
-    con.execute(sql)
-    count = con.execute("SELECT COUNT(*) FROM read_csv_auto(?)", [output_csv]).fetchone()[0]
-    con.close()
+    try:
+        # COPY returns the number of rows it wrote; no need to read the output back.
+        count = con.execute(sql).fetchone()[0]
+    finally:
+        con.close()
+        if sampler is not None:
+            sampler.close()
     return count
 
 
@@ -130,7 +558,13 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="DuckDB FAST CSV pipeline")
     parser.add_argument("--parquet-glob", required=True, help="Glob pattern for parquet files")
     parser.add_argument("--raster", required=True, help="Path to depth raster (GeoTIFF)")
-    parser.add_argument("--output", required=True, help="Output CSV path")
+    parser.add_argument("--output", required=True, help="Output CSV (or Parquet) path")
+    parser.add_argument(
+        "--format",
+        choices=sorted(OUTPUT_FORMAT_OPTIONS),
+        default="csv",
+        help="Output file format; parquet is zstd-compressed with typed columns",
+    )
     parser.add_argument(
         "--flc",
         default="CoastalA",
@@ -139,7 +573,54 @@ if __name__ == "__main__":
             "category is supplied when running FAST, not when generating the CSV."
         ),
     )
+    parser.add_argument(
+        "--wet-only",
+        action="store_true",
+        help=(
+            "Write only buildings on raster cells with depth > 0 instead of every building "
+            "in the raster bbox"
+        ),
+    )
+    parser.add_argument(
+        "--wet-buffer-pixels",
+        type=int,
+        default=0,
+        help="With --wet-only, also keep buildings within this many pixels of a wet cell",
+    )
+    parser.add_argument(
+        "--h3-resolution",
+        type=int,
+        default=None,
+        help=(
+            "Read only buildings whose stored h3_r<N> cell holds a wet pixel "
+            "(files must have the column)"
+        ),
+    )
+    parser.add_argument(
+        "--no-flood-cache",
+        action="store_true",
+        help="With --h3-resolution, neither read nor write the wet cells cached next to the raster",
+    )
+    parser.add_argument(
+        "--sample-depth",
+        action="store_true",
+        help=(
+            "Also write each building's raster value as a Depth_Grid column "
+            "(run FAST with --depth-column Depth_Grid)"
+        ),
+    )
     args = parser.parse_args()
 
-    n = build_fast_csv_duckdb(args.parquet_glob, args.raster, args.output, flc=args.flc)
+    n = build_fast_csv_duckdb(
+        args.parquet_glob,
+        args.raster,
+        args.output,
+        flc=args.flc,
+        wet_only=args.wet_only,
+        wet_buffer_pixels=args.wet_buffer_pixels,
+        sample_depth=args.sample_depth,
+        output_format=args.format,
+        h3_resolution=args.h3_resolution,
+        cache_flood_cells=not args.no_flood_cache,
+    )
     print(f"Wrote {n:,} rows to {args.output}")
@@ -1,61 +1,678 @@
-"""H3 hexagonal pre-indexing for fast spatial filtering of NSI buildings against flood rasters."""
+"""H3 hexagonal pre-indexing for fast spatial filtering of NSI buildings against flood rasters.
+
+On request (``use_cache=True``; the CLI does so unless given ``--no-cache``), the flood
+cells of a raster are cached as ``<raster dir>/.cache/<raster>.h3_r<N>_<key>.npz``, or in
+an explicit ``cache_dir``, where the key is a SHA-256 over the raster's contents, the
+resolution and the wet threshold, so re-runs and other processes using the same GeoTIFF
+skip the pixel scan.
+"""
 
 import argparse
+import hashlib
+import logging
+import os
+import tempfile
+import warnings
+from collections.abc import Iterator
+from itertools import repeat
+from pathlib import Path
 
 import h3
 import numpy as np
 import pyarrow as pa
 import pyarrow.parquet as pq
 import rasterio
-from rasterio.transform import xy
+from h3.api import basic_int as h3_int
+from rasterio.warp import transform_bounds
+from rasterio.windows import Window
+from rasterio.windows import bounds as window_bounds
 
+logger = logging.getLogger(__name__)
 
-def raster_to_h3_cells(raster_path: str, resolution: int = 7, stride: int = 4) -> set[str]:
-    """Convert valid flood pixels to H3 cell IDs, sampling every Nth pixel."""
-    with rasterio.open(raster_path) as src:
-        data = src.read(1)
-        nodata = src.nodata
-        mask = data > 0
-        if nodata is not None:
-            mask &= data != nodata
+# Rows per Parquet batch streamed by filter_buildings_by_h3.
+BATCH_ROWS = 262_144
+# Largest quadtree block, in pixels, used by raster_to_h3_array.
+MAX_BLOCK_PIXELS = 256
+# Kilometres per degree of latitude, rounded down so padding errs on the large side.
+KM_PER_DEGREE = 110.0
+# Prefix of the precomputed H3 columns nsi_raw_to_parquet writes (h3_r9 holds res 9 cells).
+H3_COLUMN_PREFIX = "h3_r"
+# Layout of a uint64 H3 cell index: 4 resolution bits at bit 52, then 15 three-bit digits
+# (digit r at bit 3 * (15 - r)); digits finer than the cell's resolution are all ones.
+H3_MAX_RESOLUTION = 15
+H3_RESOLUTION_SHIFT = 52
+H3_RESOLUTION_MASK = np.uint64(0xF << H3_RESOLUTION_SHIFT)
+# Every digit set to 6, the largest child digit.
+H3_SIX_DIGITS = np.uint64(int("110" * H3_MAX_RESOLUTION, 2))
+# Row strips of the raster compacted together by H3FloodIndex.from_raster.
+COMPACT_EVERY_STRIPS = 8
+CACHE_DIR_NAME = ".cache"
+# Bump when the cached layout or the cell computation changes.
+CACHE_VERSION = 1
+# Bytes read at a time when hashing a raster.
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def h3_column(resolution: int) -> str:
+    """Name of the uint64 column holding each building's H3 cell at `resolution`."""
+    return f"{H3_COLUMN_PREFIX}{resolution}"
+
+
+def h3_column_resolutions(names) -> list[int]:
+    """Sorted resolutions of the precomputed H3 columns among the column `names`."""
+    return sorted(
+        int(name[len(H3_COLUMN_PREFIX) :])
+        for name in names
+        if name.startswith(H3_COLUMN_PREFIX) and name[len(H3_COLUMN_PREFIX) :].isdigit()
+    )
+
+
+def _row_strips(src, target_rows: int = 512) -> Iterator[Window]:
+    """Full-width windows aligned to the raster's internal blocks, top to bottom."""
+    block_rows = src.block_shapes[0][0]
+    strip_rows = max(block_rows, (target_rows // block_rows) * block_rows)
+    for row_off in range(0, src.height, strip_rows):
+        yield Window(0, row_off, src.width, min(strip_rows, src.height - row_off))
+
+
+def _block_pixels(src, resolution: int, transformer) -> int:
+    """Initial quadtree block side in pixels: about one H3 edge length, as a power of two."""
+    rows = np.array([src.height // 2, src.height // 2])
+    cols = np.array([src.width // 2, src.width // 2 + 1])
+    lat, lon = _pixel_latlng(src.transform, transformer, rows, cols)
+    pixel_km = h3.great_circle_distance((lat[0], lon[0]), (lat[1], lon[1]), unit="km")
+    edge_km = h3.average_hexagon_edge_length(resolution, unit="km")
+    if not np.isfinite(pixel_km) or pixel_km <= 0 or pixel_km >= edge_km:
+        return 1
+    return int(min(MAX_BLOCK_PIXELS, 2 ** np.floor(np.log2(edge_km / pixel_km))))
 
-        rows, cols = np.where(mask)
-        rows, cols = rows[::stride], cols[::stride]
-        xs, ys = xy(src.transform, rows, cols)
 
-        # xs/ys are in CRS coords; reproject to lon/lat if needed
+def _pixel_latlng(transform, transformer, rows: np.ndarray, cols: np.ndarray):
+    """Latitude and longitude of pixel centers."""
+    x = transform.a * (cols + 0.5) + transform.b * (rows + 0.5) + transform.c
+    y = transform.d * (cols + 0.5) + transform.e * (rows + 0.5) + transform.f
+    if transformer is not None:
+        x, y = transformer.transform(x, y)
+    return np.asarray(y, dtype=np.float64), np.asarray(x, dtype=np.float64)
+
+
+def _wet_strip_cells(mask: np.ndarray, row_off: int, block: int, pixel_cells) -> list[np.ndarray]:
+    """H3 cells of every wet pixel of one strip, found by quadtree refinement.
+
+    Blocks without a wet pixel are dropped using a summed-area table. A wet block whose
+    four corner pixels lie in the same cell lies wholly in that cell (cells are convex at
+    the scale of a block), so it adds that cell; otherwise it is split in four, down to
+    single pixels. H3 lookups therefore follow the number of cells and the length of
+    their boundaries inside the footprint, not the number of wet pixels.
+    """
+    height, width = mask.shape
+    wet_sum = np.zeros((height + 1, width + 1), dtype=np.int32)
+    wet_sum[1:, 1:] = mask.cumsum(axis=0, dtype=np.int32).cumsum(axis=1, dtype=np.int32)
+    grid = np.meshgrid(np.arange(0, height, block), np.arange(0, width, block), indexing="ij")
+    r0, c0 = grid[0].ravel(), grid[1].ravel()
+    found = []
+    size = block
+    while len(r0):
+        r1, c1 = np.minimum(r0 + size, height), np.minimum(c0 + size, width)
+        wet = (wet_sum[r1, c1] - wet_sum[r0, c1] - wet_sum[r1, c0] + wet_sum[r0, c0]) > 0
+        r0, c0, r1, c1 = r0[wet], c0[wet], r1[wet], c1[wet]
+        if size == 1:
+            found.append(pixel_cells(r0 + row_off, c0))
+            break
+        # Corners one pixel past the block (where there is one) are shared with the
+        # neighbouring blocks, so each distinct corner pixel is looked up once.
+        far_r, far_c = np.minimum(r0 + size, height - 1), np.minimum(c0 + size, width - 1)
+        keys = np.concatenate(
+            [r0 * width + c0, r0 * width + far_c, far_r * width + c0, far_r * width + far_c]
+        )
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        corners = pixel_cells(unique_keys // width + row_off, unique_keys % width)
+        corners = corners[inverse].reshape(4, -1)
+        whole = (corners == corners[0]).all(axis=0)
+        found.append(corners[0][whole])
+        r0, c0, r1, c1 = r0[~whole], c0[~whole], r1[~whole], c1[~whole]
+        size //= 2
+        children_r, children_c = [], []
+        for dr, dc in ((0, 0), (0, size), (size, 0), (size, size)):
+            inside = (r0 + dr < r1) & (c0 + dc < c1)
+            children_r.append(r0[inside] + dr)
+            children_c.append(c0[inside] + dc)
+        r0, c0 = np.concatenate(children_r), np.concatenate(children_c)
+    return found
+
+
+def _raster_strip_cells(
+    raster_path: str, resolution: int, threshold: float = 0.0
+) -> Iterator[tuple[np.ndarray, tuple[float, float, float, float]]]:
+    """Unique uint64 H3 cells of the wet pixels of each full-width row strip with any, top
+    to bottom, with the WGS84 (min_lon, min_lat, max_lon, max_lat) of those pixels."""
+    with rasterio.open(raster_path) as src:
+        nodata = src.nodata
+        transformer = None
+        # Pixel coordinates are in CRS units; reproject to lon/lat if needed
         if src.crs and not src.crs.is_geographic:
             from pyproj import Transformer
 
             transformer = Transformer.from_crs(src.crs, "EPSG:4326", always_xy=True)
-            xs, ys = transformer.transform(xs, ys)
 
-        return {h3.latlng_to_cell(lat, lon, resolution) for lon, lat in zip(xs, ys)}
+        def pixel_cells(rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+            lat, lon = _pixel_latlng(src.transform, transformer, rows, cols)
+            return latlng_to_cells(lat, lon, resolution)
+
+        block = _block_pixels(src, resolution, transformer)
+        for window in _row_strips(src):
+            data = src.read(1, window=window)
+            mask = data > threshold
+            if nodata is not None:
+                mask &= data != nodata
+            if not mask.any():
+                continue
+            strip_cells = _wet_strip_cells(mask, window.row_off, block, pixel_cells)
+            cells = np.unique(np.concatenate(strip_cells))
+            wet_rows = np.flatnonzero(mask.any(axis=1))
+            wet_cols = np.flatnonzero(mask.any(axis=0))
+            wet_window = Window(
+                wet_cols[0],
+                window.row_off + wet_rows[0],
+                wet_cols[-1] - wet_cols[0] + 1,
+                wet_rows[-1] - wet_rows[0] + 1,
+            )
+            bounds = window_bounds(wet_window, src.transform)
+            if transformer is not None:
+                bounds = transform_bounds(src.crs, "EPSG:4326", *bounds)
+            # Pixels whose coordinates could not be computed get cell 0, not a valid cell.
+            yield cells[cells != 0], tuple(float(value) for value in bounds)
+
+
+def raster_to_h3_array(
+    raster_path: str,
+    resolution: int = 7,
+    threshold: float = 0.0,
+    use_cache: bool = False,
+    cache_dir: str | None = None,
+) -> np.ndarray:
+    """Sorted uint64 H3 cells at `resolution` containing the center of any wet pixel.
+
+    A pixel is wet when its value is > `threshold` and not nodata. The result is the exact
+    set of cells of all wet pixels, computed block by block (see `_wet_strip_cells`). The
+    band is read in full-width row strips, so memory stays bounded by one strip plus the
+    cells. With `use_cache` the cells come from (or go to) the raster's cached flood index
+    (see `load_flood_index`).
+    """
+    if use_cache:
+        index = load_flood_index(
+            raster_path, resolution, threshold, use_cache=True, cache_dir=cache_dir
+        )
+        return index.to_array()
+    found = [cells for cells, _ in _raster_strip_cells(raster_path, resolution, threshold)]
+    return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.uint64)
+
+
+def raster_to_h3_cells(
+    raster_path: str,
+    resolution: int = 7,
+    stride: int | None = None,
+    threshold: float = 0.0,
+    use_cache: bool = False,
+    cache_dir: str | None = None,
+) -> set[str]:
+    """Convert valid flood pixels to H3 cell IDs: every cell holding a wet pixel center.
+
+    `stride` is deprecated and ignored: it sampled every stride-th wet pixel in the former
+    version, whereas every wet pixel is now covered, so passing it raises a
+    DeprecationWarning. See `raster_to_h3_array` for the cells as sorted integers, which
+    `filter_buildings_by_h3` takes directly.
+    """
+    if stride is not None:
+        warnings.warn(
+            "raster_to_h3_cells: stride is ignored; every wet pixel is covered",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+    cells = raster_to_h3_array(
+        raster_path, resolution, threshold, use_cache=use_cache, cache_dir=cache_dir
+    )
+    return {h3.int_to_str(cell) for cell in cells.tolist()}
+
+
+def cells_to_array(cells) -> np.ndarray:
+    """Sorted, unique uint64 H3 indexes from cell strings or integers."""
+    if isinstance(cells, np.ndarray):
+        return np.unique(cells.astype(np.uint64))
+    values = [h3.str_to_int(cell) if isinstance(cell, str) else cell for cell in cells]
+    return np.unique(np.array(values, dtype=np.uint64))
+
+
+def _cells_bounds(cells: np.ndarray) -> tuple[float, float, float, float] | None:
+    """(min_lon, min_lat, max_lon, max_lat) containing every cell, or None if the cells
+    cross the antimeridian or reach a pole (no single longitude range covers them).
+
+    Cell centers are padded by twice the average edge length of their resolution (a cell's
+    vertices lie within about 1.1 edge lengths of its center), which is much cheaper than
+    computing every cell boundary. Cells may mix resolutions.
+    """
+    centers = np.fromiter(
+        (value for cell in cells.tolist() for value in h3_int.cell_to_latlng(cell)),
+        dtype=np.float64,
+        count=2 * len(cells),
+    ).reshape(-1, 2)
+    lats, lons = centers[:, 0], centers[:, 1]
+    resolutions = cell_resolutions(cells)
+    edge_km = np.array(
+        [h3.average_hexagon_edge_length(r, unit="km") for r in range(H3_MAX_RESOLUTION + 1)]
+    )
+    lat_pad = 2.0 * edge_km[resolutions] / KM_PER_DEGREE
+    max_abs_lat = (np.abs(lats) + lat_pad).max()
+    if max_abs_lat >= 89.0 or lons.max() - lons.min() > 180.0:
+        return None
+    lon_pad = lat_pad / np.cos(np.radians(max_abs_lat))
+    return (
+        (lons - lon_pad).min(),
+        (lats - lat_pad).min(),
+        (lons + lon_pad).max(),
+        (lats + lat_pad).max(),
+    )
+
+
+def latlng_to_cells(lat: np.ndarray, lon: np.ndarray, resolution: int) -> np.ndarray:
+    """uint64 H3 index of every point at `resolution`; 0 where a coordinate is not finite."""
+    cells = np.zeros(len(lat), dtype=np.uint64)
+    valid = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+    cells[valid] = np.fromiter(
+        map(h3_int.latlng_to_cell, lat[valid].tolist(), lon[valid].tolist(), repeat(resolution)),
+        dtype=np.uint64,
+        count=len(valid),
+    )
+    return cells
+
+
+def in_cells(cells: np.ndarray, flood_cells: np.ndarray) -> np.ndarray:
+    """Membership of each uint64 cell in the sorted array `flood_cells`, by binary search."""
+    if not len(flood_cells):
+        return np.zeros(len(cells), dtype=bool)
+    positions = np.searchsorted(flood_cells, cells).clip(max=len(flood_cells) - 1)
+    return flood_cells[positions] == cells
+
+
+def _finer_digits(resolution: int) -> np.uint64:
+    """Bits of the digits finer than `resolution`."""
+    return np.uint64((1 << (3 * (H3_MAX_RESOLUTION - resolution))) - 1)
+
+
+def cell_resolutions(cells: np.ndarray) -> np.ndarray:
+    """Resolution of each uint64 H3 cell."""
+    cells = np.asarray(cells, dtype=np.uint64)
+    return ((cells & H3_RESOLUTION_MASK) >> np.uint64(H3_RESOLUTION_SHIFT)).astype(np.int64)
+
+
+def cell_parents(cells: np.ndarray, resolution: int) -> np.ndarray:
+    """Ancestor at `resolution` of each uint64 H3 cell, by bit operations (as
+    `h3.cell_to_parent`). Every cell must be at `resolution` or finer."""
+    cells = np.asarray(cells, dtype=np.uint64)
+    at_resolution = (cells & ~H3_RESOLUTION_MASK) | np.uint64(resolution << H3_RESOLUTION_SHIFT)
+    return at_resolution | _finer_digits(resolution)
+
+
+def descendant_ranges(cells: np.ndarray, resolution: int) -> tuple[np.ndarray, np.ndarray]:
+    """(low, high) bounding the uint64 indexes of the descendants at `resolution` of each
+    cell (at `resolution` or coarser): the descendants of a cell are contiguous in index
+    order, so a sorted column of cells at `resolution` holds them in one run."""
+    cells = np.asarray(cells, dtype=np.uint64)
+    at_resolution = (cells & ~H3_RESOLUTION_MASK) | np.uint64(resolution << H3_RESOLUTION_SHIFT)
+    digits = np.zeros(len(cells), dtype=np.uint64)
+    levels = cell_resolutions(cells)
+    for level in np.unique(levels).tolist():
+        digits[levels == level] = _finer_digits(level) & ~_finer_digits(resolution)
+    low = at_resolution & ~digits
+    return low, low | (digits & H3_SIX_DIGITS)
+
+
+def compact_cell_array(cells: np.ndarray) -> np.ndarray:
+    """Sorted uint64 cells covering exactly the area of `cells`, with every complete set of
+    siblings replaced by their parent, recursively (as `h3.compact_cells`).
+
+    `cells` may mix resolutions and overlap; cells inside another cell are dropped. The
+    work is vectorized over each resolution, finest first.
+    """
+    cells = np.unique(np.asarray(cells, dtype=np.uint64))
+    if not len(cells):
+        return cells
+    resolutions = cell_resolutions(cells)
+    levels = {level: cells[resolutions == level] for level in np.unique(resolutions).tolist()}
+    for level in range(max(levels), 0, -1):
+        children = levels.get(level)
+        if children is None or not len(children):
+            continue
+        parents = cell_parents(children, level - 1)
+        # Children are unique, so a parent is complete once it has 7 of them (6 for pentagons).
+        candidates, counts = np.unique(parents, return_counts=True)
+        complete = counts == 7
+        for i in np.flatnonzero(counts == 6).tolist():
+            complete[i] = h3_int.is_pentagon(int(candidates[i]))
+        if not complete.any():
+            continue
+        promoted = candidates[complete]
+        levels[level] = children[~in_cells(parents, promoted)]
+        levels[level - 1] = np.union1d(levels.get(level - 1, promoted[:0]), promoted)
+
+    kept = []
+    for level in sorted(levels):
+        level_cells = levels[level]
+        covered = np.zeros(len(level_cells), dtype=bool)
+        for coarser in kept:
+            coarser_resolution = int(cell_resolutions(coarser[:1])[0])
+            covered |= in_cells(cell_parents(level_cells, coarser_resolution), coarser)
+        if (~covered).any():
+            kept.append(level_cells[~covered])
+    return np.sort(np.concatenate(kept)) if kept else cells[:0]
+
+
+class H3FloodIndex:
+    """A flood footprint as compacted H3 cells: coarse cells over wholly wet interiors, cells
+    at `resolution` along the wet/dry boundary.
+
+    It stands for exactly the same cells at `resolution` as the uncompacted set (see
+    `compact_cell_array`), in far fewer cells for large footprints. Membership is
+    hierarchical: a cell at `resolution` or finer is flooded when its ancestor at one of
+    the stored resolutions is in that resolution's sorted array.
+    """
+
+    def __init__(
+        self, cells, resolution: int, bbox: tuple[float, float, float, float] | None = None
+    ):
+        cells = compact_cell_array(cells_to_array(cells))
+        resolutions = cell_resolutions(cells)
+        if len(cells) and resolutions.max() > resolution:
+            raise ValueError(f"cells finer than resolution {resolution}")
+        self.resolution = resolution
+        self.levels = {
+            level: cells[resolutions == level] for level in np.unique(resolutions).tolist()
+        }
+        # WGS84 (min_lon, min_lat, max_lon, max_lat) of the wet pixels, when built from a raster.
+        self.bbox = bbox
+
+    @classmethod
+    def from_raster(
+        cls, raster_path: str, resolution: int = 7, threshold: float = 0.0
+    ) -> "H3FloodIndex":
+        """Index of the cells at `resolution` holding a wet pixel (see `raster_to_h3_array`).
+
+        The cells are compacted every few row strips as they are found, so memory follows
+        the compacted index rather than every cell at `resolution`. The wet pixels' bounding
+        box is kept as `bbox` (None for a dry raster).
+        """
+        compacted = np.zeros(0, dtype=np.uint64)
+        pending = []
+        bboxes = []
+        for strip_cells, strip_bbox in _raster_strip_cells(raster_path, resolution, threshold):
+            pending.append(strip_cells)
+            bboxes.append(strip_bbox)
+            if len(pending) == COMPACT_EVERY_STRIPS:
+                compacted = compact_cell_array(np.concatenate([compacted] + pending))
+                pending = []
+        bbox = None
+        if bboxes:
+            corners = np.array(bboxes)
+            bbox = (*corners[:, :2].min(axis=0).tolist(), *corners[:, 2:].max(axis=0).tolist())
+        return cls(np.concatenate([compacted] + pending), resolution, bbox)
+
+    def save(self, path: str) -> None:
+        """Write the index to an .npz file at `path`, atomically."""
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as cache_file:
+                np.savez(
+                    cache_file,
+                    cells=self.cells,
+                    resolution=np.int64(self.resolution),
+                    bbox=np.array(
+                        self.bbox if self.bbox is not None else [np.nan] * 4, dtype=np.float64
+                    ),
+                )
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path: str) -> "H3FloodIndex":
+        """Read an index written by `save`."""
+        with np.load(path, allow_pickle=False) as cached:
+            bbox = cached["bbox"]
+            return cls(
+                cached["cells"],
+                int(cached["resolution"]),
+                None if np.isnan(bbox).any() else tuple(bbox.tolist()),
+            )
+
+    @property
+    def cells(self) -> np.ndarray:
+        """The compacted cells, sorted."""
+        if not self.levels:
+            return np.zeros(0, dtype=np.uint64)
+        return np.sort(np.concatenate(list(self.levels.values())))
+
+    def __len__(self) -> int:
+        return sum(len(level_cells) for level_cells in self.levels.values())
+
+    def to_array(self) -> np.ndarray:
+        """Every cell at `resolution` of the footprint, sorted (the uncompacted set)."""
+        cells = h3_int.uncompact_cells(self.cells.tolist(), self.resolution)
+        return np.sort(np.array(cells, dtype=np.uint64))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(level_cells.nbytes for level_cells in self.levels.values())
+
+    def contains(self, cells: np.ndarray) -> np.ndarray:
+        """Whether each uint64 cell, at `resolution` or finer, lies in the footprint.
+
+        Cell 0 (a missing cell, see `latlng_to_cells`) is never flooded.
+        """
+        cells = np.asarray(cells, dtype=np.uint64)
+        found = np.zeros(len(cells), dtype=bool)
+        valid = cells != 0
+        if valid.any() and cell_resolutions(cells[valid]).min() < self.resolution:
+            raise ValueError(f"cells must be at resolution {self.resolution} or finer")
+        for level, level_cells in self.levels.items():
+            found |= valid & in_cells(cell_parents(cells, level), level_cells)
+        return found
+
+    def contains_latlng(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Whether each point lies in the footprint; false where a coordinate is not finite."""
+        return self.contains(latlng_to_cells(lat, lon, self.resolution))
+
+    def overlaps_range(self, low: int, high: int, resolution: int) -> bool:
+        """Whether a cell at `resolution` (at least this index's) between `low` and `high`,
+        inclusive, can lie in the footprint; used to skip Parquet row groups."""
+        for level_cells in self.levels.values():
+            lows, highs = descendant_ranges(level_cells, resolution)
+            # The ranges are disjoint and sorted, so the first one ending at or after `low`
+            # is the only candidate.
+            first = np.searchsorted(highs, np.uint64(low))
+            if first < len(lows) and lows[first] <= np.uint64(high):
+                return True
+        return False
+
+
+def raster_digest(raster_path: str) -> str:
+    """SHA-256 (hex) of the contents of the file at `raster_path`."""
+    digest = hashlib.sha256()
+    with open(raster_path, "rb") as raster_file:
+        for chunk in iter(lambda: raster_file.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def flood_index_cache_path(
+    raster_path: str,
+    resolution: int,
+    threshold: float = 0.0,
+    cache_dir: str | None = None,
+    digest: str | None = None,
+) -> str:
+    """Path of the cached flood index for the current contents of `raster_path`.
+
+    The file lives in `cache_dir` (default: a `.cache` directory next to the raster), so a
+    raster copied elsewhere, or edited in place, gets its own entry.
+    """
+    digest = digest or raster_digest(raster_path)
+    key = hashlib.sha256(
+        f"h3_flood/{CACHE_VERSION}/{digest}/{resolution}/{float(threshold)!r}".encode()
+    )
+    raster = Path(raster_path)
+    directory = Path(cache_dir) if cache_dir is not None else raster.parent / CACHE_DIR_NAME
+    return str(directory / f"{raster.name}.h3_r{resolution}_{key.hexdigest()[:32]}.npz")
+
+
+def load_flood_index(
+    raster_path: str,
+    resolution: int = 7,
+    threshold: float = 0.0,
+    use_cache: bool = False,
+    cache_dir: str | None = None,
+) -> H3FloodIndex:
+    """`H3FloodIndex.from_raster`, reused across runs and processes through the cache.
+
+    With `use_cache` the index is loaded from (or saved to) `flood_index_cache_path`. A
+    cache that cannot be read is ignored; one that cannot be written logs a warning and
+    the index is returned uncached.
+    """
+    path = None
+    if use_cache:
+        path = flood_index_cache_path(raster_path, resolution, threshold, cache_dir)
+    if path is not None and os.path.isfile(path):
+        try:
+            return H3FloodIndex.load(path)
+        except Exception as exc:
+            logger.debug("Ignoring unreadable flood index cache %s: %s", path, exc)
+
+    index = H3FloodIndex.from_raster(raster_path, resolution, threshold)
+    if path is not None:
+        try:
+            index.save(path)
+        except OSError as exc:
+            logger.warning("Could not write flood index cache %s: %s", path, exc)
+    return index
+
+
+def _row_groups_in_bounds(
+    parquet_file: pq.ParquetFile, lat_col: str, lon_col: str, bounds
+) -> list[int]:
+    """Row groups whose latitude/longitude statistics overlap `bounds` (or lack statistics)."""
+    metadata = parquet_file.metadata
+    names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+    min_lon, min_lat, max_lon, max_lat = bounds
+    columns = [names.index(lon_col), names.index(lat_col)]
+    groups = []
+    for group in range(metadata.num_row_groups):
+        lon_stats, lat_stats = [metadata.row_group(group).column(i).statistics for i in columns]
+        if any(stats is None or not stats.has_min_max for stats in (lon_stats, lat_stats)) or (
+            lon_stats.min <= max_lon
+            and lon_stats.max >= min_lon
+            and lat_stats.min <= max_lat
+            and lat_stats.max >= min_lat
+        ):
+            groups.append(group)
+    return groups
+
+
+def _row_groups_with_cells(
+    parquet_file: pq.ParquetFile, cell_col: str, index: H3FloodIndex, resolution: int
+) -> list[int]:
+    """Row groups whose `cell_col` range (cells at `resolution`) can hold a cell of `index`,
+    or that lack statistics."""
+    metadata = parquet_file.metadata
+    names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+    column = names.index(cell_col)
+    groups = []
+    for group in range(metadata.num_row_groups):
+        stats = metadata.row_group(group).column(column).statistics
+        if stats is None or not stats.has_min_max:
+            groups.append(group)
+            continue
+        # Statistics of a uint64 column may come back as signed integers.
+        low, high = np.array([stats.min, stats.max]).astype(np.uint64).tolist()
+        if index.overlaps_range(low, high, resolution):
+            groups.append(group)
+    return groups
 
 
 def filter_buildings_by_h3(
     parquet_path: str,
-    flood_cells: set[str],
+    flood_cells,
     resolution: int = 7,
     lat_col: str = "latitude",
     lon_col: str = "longitude",
+    batch_size: int = BATCH_ROWS,
 ) -> pa.Table:
-    """Filter parquet buildings to only those in flood H3 cells. O(1) per building."""
-    table = pq.read_table(parquet_path)
-    lats = table.column(lat_col).to_pylist()
-    lons = table.column(lon_col).to_pylist()
+    """Filter parquet buildings to only those in flood H3 cells.
+
+    `flood_cells` is an `H3FloodIndex`, whose own resolution then replaces `resolution`,
+    or H3 cells at `resolution` or coarser, as strings or a uint64 array (see
+    `cells_to_array`), which are compacted into one. The file is streamed in
+    `batch_size`-row batches, so memory is bounded by one batch plus the result.
+
+    Files written by `nsi_raw_to_parquet` carry each building's cell in an `h3_r{N}`
+    column (see `h3_column`); when the one for `resolution` is present it is matched
+    directly, and row groups whose cell range holds no flood cell are skipped. Otherwise
+    row groups, and then rows, outside the bounding box of the flood cells are dropped
+    with vectorized comparisons and only the remaining buildings are indexed. Either way
+    cells are matched against the index by binary search (see `H3FloodIndex.contains`).
+    """
+    index = flood_cells
+    if not isinstance(index, H3FloodIndex):
+        index = H3FloodIndex(flood_cells, resolution)
+    resolution = index.resolution
+    parquet_file = pq.ParquetFile(parquet_path)
+    if not len(index):
+        return parquet_file.schema_arrow.empty_table()
+    cell_col = h3_column(resolution)
+    if cell_col in parquet_file.schema_arrow.names:
+        row_groups = _row_groups_with_cells(parquet_file, cell_col, index, resolution)
+        batches = []
+        for batch in parquet_file.iter_batches(batch_size=batch_size, row_groups=row_groups):
+            # Null cells (buildings without coordinates) become 0, which is never a flood cell.
+            keep = index.contains(batch.column(cell_col).fill_null(0).to_numpy())
+            if keep.any():
+                batches.append(batch.filter(pa.array(keep)))
+        return pa.Table.from_batches(batches, schema=parquet_file.schema_arrow)
+
+    bounds = _cells_bounds(index.cells)
+    if bounds is None:
+        row_groups = list(range(parquet_file.metadata.num_row_groups))
+    else:
+        row_groups = _row_groups_in_bounds(parquet_file, lat_col, lon_col, bounds)
 
-    keep = [h3.latlng_to_cell(lat, lon, resolution) in flood_cells for lat, lon in zip(lats, lons)]
-    return table.filter(pa.array(keep, type=pa.bool_()))
+    batches = []
+    for batch in parquet_file.iter_batches(batch_size=batch_size, row_groups=row_groups):
+        lat = batch.column(lat_col).to_numpy(zero_copy_only=False).astype(np.float64)
+        lon = batch.column(lon_col).to_numpy(zero_copy_only=False).astype(np.float64)
+        if bounds is None:
+            candidates = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        else:
+            min_lon, min_lat, max_lon, max_lat = bounds
+            inside = (lon >= min_lon) & (lon <= max_lon) & (lat >= min_lat) & (lat <= max_lat)
+            candidates = np.flatnonzero(inside)
+        keep = np.zeros(batch.num_rows, dtype=bool)
+        keep[candidates] = index.contains_latlng(lat[candidates], lon[candidates])
+        if keep.any():
+            batches.append(batch.filter(pa.array(keep)))
+    return pa.Table.from_batches(batches, schema=parquet_file.schema_arrow)
 
 
 def filter_buildings_batch(
     parquet_paths: list[str],
-    flood_cells: set[str],
+    flood_cells,
     resolution: int = 7,
 ) -> pa.Table:
     """Filter multiple parquet files and combine results."""
-    tables = [filter_buildings_by_h3(p, flood_cells, resolution) for p in parquet_paths]
+    index = flood_cells
+    if not isinstance(index, H3FloodIndex):
+        index = H3FloodIndex(flood_cells, resolution)
+    tables = [filter_buildings_by_h3(p, index) for p in parquet_paths]
     return pa.concat_tables(tables) if tables else pa.table({})
 
 
@@ -63,13 +680,49 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="H3 spatial filter for NSI buildings")
     parser.add_argument("--raster", required=True, help="Flood depth GeoTIFF")
     parser.add_argument("--parquet", required=True, nargs="+", help="NSI parquet file(s)")
-    parser.add_argument("--resolution", type=int, default=7)
-    parser.add_argument("--stride", type=int, default=4)
+    parser.add_argument(
+        "--resolution",
+        type=int,
+        default=7,
+        help=(
+            "Finest H3 resolution, used along the wet/dry boundary "
+            "(coarser cells fill wet interiors)"
+        ),
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.0,
+        help="Pixels deeper than this are wet (default: 0)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither read nor write the flood index cached next to the raster",
+    )
+    parser.add_argument(
+        "--stride",
+        type=int,
+        default=None,
+        help="Deprecated and ignored: every wet pixel is covered.",
+    )
     args = parser.parse_args()
+    if args.stride is not None:
+        print("  --stride is deprecated and ignored; every wet pixel is covered.")
 
-    print(f"Indexing raster {args.raster} at H3 res {args.resolution} (stride={args.stride})...")
-    flood_cells = raster_to_h3_cells(args.raster, args.resolution, args.stride)
-    print(f"  {len(flood_cells)} unique H3 cells with flooding")
+    print(f"Indexing raster {args.raster} at H3 res {args.resolution}...")
+    flood_index = load_flood_index(
+        args.raster, args.resolution, args.threshold, use_cache=not args.no_cache
+    )
+    levels = sorted(flood_index.levels.items())
+    per_level = ", ".join(f"{len(cells)} at res {level}" for level, cells in levels)
+    print(f"  {len(flood_index)} compacted H3 cells with flooding ({per_level or 'none'})")
+    if flood_index.bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = flood_index.bbox
+        print(
+            f"  wet pixels within lon {min_lon:.5f}..{max_lon:.5f}, "
+            f"lat {min_lat:.5f}..{max_lat:.5f}"
+        )
 
-    result = filter_buildings_batch(args.parquet, flood_cells, args.resolution)
+    result = filter_buildings_batch(args.parquet, flood_index)
     print(f"  {result.num_rows} buildings in flood zone (from {len(args.parquet)} file(s))")
@@ -23,10 +23,12 @@ except ImportError:  # pragma: no cover
     from tqdm.auto import tqdm
 
 try:
+    from .nsi_raw_to_parquet import has_unique_bids as _has_unique_bids
     from .us_states import API_BASE as _API_BASE
     from .us_states import STATE_BY_NAME as _STATE_BY_NAME
     from .us_states import STATE_FIPS as _STATE_FIPS
 except ImportError:  # pragma: no cover
+    from nsi_raw_to_parquet import has_unique_bids as _has_unique_bids
     from us_states import API_BASE as _API_BASE
     from us_states import STATE_BY_NAME as _STATE_BY_NAME
     from us_states import STATE_FIPS as _STATE_FIPS
@@ -334,6 +336,7 @@ class NSIDownloader:
         state_names: list,
         repo_id: str = "Alexq847182/NSI_Parquet",
         token: str | None = None,
+        bbox: tuple[float, float, float, float] | None = None,
     ) -> pd.DataFrame:
         """Download NSI from a HuggingFace dataset repo.
 
@@ -341,6 +344,16 @@ class NSIDownloader:
         (``state=Florida/part-00000.snappy.parquet``).  Only files
         for the requested ``state_names`` are downloaded — no full
         dataset download is needed.
+
+        With ``bbox`` (``min_lon, min_lat, max_lon, max_lat``) only the
+        buildings inside it are read; row groups outside it are skipped
+        by their statistics, which on the spatially sorted files written
+        by ``nsi_raw_to_parquet`` leaves most of each state file unread.
+
+        ``result.attrs["unique_bid"]`` is True when every file was
+        deduplicated on ``bid`` at ingest (see
+        ``nsi_raw_to_parquet.has_unique_bids``); callers can then skip
+        their own dedup.
         """
         from huggingface_hub import HfApi, hf_hub_download
 
@@ -408,9 +421,22 @@ class NSIDownloader:
         hf_cache_dir = self.work_dir / "hf_nsi_cache"
         hf_cache_dir.mkdir(parents=True, exist_ok=True)
 
+        bbox_filters = None
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            bbox_filters = [
+                ("longitude", ">=", min_lon),
+                ("longitude", "<=", max_lon),
+                ("latitude", ">=", min_lat),
+                ("latitude", "<=", max_lat),
+            ]
+
         nsi_dfs: list[pd.DataFrame] = []
         t0 = time.time()
         total_bytes = 0
+        # NSI puts each structure in one state, so flagged files of distinct state
+        # partitions never share a bid; two files of one partition could.
+        unique_bid = len(files_to_download) == len(matched_states)
 
         with tqdm(
             total=len(files_to_download),
@@ -428,7 +454,8 @@ class NSIDownloader:
                 file_bytes = Path(local_path).stat().st_size
                 total_bytes += file_bytes
 
-                df_part = pd.read_parquet(local_path)
+                df_part = pd.read_parquet(local_path, filters=bbox_filters)
+                unique_bid = unique_bid and _has_unique_bids(local_path)
 
                 # Fail fast if required columns are missing
                 missing = self.REQUIRED_HF_COLS - set(
@@ -462,5 +489,6 @@ class NSIDownloader:
 
         result = pd.concat(nsi_dfs, ignore_index=True)
         result = self._normalize_cbfips(result)
+        result.attrs["unique_bid"] = unique_bid
         print(f"Total: {len(result):,} buildings")
         return result
@@ -2,18 +2,39 @@
 
 Primary engine: DuckDB spatial (streaming, low memory).
 Fallback: geopandas + pyogrio.
+
+Both engines deduplicate buildings on ``bid`` (keeping the highest ``val_struct``) and
+record that in the file's Parquet key-value metadata, so readers can skip their own
+dedup (see ``has_unique_bids``).
+
+Each building's H3 cell is stored at every resolution of ``DEFAULT_H3_RESOLUTIONS`` (or
+the ones requested) as a uint64 ``h3_r{N}`` column, so flood filters match cells instead
+of recomputing them from coordinates; ``add_h3_columns`` adds them to existing files.
+
+By default rows are written in H3 order of the finest stored resolution (``sort="h3"``),
+in row groups of ``ROW_GROUP_SIZE`` rows. Cells sharing a parent are contiguous in that
+order, so each row group covers a compact area, and both its H3 and its latitude and
+longitude statistics let filters skip most of a state file. ``sort="hilbert"`` orders
+rows along a Hilbert curve of their coordinates instead.
 """
 
 from __future__ import annotations
 
 import argparse
 import glob
+import os
 import sys
 from pathlib import Path
 
+import numpy as np
 import pyarrow as pa
 import pyarrow.parquet as pq
 
+try:  # For `python -m scripts.nsi_raw_to_parquet` and `python scripts/nsi_raw_to_parquet.py`.
+    from .h3_spatial_index import h3_column, h3_column_resolutions, latlng_to_cells
+except ImportError:  # pragma: no cover - exercised when the script is run directly.
+    from h3_spatial_index import h3_column, h3_column_resolutions, latlng_to_cells  # type: ignore[import-not-found]
+
 # Target schema — must match existing processed parquet (e.g. Alabama)
 TARGET_SCHEMA = pa.schema(
     [
@@ -54,14 +75,115 @@ TARGET_SCHEMA = pa.schema(
 
 TARGET_COLUMNS = [f.name for f in TARGET_SCHEMA]
 
+# Parquet key-value metadata set on files whose non-null bids are unique.
+UNIQUE_BID_METADATA_KEY = "nsi.unique_bid"
+
+# Row orders the converters can write: by H3 cell, along a Hilbert curve, or as read.
+SORT_ORDERS = ("h3", "hilbert", "none")
+# H3 resolutions stored as h3_r{N} columns: 7 (about 5 km2 cells) for coarse storm
+# filters, 9 (about 0.1 km2) for filters close to the flood footprint.
+DEFAULT_H3_RESOLUTIONS = (7, 9)
+# SQL function the DuckDB engine registers for the H3 cell: (longitude, latitude, resolution).
+H3_FUNCTION = "nsi_h3"
+# Rows per row group; small enough that a storm footprint skips most groups of a state.
+ROW_GROUP_SIZE = 50_000
+# Bits per axis of the Hilbert key: cells of about 1e-7 degrees.
+HILBERT_BITS = 32
+# SQL function the DuckDB engine registers for the Hilbert key.
+HILBERT_FUNCTION = "nsi_hilbert"
+
+
+def hilbert_index(longitude, latitude, bits: int = HILBERT_BITS) -> np.ndarray:
+    """Position of each WGS84 point along a Hilbert curve over the whole globe, as uint64.
+
+    Points close together on the curve are close on the ground, so sorting by this key
+    clusters buildings spatially. Points with a missing or non-finite coordinate get the
+    largest key and sort last.
+    """
+    lon = np.asarray(longitude, dtype=np.float64)
+    lat = np.asarray(latitude, dtype=np.float64)
+    valid = np.isfinite(lon) & np.isfinite(lat)
+    scale = float(1 << bits)
+    with np.errstate(invalid="ignore"):
+        x = np.clip((np.where(valid, lon, 0.0) + 180.0) / 360.0 * scale, 0, scale - 1)
+        y = np.clip((np.where(valid, lat, 0.0) + 90.0) / 180.0 * scale, 0, scale - 1)
+    x = x.astype(np.uint64)
+    y = y.astype(np.uint64)
+    d = np.zeros(len(x), dtype=np.uint64)
+    one = np.uint64(1)
+    for level in range(bits - 1, -1, -1):
+        shift = np.uint64(level)
+        mask = (one << shift) - one
+        rx = (x >> shift) & one
+        ry = (y >> shift) & one
+        d |= ((np.uint64(3) * rx) ^ ry) << np.uint64(2 * level)
+        x &= mask
+        y &= mask
+        # Rotate the quadrant so the curve stays continuous: reflect where rx=1, ry=0,
+        # then swap x and y where ry=0 (ry - 1 wraps to all ones there).
+        flip = (rx & (ry ^ one)) * mask
+        x ^= flip
+        y ^= flip
+        swap = (x ^ y) & (ry - one)
+        x ^= swap
+        y ^= swap
+    d[~valid] = np.iinfo(np.uint64).max
+    return d
+
+
+def _hilbert_udf(longitude: pa.ChunkedArray, latitude: pa.ChunkedArray) -> pa.Array:
+    return pa.array(hilbert_index(longitude.to_numpy(), latitude.to_numpy()))
+
+
+def h3_cells(longitude, latitude, resolution: int) -> pa.Array:
+    """uint64 H3 cell of each WGS84 point at `resolution`; null where a coordinate is missing."""
+    lon = np.asarray(longitude, dtype=np.float64)
+    lat = np.asarray(latitude, dtype=np.float64)
+    cells = latlng_to_cells(lat, lon, resolution)
+    return pa.array(cells, type=pa.uint64(), mask=cells == 0)
+
+
+def _h3_udf(
+    longitude: pa.ChunkedArray, latitude: pa.ChunkedArray, resolution: pa.ChunkedArray
+) -> pa.Array:
+    # Null coordinates arrive as NaN and get a null cell.
+    return h3_cells(longitude.to_numpy(), latitude.to_numpy(), resolution[0].as_py())
+
+
+def _register_udfs(con) -> None:
+    con.create_function(
+        HILBERT_FUNCTION, _hilbert_udf, ["DOUBLE", "DOUBLE"], "UBIGINT", type="arrow"
+    )
+    # "special" null handling lets the function see NULL coordinates and return NULL cells.
+    con.create_function(
+        H3_FUNCTION,
+        _h3_udf,
+        ["DOUBLE", "DOUBLE", "INTEGER"],
+        "UBIGINT",
+        type="arrow",
+        null_handling="special",
+    )
+
+
+def _order_by_sql(sort: str, h3_resolutions) -> str:
+    if sort == "h3":
+        # Cells of the finest resolution sort their coarser parents too.
+        return f"ORDER BY {h3_column(max(h3_resolutions))}"
+    if sort == "hilbert":
+        return f"ORDER BY {HILBERT_FUNCTION}(longitude, latitude)"
+    return ""
 
-def _convert_duckdb(input_path: str, output_path: str) -> int:
+
+def _convert_duckdb(
+    input_path: str, output_path: str, sort: str = "h3", h3_resolutions=DEFAULT_H3_RESOLUTIONS
+) -> int:
     """DuckDB spatial: stream GPKG → Parquet in one SQL pass."""
     import duckdb
 
     con = duckdb.connect()
     con.install_extension("spatial")
     con.load_extension("spatial")
+    _register_udfs(con)
 
     # Detect CRS — reproject if not WGS84
     crs_sql = f"SELECT ST_SRID(geom) FROM st_read('{input_path}') LIMIT 1"
@@ -93,15 +215,28 @@ def _convert_duckdb(input_path: str, output_path: str) -> int:
             select_parts.append(f'"{name}"')
         else:
             select_parts.append(f"NULL AS {name}")
+    for resolution in h3_resolutions:
+        select_parts.append(
+            f"{H3_FUNCTION}({geom_x}, {geom_y}, {resolution}) AS {h3_column(resolution)}"
+        )
 
     select_clause = ",\n            ".join(select_parts)
 
+    order_by = _order_by_sql(sort, h3_resolutions)
+
+    # One row per bid, the one with the highest val_struct; rows without a bid are kept.
     sql = f"""
     COPY (
         SELECT
             {select_clause}
         FROM st_read('{input_path}')
-    ) TO '{output_path}' (FORMAT PARQUET, COMPRESSION SNAPPY)
+        QUALIFY bid IS NULL
+             OR ROW_NUMBER() OVER (PARTITION BY bid ORDER BY val_struct DESC NULLS LAST) = 1
+        {order_by}
+    ) TO '{output_path}' (
+        FORMAT PARQUET, COMPRESSION SNAPPY, ROW_GROUP_SIZE {ROW_GROUP_SIZE},
+        KV_METADATA {{'{UNIQUE_BID_METADATA_KEY}': 'true'}}
+    )
     """
 
     con.execute(sql)
@@ -110,7 +245,9 @@ def _convert_duckdb(input_path: str, output_path: str) -> int:
     return count
 
 
-def _convert_geopandas(input_path: str, output_path: str) -> int:
+def _convert_geopandas(
+    input_path: str, output_path: str, sort: str = "h3", h3_resolutions=DEFAULT_H3_RESOLUTIONS
+) -> int:
     """Fallback: geopandas + pyogrio."""
     import geopandas as gpd
     import pandas as pd
@@ -135,7 +272,37 @@ def _convert_geopandas(input_path: str, output_path: str) -> int:
             df[field.name] = None
 
     df = df[TARGET_COLUMNS]
-    df.to_parquet(output_path, compression="snappy", index=False)
+    # Same dedup as the DuckDB engine, keeping the source order of the surviving rows.
+    by_value = df.sort_values("val_struct", ascending=False, na_position="last", kind="stable")
+    keep = by_value["bid"].isna() | ~by_value["bid"].duplicated()
+    df = df.loc[by_value.index[keep.to_numpy()].sort_values()]
+    cells = {
+        resolution: h3_cells(df["longitude"], df["latitude"], resolution)
+        for resolution in h3_resolutions
+    }
+    order = None
+    if sort == "h3":
+        # Missing cells sort last, as NULLs do in the DuckDB engine.
+        finest = cells[max(h3_resolutions)]
+        key = finest.fill_null(np.iinfo(np.uint64).max).to_numpy()
+        order = np.argsort(key, kind="stable")
+    elif sort == "hilbert":
+        order = np.argsort(hilbert_index(df["longitude"], df["latitude"]), kind="stable")
+    if order is not None:
+        df = df.iloc[order]
+        cells = {resolution: column.take(order) for resolution, column in cells.items()}
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for resolution, column in cells.items():
+        table = table.append_column(h3_column(resolution), column)
+    metadata = dict(table.schema.metadata or {})
+    metadata[UNIQUE_BID_METADATA_KEY.encode()] = b"true"
+    pq.write_table(
+        table.replace_schema_metadata(metadata),
+        output_path,
+        compression="snappy",
+        row_group_size=ROW_GROUP_SIZE,
+    )
     return len(df)
 
 
@@ -152,6 +319,62 @@ def validate_schema(output_path: str) -> bool:
     return True
 
 
+def has_unique_bids(path: str) -> bool:
+    """Whether the footer of the Parquet file at ``path`` records unique ``bid`` values."""
+    metadata = pq.ParquetFile(path).metadata.metadata or {}
+    return metadata.get(UNIQUE_BID_METADATA_KEY.encode()) == b"true"
+
+
+def stored_h3_resolutions(path: str) -> list[int]:
+    """Resolutions of the ``h3_r{N}`` columns of the Parquet file at ``path``."""
+    return h3_column_resolutions(pq.read_schema(path).names)
+
+
+def add_h3_columns(path: str, h3_resolutions=DEFAULT_H3_RESOLUTIONS, sort: str = "h3") -> bool:
+    """Add the missing ``h3_r{N}`` columns to a processed NSI Parquet file, in place.
+
+    The file is rewritten through DuckDB (streaming, sorted as the converters sort, with
+    the same row groups and uniqueness flag) to a temporary file that then replaces it.
+    Returns False, leaving the file untouched, when every column is already there.
+    """
+    import duckdb
+
+    _check_h3_options(sort, h3_resolutions)
+    stored = stored_h3_resolutions(path)
+    missing = [resolution for resolution in h3_resolutions if resolution not in stored]
+    if not missing:
+        return False
+
+    select_parts = ["*"] + [
+        f"{H3_FUNCTION}(longitude, latitude, {resolution}) AS {h3_column(resolution)}"
+        for resolution in missing
+    ]
+    kv_metadata = ""
+    if has_unique_bids(path):
+        kv_metadata = f", KV_METADATA {{'{UNIQUE_BID_METADATA_KEY}': 'true'}}"
+    temp_path = f"{path}.h3.part"
+    con = duckdb.connect()
+    _register_udfs(con)
+    try:
+        con.execute(
+            f"""
+            COPY (
+                SELECT {", ".join(select_parts)}
+                FROM read_parquet('{path}', hive_partitioning = false)
+                {_order_by_sql(sort, stored + missing)}
+            ) TO '{temp_path}' (
+                FORMAT PARQUET, COMPRESSION SNAPPY, ROW_GROUP_SIZE {ROW_GROUP_SIZE}{kv_metadata}
+            )
+            """
+        )
+        os.replace(temp_path, path)
+    finally:
+        con.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return True
+
+
 def resolve_input_path(input_pattern: str) -> str:
     """Resolve an input glob to a single filesystem path."""
     inputs = sorted(glob.glob(input_pattern))
@@ -164,22 +387,45 @@ def resolve_input_path(input_pattern: str) -> str:
     return input_path
 
 
-def convert_raw_nsi_to_parquet(input_path: str, output_path: str, engine: str = "duckdb") -> int:
-    """Convert a raw NSI GPKG/GeoJSON file to processed parquet."""
+def _check_h3_options(sort: str, h3_resolutions) -> None:
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"unsupported sort order: {sort}")
+    for resolution in h3_resolutions:
+        if not 0 <= resolution <= 15:
+            raise ValueError(f"H3 resolution must be between 0 and 15, got {resolution}")
+    if sort == "h3" and not h3_resolutions:
+        raise ValueError("sort='h3' needs at least one H3 resolution")
+
+
+def convert_raw_nsi_to_parquet(
+    input_path: str,
+    output_path: str,
+    engine: str = "duckdb",
+    sort: str = "h3",
+    h3_resolutions=DEFAULT_H3_RESOLUTIONS,
+) -> int:
+    """Convert a raw NSI GPKG/GeoJSON file to processed parquet.
+
+    An ``h3_r{N}`` column is written for each of ``h3_resolutions`` (none when empty).
+    ``sort="hilbert"`` orders rows along a Hilbert curve instead of by H3 cell, and
+    ``sort="none"`` keeps the source row order.
+    """
     if engine not in {"duckdb", "geopandas"}:
         raise ValueError(f"unsupported engine: {engine}")
+    h3_resolutions = tuple(sorted(set(h3_resolutions)))
+    _check_h3_options(sort, h3_resolutions)
 
     output = Path(output_path)
     output.parent.mkdir(parents=True, exist_ok=True)
 
     convert = _convert_duckdb if engine == "duckdb" else _convert_geopandas
     try:
-        return convert(input_path, str(output))
+        return convert(input_path, str(output), sort=sort, h3_resolutions=h3_resolutions)
     except Exception as exc:
         if engine != "duckdb":
             raise
         print(f"DuckDB failed ({exc}), falling back to geopandas...")
-        return _convert_geopandas(input_path, str(output))
+        return _convert_geopandas(input_path, str(output), sort=sort, h3_resolutions=h3_resolutions)
 
 
 def main():
@@ -192,7 +438,27 @@ def main():
         choices=["duckdb", "geopandas"],
         help="Processing engine (default: duckdb)",
     )
+    parser.add_argument(
+        "--sort",
+        default="h3",
+        choices=SORT_ORDERS,
+        help=(
+            "Row order: h3 and hilbert cluster buildings spatially for flood and bbox queries "
+            "(default: h3)"
+        ),
+    )
+    parser.add_argument(
+        "--h3-resolution",
+        type=int,
+        action="append",
+        default=None,
+        help=(
+            "Store an h3_r<N> column at this resolution; repeatable "
+            f"(default: {list(DEFAULT_H3_RESOLUTIONS)})"
+        ),
+    )
     args = parser.parse_args()
+    h3_resolutions = DEFAULT_H3_RESOLUTIONS if args.h3_resolution is None else args.h3_resolution
 
     try:
         input_path = resolve_input_path(args.input)
@@ -202,7 +468,9 @@ def main():
 
     print(f"Converting {input_path} → {args.output} (engine={args.engine})")
 
-    count = convert_raw_nsi_to_parquet(input_path, args.output, engine=args.engine)
+    count = convert_raw_nsi_to_parquet(
+        input_path, args.output, engine=args.engine, sort=args.sort, h3_resolutions=h3_resolutions
+    )
 
     print(f"Wrote {count:,} rows to {args.output}")
     validate_schema(args.output)
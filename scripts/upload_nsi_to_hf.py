@@ -85,6 +85,10 @@ ds = load_dataset("{repo_id}")
 | val_cont | float | Content value ($) |
 | pop2pmu65 | int | Population under 65 (PM estimate) |
 | pop2pmo65 | int | Population over 65 (PM estimate) |
+| h3_r<N> | uint64 | H3 cell of the building at resolution N (h3_r7 and h3_r9 by default) |
+
+Rows are sorted by the finest H3 column, so a flood filter on the H3 columns (e.g. a
+semi-join against the flooded cells) skips most row groups by their statistics.
 
 ## Source
 
@@ -121,8 +125,34 @@ def download_all_states(output_dir: str, engine: str = "duckdb") -> None:
         sys.exit(1)
 
 
-def upload_to_hf(parquet_dir: str, repo_id: str, token: str | None, private: bool) -> None:
-    """Upload Hive-partitioned Parquet directory to HF Hub."""
+def ensure_h3_columns(parquets: list[Path], h3_resolutions=None) -> int:
+    """Add the missing h3_r<N> columns to each file before upload; returns how many were rewritten.
+
+    `h3_resolutions` defaults to the converter's DEFAULT_H3_RESOLUTIONS.
+    """
+    try:
+        from scripts.nsi_raw_to_parquet import DEFAULT_H3_RESOLUTIONS, add_h3_columns
+    except ImportError:
+        from nsi_raw_to_parquet import DEFAULT_H3_RESOLUTIONS, add_h3_columns  # type: ignore[import-not-found]
+
+    if h3_resolutions is None:
+        h3_resolutions = DEFAULT_H3_RESOLUTIONS
+    rewritten = 0
+    for path in parquets:
+        if add_h3_columns(str(path), h3_resolutions):
+            print(f"  added H3 columns to {path}")
+            rewritten += 1
+    return rewritten
+
+
+def upload_to_hf(
+    parquet_dir: str, repo_id: str, token: str | None, private: bool, h3_resolutions=None
+) -> None:
+    """Upload Hive-partitioned Parquet directory to HF Hub.
+
+    Files lacking an h3_r<N> column for one of `h3_resolutions` (default: the converter's
+    defaults) get it first, so every published file can be filtered by H3 cell.
+    """
     try:
         from huggingface_hub import HfApi
     except ImportError:
@@ -143,6 +173,9 @@ def upload_to_hf(parquet_dir: str, repo_id: str, token: str | None, private: boo
     if len(parquets) > 5:
         print(f"  ... and {len(parquets) - 5} more")
 
+    rewritten = ensure_h3_columns(parquets, h3_resolutions)
+    print(f"H3 columns checked ({rewritten} file(s) rewritten)")
+
     api = HfApi(token=token)
 
     # Create dataset repo
@@ -212,6 +245,16 @@ def main(argv: list[str] | None = None) -> int:
         choices=["duckdb", "geopandas"],
         help="Conversion engine for GeoJSON -> Parquet (default: duckdb)",
     )
+    parser.add_argument(
+        "--h3-resolution",
+        type=int,
+        action="append",
+        default=None,
+        help=(
+            "Ensure every file has an h3_r<N> column at this resolution; repeatable "
+            "(default: 7 and 9)"
+        ),
+    )
     parser.add_argument(
         "--upload-only",
         action="store_true",
@@ -225,7 +268,9 @@ def main(argv: list[str] | None = None) -> int:
 
     # Step 2: Upload
     parquet_dir = args.parquet_dir or str(Path(args.output_dir) / "processed" / "nsi")
-    upload_to_hf(parquet_dir, args.repo_id, args.token, args.private)
+    upload_to_hf(
+        parquet_dir, args.repo_id, args.token, args.private, h3_resolutions=args.h3_resolution
+    )
 
     return 0
 
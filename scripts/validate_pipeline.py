@@ -8,14 +8,20 @@ import csv
 import json
 from collections import Counter, defaultdict
 from pathlib import Path
+from typing import Any
 
 
-def load_predictions(csv_path: Path) -> list[dict[str, str]]:
-    with csv_path.open("r", newline="", encoding="utf-8") as f:
+def load_predictions(path: Path) -> list[dict[str, Any]]:
+    """Read merged predictions from CSV (values as text) or Parquet (typed values)."""
+    if path.suffix.lower() in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path).to_pylist()
+    with path.open("r", newline="", encoding="utf-8") as f:
         return list(csv.DictReader(f))
 
 
-def validate_schema(rows: list[dict[str, str]]) -> list[str]:
+def validate_schema(rows: list[dict[str, Any]]) -> list[str]:
     """Check that required output columns exist."""
     if not rows:
         return ["FAIL: predictions CSV is empty"]
@@ -26,7 +32,7 @@ def validate_schema(rows: list[dict[str, str]]) -> list[str]:
     return []
 
 
-def compute_summary(rows: list[dict[str, str]]) -> dict:
+def compute_summary(rows: list[dict[str, Any]]) -> dict:
     """Compute aggregate statistics from prediction rows."""
     by_state: dict[str, int] = Counter()
     by_flc: dict[str, int] = Counter()
@@ -48,7 +54,7 @@ def compute_summary(rows: list[dict[str, str]]) -> dict:
         loss = 0.0
         for col in ("BldgLoss", "BldgDmgPct", "TotalLoss", "bldg_loss"):
             val = row.get(col, "")
-            if val:
+            if val not in ("", None):
                 try:
                     loss = float(val)
                 except ValueError:
@@ -93,7 +99,7 @@ def run_checks(summary: dict) -> list[str]:
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Validate FAST pipeline predictions")
-    parser.add_argument("predictions_csv", help="Path to merged predictions CSV")
+    parser.add_argument("predictions_csv", help="Path to merged predictions CSV or Parquet")
     parser.add_argument("--output-json", default=None, help="Write report JSON to this path")
     args = parser.parse_args()
 
@@ -152,7 +152,9 @@ def test_convert_raw_nsi_to_parquet_reuses_public_entrypoint(
 ) -> None:
     called = {"geopandas": False}
 
-    def fake_geopandas(input_path: str, output_path: str) -> int:
+    def fake_geopandas(
+        input_path: str, output_path: str, sort: str = "h3", h3_resolutions=()
+    ) -> int:
         called["geopandas"] = True
         _write_schema_only_parquet(Path(output_path), rows=1)
         return 1
@@ -170,3 +172,187 @@ def test_convert_raw_nsi_to_parquet_reuses_public_entrypoint(
     assert count == 1
     assert output_path.exists()
     assert raw_to_parquet.validate_schema(str(output_path)) is True
+
+
+def test_geopandas_conversion_keeps_one_row_per_bid_and_flags_it(tmp_path: Path) -> None:
+    pytest.importorskip("geopandas")
+    pytest.importorskip("pyogrio")
+
+    features = []
+    rows = [("a", 100.0), ("b", 50.0), ("a", 300.0), (None, 10.0), (None, 20.0), ("b", None)]
+    for bid, val_struct in rows:
+        properties = {"bid": bid, "val_struct": val_struct, "occtype": "RES1-1SNB"}
+        geometry = {"type": "Point", "coordinates": [-90.0, 30.0]}
+        features.append({"type": "Feature", "properties": properties, "geometry": geometry})
+    input_path = tmp_path / "raw.geojson"
+    input_path.write_text(
+        json.dumps({"type": "FeatureCollection", "features": features}), encoding="utf-8"
+    )
+
+    output_path = tmp_path / "out.parquet"
+    count = raw_to_parquet.convert_raw_nsi_to_parquet(
+        str(input_path), str(output_path), engine="geopandas"
+    )
+
+    table = pq.read_table(output_path)
+    assert count == table.num_rows == 4
+    # Source order is kept; each bid keeps its highest val_struct and blank bids all stay.
+    assert table.column("bid").to_pylist() == ["b", "a", None, None]
+    assert table.column("val_struct").to_pylist() == [50.0, 300.0, 10.0, 20.0]
+    assert raw_to_parquet.has_unique_bids(str(output_path))
+    assert raw_to_parquet.validate_schema(str(output_path)) is True
+
+    unflagged = tmp_path / "unflagged.parquet"
+    _write_schema_only_parquet(unflagged)
+    assert not raw_to_parquet.has_unique_bids(str(unflagged))
+
+
+def test_hilbert_index_visits_neighbouring_cells_in_turn() -> None:
+    np = pytest.importorskip("numpy")
+
+    bits = 4
+    side = 1 << bits
+    cols, rows = np.meshgrid(np.arange(side), np.arange(side))
+    lon = (cols.ravel() + 0.5) / side * 360.0 - 180.0
+    lat = (rows.ravel() + 0.5) / side * 180.0 - 90.0
+
+    keys = raw_to_parquet.hilbert_index(lon, lat, bits=bits)
+
+    assert sorted(keys.tolist()) == list(range(side * side))
+    order = np.argsort(keys)
+    steps = np.abs(np.diff(cols.ravel()[order])) + np.abs(np.diff(rows.ravel()[order]))
+    assert steps.tolist() == [1] * (side * side - 1)
+    assert raw_to_parquet.hilbert_index([np.nan], [0.0])[0] == np.iinfo(np.uint64).max
+
+
+def _row_groups_in_bbox(path: Path, bbox: tuple[float, float, float, float]) -> int:
+    metadata = pq.ParquetFile(path).metadata
+    names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+    lon, lat = names.index("longitude"), names.index("latitude")
+    hits = 0
+    for group in range(metadata.num_row_groups):
+        lon_stats = metadata.row_group(group).column(lon).statistics
+        lat_stats = metadata.row_group(group).column(lat).statistics
+        if (
+            lon_stats.min <= bbox[2]
+            and lon_stats.max >= bbox[0]
+            and lat_stats.min <= bbox[3]
+            and lat_stats.max >= bbox[1]
+        ):
+            hits += 1
+    return hits
+
+
+def test_hilbert_sorted_conversion_lets_a_small_bbox_skip_most_row_groups(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("geopandas")
+    pytest.importorskip("pyogrio")
+
+    rng = np.random.default_rng(5)
+    features = []
+    coords = zip(rng.uniform(-88.0, -80.0, 2000), rng.uniform(25.0, 31.0, 2000))
+    for i, (lon, lat) in enumerate(coords):
+        properties = {"bid": f"b{i}", "val_struct": 100.0}
+        geometry = {"type": "Point", "coordinates": [lon, lat]}
+        features.append({"type": "Feature", "properties": properties, "geometry": geometry})
+    input_path = tmp_path / "raw.geojson"
+    input_path.write_text(
+        json.dumps({"type": "FeatureCollection", "features": features}), encoding="utf-8"
+    )
+    monkeypatch.setattr(raw_to_parquet, "ROW_GROUP_SIZE", 100)
+
+    bbox = (-82.5, 26.0, -82.0, 26.5)
+    hits = {}
+    for sort in raw_to_parquet.SORT_ORDERS:
+        output_path = tmp_path / f"{sort}.parquet"
+        count = raw_to_parquet.convert_raw_nsi_to_parquet(
+            str(input_path), str(output_path), "geopandas", sort
+        )
+        assert count == 2000
+        assert pq.ParquetFile(output_path).metadata.num_row_groups == 20
+        hits[sort] = _row_groups_in_bbox(output_path, bbox)
+
+    assert hits["none"] == 20
+    assert hits["hilbert"] <= 3
+
+
+def test_geopandas_conversion_stores_h3_cells_and_sorts_by_the_finest(tmp_path: Path) -> None:
+    np = pytest.importorskip("numpy")
+    h3 = pytest.importorskip("h3")
+    pytest.importorskip("geopandas")
+    pytest.importorskip("pyogrio")
+
+    rng = np.random.default_rng(3)
+    features = []
+    coords = zip(rng.uniform(-88.0, -80.0, 300), rng.uniform(25.0, 31.0, 300))
+    for i, (lon, lat) in enumerate(coords):
+        properties = {"bid": f"b{i}", "val_struct": 100.0}
+        geometry = {"type": "Point", "coordinates": [lon, lat]}
+        features.append({"type": "Feature", "properties": properties, "geometry": geometry})
+    input_path = tmp_path / "raw.geojson"
+    input_path.write_text(
+        json.dumps({"type": "FeatureCollection", "features": features}), encoding="utf-8"
+    )
+
+    output_path = tmp_path / "out.parquet"
+    raw_to_parquet.convert_raw_nsi_to_parquet(
+        str(input_path), str(output_path), "geopandas", h3_resolutions=(9, 6)
+    )
+
+    table = pq.read_table(output_path)
+    assert raw_to_parquet.stored_h3_resolutions(str(output_path)) == [6, 9]
+    for resolution in (6, 9):
+        column = table.column(f"h3_r{resolution}")
+        assert column.type == pa.uint64()
+        expected = [
+            h3.str_to_int(h3.latlng_to_cell(lat, lon, resolution))
+            for lat, lon in zip(
+                table.column("latitude").to_pylist(), table.column("longitude").to_pylist()
+            )
+        ]
+        assert column.to_pylist() == expected
+    assert table.column("h3_r9").to_pylist() == sorted(table.column("h3_r9").to_pylist())
+
+    for resolutions, message in (((16,), "between 0 and 15"), ((), "sort='h3'")):
+        with pytest.raises(ValueError, match=message):
+            raw_to_parquet.convert_raw_nsi_to_parquet(
+                str(input_path), str(output_path), "geopandas", h3_resolutions=resolutions
+            )
+
+
+def test_add_h3_columns_rewrites_a_processed_file_once(tmp_path: Path) -> None:
+    h3 = pytest.importorskip("h3")
+    pytest.importorskip("duckdb")
+
+    lats, lons = [30.2, None, 29.1, 30.25], [-90.1, -90.0, -89.5, -90.12]
+    table = pa.table(
+        {"bid": ["a", "b", "c", "d"], "latitude": lats, "longitude": lons},
+        metadata={raw_to_parquet.UNIQUE_BID_METADATA_KEY: "true"},
+    )
+    # A Hive partition directory, which must not leak into the rewritten columns.
+    path = tmp_path / "state=Louisiana" / "part-00000.snappy.parquet"
+    path.parent.mkdir()
+    pq.write_table(table, path)
+
+    assert raw_to_parquet.add_h3_columns(str(path), (7,))
+    # The file sits under state=*/, so read it without the hive partition column.
+    result = pq.read_table(path, partitioning=None)
+    assert result.column_names == ["bid", "latitude", "longitude", "h3_r7"]
+    cells = dict(zip(result.column("bid").to_pylist(), result.column("h3_r7").to_pylist()))
+    assert cells == {
+        "a": h3.str_to_int(h3.latlng_to_cell(30.2, -90.1, 7)),
+        "b": None,
+        "c": h3.str_to_int(h3.latlng_to_cell(29.1, -89.5, 7)),
+        "d": h3.str_to_int(h3.latlng_to_cell(30.25, -90.12, 7)),
+    }
+    # Sorted by cell, buildings without coordinates last.
+    expected_order = sorted(cells.values(), key=lambda cell: (cell is None, cell))
+    assert result.column("h3_r7").to_pylist() == expected_order
+    assert raw_to_parquet.has_unique_bids(str(path))
+
+    assert not raw_to_parquet.add_h3_columns(str(path), (7,))
+    assert raw_to_parquet.add_h3_columns(str(path), (7, 10))
+    assert raw_to_parquet.stored_h3_resolutions(str(path)) == [7, 10]
+    assert [p.name for p in path.parent.iterdir()] == [path.name]
@@ -4,6 +4,7 @@ import subprocess
 import sys
 from pathlib import Path
 
+import pytest
 
 SCRIPT_PATH = Path(__file__).resolve().parent.parent / "scripts" / "duckdb_fast_pipeline.py"
 
@@ -29,3 +30,294 @@ def test_cli_accepts_deprecated_flc_flag() -> None:
 
     assert result.returncode != 2
     assert "unrecognized arguments: --flc CoastalA" not in result.stderr
+
+
+def test_unknown_output_format_is_rejected_before_any_work() -> None:
+    pytest.importorskip("duckdb")
+    pytest.importorskip("rasterio")
+    from scripts.duckdb_fast_pipeline import build_fast_csv_duckdb
+
+    with pytest.raises(ValueError, match="output_format"):
+        build_fast_csv_duckdb("dummy.parquet", "missing.tif", "out.xlsx", output_format="xlsx")
+
+
+def _write_depth_raster(path: Path, data, crs: str, transform, **options) -> None:
+    import rasterio
+
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=data.shape[0],
+        width=data.shape[1],
+        count=1,
+        dtype="float32",
+        crs=crs,
+        transform=transform,
+        nodata=-9999.0,
+        **options,
+    ) as dst:
+        dst.write(data, 1)
+
+
+def test_wet_cells_match_a_whole_band_dilation_across_strips(tmp_path: Path) -> None:
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("rasterio")
+    pytest.importorskip("duckdb")
+    from rasterio.transform import from_origin
+
+    from scripts.duckdb_fast_pipeline import raster_wet_cells
+
+    data = np.zeros((1100, 16), dtype=np.float32)
+    data[511, 2] = 1.5  # next to the 512-row strip boundary
+    data[512, 9] = 4.0
+    data[1099, 15] = 0.2
+    data[300, 0] = -9999.0
+    data[700, 3] = -2.0
+    path = tmp_path / "depth.tif"
+    # 16-row blocks: the band is read in 512-row strips.
+    options = {"tiled": True, "blockxsize": 16, "blockysize": 16}
+    _write_depth_raster(path, data, "EPSG:4326", from_origin(-90.0, 30.0, 0.001, 0.001), **options)
+
+    for buffer_pixels in (0, 1, 3):
+        wet = data > 0
+        expected = wet.copy()
+        for row, col in zip(*np.nonzero(wet)):
+            top, left = max(0, row - buffer_pixels), max(0, col - buffer_pixels)
+            expected[top : row + buffer_pixels + 1, left : col + buffer_pixels + 1] = True
+        cells = raster_wet_cells(str(path), buffer_pixels)
+        assert cells.tolist() == np.flatnonzero(expected).tolist()
+
+
+def test_wet_cell_filter_keeps_buildings_on_wet_cells_of_a_projected_raster(tmp_path: Path) -> None:
+    np = pytest.importorskip("numpy")
+    duckdb = pytest.importorskip("duckdb")
+    pytest.importorskip("rasterio")
+    from pyproj import Transformer
+    from rasterio.transform import from_origin
+
+    from scripts.duckdb_fast_pipeline import WET_CELL_FUNCTION, register_wet_cell_filter
+
+    data = np.zeros((20, 20), dtype=np.float32)
+    data[5, 5] = 3.0
+    data[12, 15] = -9999.0
+    path = tmp_path / "utm.tif"
+    origin_x, origin_y, size = 500000.0, 5300000.0, 30.0
+    _write_depth_raster(path, data, "EPSG:32614", from_origin(origin_x, origin_y, size, size))
+
+    to_lonlat = Transformer.from_crs("EPSG:32614", "EPSG:4326", always_xy=True)
+    cells = {
+        "wet": (5, 5),
+        "next_to_wet": (6, 6),
+        "two_away": (7, 5),
+        "nodata": (12, 15),
+        "dry": (0, 0),
+    }
+    rows = []
+    for name, (row, col) in cells.items():
+        lon, lat = to_lonlat.transform(origin_x + (col + 0.5) * size, origin_y - (row + 0.5) * size)
+        rows.append((name, lon, lat))
+    rows.append(("off_grid", -80.0, 10.0))
+
+    con = duckdb.connect()
+    con.execute("CREATE TABLE buildings (name VARCHAR, longitude DOUBLE, latitude DOUBLE)")
+    con.executemany("INSERT INTO buildings VALUES (?, ?, ?)", rows)
+    query = (
+        f"SELECT name FROM buildings WHERE {WET_CELL_FUNCTION}(longitude, latitude) ORDER BY name"
+    )
+
+    assert register_wet_cell_filter(con, str(path)) == 1
+    assert con.execute(query).fetchall() == [("wet",)]
+    con.close()
+
+    con = duckdb.connect()
+    con.execute("CREATE TABLE buildings (name VARCHAR, longitude DOUBLE, latitude DOUBLE)")
+    con.executemany("INSERT INTO buildings VALUES (?, ?, ?)", rows)
+    assert register_wet_cell_filter(con, str(path), buffer_pixels=1) == 9
+    assert con.execute(query).fetchall() == [("next_to_wet",), ("wet",)]
+    con.close()
+
+
+def _chunked(values):
+    pa = pytest.importorskip("pyarrow")
+    return pa.chunked_array([pa.array(values, type=pa.float64())])
+
+
+def test_depth_sampler_returns_cell_values_and_null_off_the_grid(tmp_path: Path) -> None:
+    np = pytest.importorskip("numpy")
+    duckdb = pytest.importorskip("duckdb")
+    pytest.importorskip("rasterio")
+    from rasterio.transform import from_origin
+
+    from scripts.duckdb_fast_pipeline import DEPTH_FUNCTION, DepthSampler, register_depth_sampler
+
+    rng = np.random.default_rng(3)
+    data = rng.uniform(-2, 12, size=(40, 50)).astype(np.float32)
+    data[7, 9] = -9999.0
+    data[30, 41] = np.nan
+    path = tmp_path / "depth.tif"
+    size = 0.001
+    _write_depth_raster(path, data, "EPSG:4326", from_origin(-90.0, 30.0, size, size))
+
+    cells = [(row, col) for row in range(0, 40, 3) for col in range(0, 50, 7)] + [(7, 9), (30, 41)]
+    lon = [-90.0 + (col + 0.5) * size for _, col in cells] + [-80.0, None]
+    lat = [30.0 - (row + 0.5) * size for row, _ in cells] + [10.0, 29.99]
+    expected = [None if data[cell] == -9999.0 else float(data[cell]) for cell in cells]
+    expected += [None, None]
+
+    # Small tiles and a two-tile cache: the points span many tiles and evict them.
+    sampler = DepthSampler(str(path), tile_size=8, cache_tiles=2)
+    values = sampler(_chunked(lon), _chunked(lat)).to_pylist()
+    sampler.close()
+    assert values[:-3] == expected[:-3]
+    assert np.isnan(values[-3]) and values[-2:] == [None, None]
+
+    con = duckdb.connect()
+    con.execute("CREATE TABLE buildings (i INTEGER, longitude DOUBLE, latitude DOUBLE)")
+    con.executemany("INSERT INTO buildings VALUES (?, ?, ?)", list(zip(range(len(lon)), lon, lat)))
+    sampler = register_depth_sampler(con, str(path))
+    query = f"SELECT {DEPTH_FUNCTION}(longitude, latitude) FROM buildings ORDER BY i"
+    sampled = [value for (value,) in con.execute(query).fetchall()]
+    con.close()
+    sampler.close()
+    assert sampled[:-3] == expected[:-3]
+    assert np.isnan(sampled[-3]) and sampled[-2:] == [None, None]
+
+
+def test_parquet_files_outside_the_bbox_are_pruned_by_their_footers(tmp_path: Path) -> None:
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    pytest.importorskip("duckdb")
+    pytest.importorskip("rasterio")
+
+    from scripts.duckdb_fast_pipeline import parquet_files_in_bbox
+
+    def write_state(name: str, lons: list[float], lats: list[float], **options) -> str:
+        path = tmp_path / f"state={name}" / "part-00000.snappy.parquet"
+        path.parent.mkdir()
+        bids = [f"{name}{i}" for i in range(len(lons))]
+        table = pa.table({"bid": bids, "longitude": lons, "latitude": lats})
+        pq.write_table(table, path, row_group_size=2, **options)
+        return str(path)
+
+    bbox = (-101.5, 48.0, -101.0, 48.5)
+    inside = write_state("North_Dakota", [-101.4, -101.2, -90.0], [48.1, 48.2, 40.0])
+    write_state("Florida", [-82.0, -81.0, -80.5], [27.0, 28.0, 26.0])
+    # Overlaps the bbox in longitude only.
+    write_state("South_Dakota", [-101.3, -101.1], [44.0, 45.0])
+    no_stats = write_state("Texas", [-97.0], [30.0], write_statistics=False)
+
+    nsi_glob = str(tmp_path / "state=*" / "*.parquet")
+    assert parquet_files_in_bbox(nsi_glob, bbox) == [inside, no_stats]
+    assert parquet_files_in_bbox(str(tmp_path / "state=Florida" / "*.parquet"), bbox) == []
+    assert parquet_files_in_bbox(str(tmp_path / "missing" / "*.parquet"), bbox) is None
+    assert parquet_files_in_bbox("hf://datasets/example/nsi/state=*/*.parquet", bbox) is None
+
+
+def test_dedup_is_skipped_only_for_flagged_files_in_distinct_partitions(tmp_path: Path) -> None:
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    pytest.importorskip("duckdb")
+    pytest.importorskip("rasterio")
+
+    from scripts.duckdb_fast_pipeline import files_have_unique_bids
+    from scripts.nsi_raw_to_parquet import UNIQUE_BID_METADATA_KEY
+
+    def write(relative: str, flagged: bool) -> str:
+        path = tmp_path / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.table({"bid": ["a", "b"]})
+        if flagged:
+            table = table.replace_schema_metadata({UNIQUE_BID_METADATA_KEY: "true"})
+        pq.write_table(table, path)
+        return str(path)
+
+    florida = write("state=Florida/part-00000.parquet", flagged=True)
+    georgia = write("state=Georgia/part-00000.parquet", flagged=True)
+    georgia_extra = write("state=Georgia/part-00001.parquet", flagged=True)
+    alabama = write("state=Alabama/part-00000.parquet", flagged=False)
+    florida_again = write("new/state=Florida/part-00000.parquet", flagged=True)
+    unpartitioned = write("texas/part-00000.parquet", flagged=True)
+
+    assert files_have_unique_bids([florida, georgia])
+    assert not files_have_unique_bids([florida, alabama])
+    assert not files_have_unique_bids([georgia, georgia_extra])
+    # Two ingests of one state in different directories may share bids.
+    assert not files_have_unique_bids([florida, florida_again])
+    assert not files_have_unique_bids([georgia, unpartitioned])
+    assert not files_have_unique_bids([])
+    assert not files_have_unique_bids(None)
+
+
+def test_h3_filter_registers_the_flood_cells_and_needs_the_stored_column(tmp_path: Path) -> None:
+    np = pytest.importorskip("numpy")
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    duckdb = pytest.importorskip("duckdb")
+    pytest.importorskip("rasterio")
+    pytest.importorskip("h3")
+    from rasterio.transform import from_origin
+
+    from scripts.duckdb_fast_pipeline import build_fast_csv_duckdb, register_flood_cells
+    from scripts.h3_spatial_index import latlng_to_cells, raster_to_h3_array
+
+    data = np.zeros((100, 100), dtype=np.float32)
+    data[40:60, 30:70] = 1.0
+    raster_path = tmp_path / "depth.tif"
+    _write_depth_raster(raster_path, data, "EPSG:4326", from_origin(-90.1, 30.1, 0.002, 0.002))
+
+    con = duckdb.connect()
+    low, high = register_flood_cells(con, str(raster_path), 9)
+    cells = raster_to_h3_array(str(raster_path), 9)
+    assert (low, high) == (int(cells[0]), int(cells[-1]))
+    registered = con.execute("SELECT cell FROM fast_flood_cells ORDER BY cell").fetchnumpy()["cell"]
+    assert registered.tolist() == cells.tolist()
+
+    # The semi-join the pipeline runs against a stored h3_r9 column.
+    rng = np.random.default_rng(2)
+    lat, lon = rng.uniform(29.9, 30.1, 2000), rng.uniform(-90.1, -89.9, 2000)
+    buildings = pa.table({"bid": np.arange(2000), "h3_r9": latlng_to_cells(lat, lon, 9)})
+    con.register("buildings", buildings)
+    kept = con.execute(
+        "SELECT bid FROM buildings WHERE h3_r9 IN (SELECT cell FROM fast_flood_cells) ORDER BY bid"
+    )
+    expected = np.flatnonzero(np.isin(buildings["h3_r9"].to_numpy(), cells))
+    assert 0 < len(expected) < 2000
+    assert kept.fetchnumpy()["bid"].tolist() == expected.tolist()
+    con.close()
+
+    dry_path = tmp_path / "dry.tif"
+    dry = np.zeros((10, 10), dtype=np.float32)
+    _write_depth_raster(dry_path, dry, "EPSG:4326", from_origin(-90.1, 30.1, 0.002, 0.002))
+    assert register_flood_cells(duckdb.connect(), str(dry_path), 9) is None
+
+    nsi = tmp_path / "state=Louisiana" / "part-00000.parquet"
+    nsi.parent.mkdir()
+    pq.write_table(pa.table({"latitude": [30.0], "longitude": [-90.0]}), nsi)
+    with pytest.raises(ValueError, match="h3_r9"):
+        build_fast_csv_duckdb(
+            str(tmp_path / "state=*" / "*.parquet"), str(raster_path), "out.csv", h3_resolution=9
+        )
+
+
+def test_h3_column_check_covers_a_glob_with_no_file_in_the_bbox(tmp_path: Path) -> None:
+    np = pytest.importorskip("numpy")
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    pytest.importorskip("duckdb")
+    pytest.importorskip("rasterio")
+    from rasterio.transform import from_origin
+
+    from scripts.duckdb_fast_pipeline import build_fast_csv_duckdb, parquet_files_in_bbox
+
+    raster_path = tmp_path / "depth.tif"
+    data = np.ones((10, 10), dtype=np.float32)
+    _write_depth_raster(raster_path, data, "EPSG:4326", from_origin(-90.1, 30.1, 0.002, 0.002))
+    far = tmp_path / "state=Maine" / "part-00000.parquet"
+    far.parent.mkdir()
+    pq.write_table(pa.table({"latitude": [45.0], "longitude": [-69.0]}), far)
+
+    nsi_glob = str(tmp_path / "state=*" / "*.parquet")
+    assert parquet_files_in_bbox(nsi_glob, (-90.1, 30.08, -90.08, 30.1)) == []
+    with pytest.raises(ValueError, match="h3_r9"):
+        build_fast_csv_duckdb(nsi_glob, str(raster_path), "out.csv", h3_resolution=9)
@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import pytest
+
+
+def test_filter_buildings_by_h3_matches_per_building_lookup(tmp_path: Path) -> None:
+    np = pytest.importorskip("numpy")
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    h3 = pytest.importorskip("h3")
+    pytest.importorskip("rasterio")
+
+    from scripts.h3_spatial_index import cells_to_array, filter_buildings_by_h3
+
+    rng = np.random.default_rng(11)
+    n = 5000
+    lat = rng.uniform(29.0, 31.0, n)
+    lon = rng.uniform(-91.0, -89.0, n)
+    # Buildings sorted by latitude, so some row groups lie entirely outside the flood cells.
+    order = np.argsort(lat)
+    lat, lon = lat[order], lon[order]
+    lat[::97] = np.nan
+    table = pa.table(
+        {
+            "bid": [f"b{i}" for i in range(n)],
+            "latitude": pa.array(lat, mask=np.isnan(lat)),
+            "longitude": lon.astype(np.float32),
+        }
+    )
+    path = tmp_path / "state.parquet"
+    pq.write_table(table, path, row_group_size=500)
+
+    resolution = 7
+    flood_cells = set(h3.grid_disk(h3.latlng_to_cell(30.0, -90.0, resolution), 25))
+    bids = table.column("bid").to_pylist()
+    expected = [
+        bid
+        for bid, la, lo in zip(bids, lat.tolist(), lon.astype(np.float32).tolist())
+        if not np.isnan(la) and h3.latlng_to_cell(la, lo, resolution) in flood_cells
+    ]
+    assert 0 < len(expected) < n
+
+    for cells in (flood_cells, cells_to_array(flood_cells)):
+        result = filter_buildings_by_h3(str(path), cells, resolution, batch_size=300)
+        assert result.schema == table.schema
+        assert result.column("bid").to_pylist() == expected
+
+    assert filter_buildings_by_h3(str(path), set(), resolution).num_rows == 0
+
+
+@pytest.mark.parametrize(
+    ("crs", "origin", "pixel", "resolution"),
+    [("EPSG:4326", (-90.2, 30.1), 0.0004, 9), ("EPSG:32615", (780_000.0, 3_335_000.0), 5.0, 10)],
+)
+def test_raster_to_h3_array_covers_every_wet_pixel(
+    tmp_path: Path, crs: str, origin: tuple[float, float], pixel: float, resolution: int
+) -> None:
+    np = pytest.importorskip("numpy")
+    h3 = pytest.importorskip("h3")
+    rasterio = pytest.importorskip("rasterio")
+    pytest.importorskip("pyproj")
+    from pyproj import Transformer
+    from rasterio.transform import from_origin, xy
+
+    from scripts.h3_spatial_index import raster_to_h3_array, raster_to_h3_cells
+
+    rng = np.random.default_rng(5)
+    rows, cols = np.mgrid[0:300, 0:400]
+    # A blob with a ragged edge, scattered wet pixels and a nodata hole.
+    data = np.where(np.hypot(rows - 150, cols - 200) < 110 + rng.normal(0, 6, rows.shape), 1.5, 0.0)
+    data[rng.random(data.shape) < 0.01] = 0.3
+    data[140:160, 190:210] = -9999.0
+    data = data.astype(np.float32)
+    path = tmp_path / "depth.tif"
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=data.shape[0],
+        width=data.shape[1],
+        count=1,
+        dtype="float32",
+        crs=crs,
+        transform=from_origin(*origin, pixel, pixel),
+        nodata=-9999.0,
+        tiled=True,
+        blockxsize=128,
+        blockysize=128,
+    ) as dst:
+        dst.write(data, 1)
+        transform = dst.transform
+
+    wet_rows, wet_cols = np.nonzero((data > 0) & (data != -9999.0))
+    x, y = xy(transform, wet_rows, wet_cols)
+    lon, lat = Transformer.from_crs(crs, "EPSG:4326", always_xy=True).transform(x, y)
+    expected = {h3.latlng_to_cell(la, lo, resolution) for la, lo in zip(lat, lon)}
+
+    for use_cache in (False, True):
+        cells = raster_to_h3_array(str(path), resolution, use_cache=use_cache)
+        assert cells.dtype == np.uint64
+        assert np.all(np.diff(cells.astype(np.int64)) > 0)
+        assert {h3.int_to_str(cell) for cell in cells.tolist()} == expected
+    assert raster_to_h3_cells(str(path), resolution) == expected
+    with pytest.warns(DeprecationWarning, match="stride"):
+        assert raster_to_h3_cells(str(path), resolution, stride=4) == expected
+
+
+def test_filter_buildings_by_h3_uses_the_stored_cell_column(tmp_path: Path) -> None:
+    np = pytest.importorskip("numpy")
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    h3 = pytest.importorskip("h3")
+    pytest.importorskip("rasterio")
+
+    from scripts.h3_spatial_index import (
+        H3FloodIndex,
+        _row_groups_with_cells,
+        filter_buildings_by_h3,
+        latlng_to_cells,
+    )
+
+    rng = np.random.default_rng(4)
+    lat, lon = rng.uniform(29.0, 31.0, 3000), rng.uniform(-91.0, -89.0, 3000)
+    cells = latlng_to_cells(lat, lon, 7)
+    order = np.argsort(cells)
+    cells = cells[order]
+    # Coordinates are dropped, so only the stored column can select the buildings.
+    table = pa.table(
+        {
+            "bid": pa.array(order),
+            "latitude": pa.nulls(3000, pa.float64()),
+            "longitude": pa.nulls(3000, pa.float64()),
+            "h3_r7": pa.array(cells, mask=np.arange(3000) % 101 == 0),
+        }
+    )
+    path = tmp_path / "state.parquet"
+    pq.write_table(table, path, row_group_size=200)
+
+    flood = {h3.int_to_str(int(cell)) for cell in cells[1000:1200:7]}
+    kept = filter_buildings_by_h3(str(path), flood, 7)
+    expected = [
+        bid
+        for bid, cell in zip(table.column("bid").to_pylist(), table.column("h3_r7").to_pylist())
+        if cell is not None and h3.int_to_str(cell) in flood
+    ]
+    assert kept.column("bid").to_pylist() == expected
+    index = H3FloodIndex(cells[1000:1200:7], 7)
+    groups = _row_groups_with_cells(pq.ParquetFile(path), "h3_r7", index, 7)
+    assert groups == [5]
+
+
+def test_compaction_matches_h3_and_membership_is_hierarchical() -> None:
+    np = pytest.importorskip("numpy")
+    h3 = pytest.importorskip("h3")
+    pytest.importorskip("rasterio")
+    from h3.api import basic_int as h3_int
+
+    from scripts.h3_spatial_index import H3FloodIndex, cell_parents, compact_cell_array
+
+    center = h3_int.latlng_to_cell(30.0, -90.0, 9)
+    fine = np.array(sorted(h3_int.grid_disk(center, 30)), dtype=np.uint64)
+    pentagon = sorted(h3_int.get_pentagons(4))[0]
+    pentagon_children = np.array(h3_int.cell_to_children(pentagon, 6), dtype=np.uint64)
+    cells = np.concatenate([fine, pentagon_children])
+
+    for resolution in (0, 5, 8, 9):
+        expected = [h3_int.cell_to_parent(cell, resolution) for cell in fine.tolist()]
+        assert cell_parents(fine, resolution).tolist() == expected
+    compacted = compact_cell_array(cells)
+    expected = h3_int.compact_cells(fine.tolist())
+    expected += h3_int.compact_cells(pentagon_children.tolist())
+    assert compacted.tolist() == sorted(expected)
+    assert pentagon in compacted.tolist()
+    # Cells inside another cell of the input are dropped.
+    nested = np.append(pentagon_children[:5], np.uint64(pentagon))
+    assert compact_cell_array(nested).tolist() == [pentagon]
+
+    index = H3FloodIndex(cells, 9)
+    assert len(index) == len(compacted) < len(cells) / 10
+    assert min(index.levels) < 9
+    ring = np.array(sorted(h3_int.grid_ring(center, 31)), dtype=np.uint64)
+    probe = np.concatenate([fine, ring, np.zeros(1, dtype=np.uint64)])
+    assert index.contains(probe).tolist() == [True] * len(fine) + [False] * (len(ring) + 1)
+    finer = np.array(
+        [h3_int.cell_to_center_child(cell, 11) for cell in probe[:-1].tolist()], dtype=np.uint64
+    )
+    assert index.contains(finer).tolist() == [True] * len(fine) + [False] * len(ring)
+    with pytest.raises(ValueError, match="resolution 9 or finer"):
+        index.contains(cell_parents(fine[:1], 8))
+
+    lat, lon = h3.cell_to_latlng(h3.int_to_str(int(fine[0])))
+    hits = index.contains_latlng(np.array([lat, np.nan]), np.array([lon, lon]))
+    assert hits.tolist() == [True, False]
+
+
+def test_flood_index_from_raster_compacts_the_wet_cells(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    np = pytest.importorskip("numpy")
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    rasterio = pytest.importorskip("rasterio")
+    from rasterio.transform import from_origin
+
+    import scripts.h3_spatial_index as h3_spatial_index
+    from scripts.h3_spatial_index import (
+        H3FloodIndex,
+        compact_cell_array,
+        filter_buildings_by_h3,
+        latlng_to_cells,
+        raster_to_h3_array,
+    )
+
+    rows, cols = np.mgrid[0:1100, 0:600]
+    data = (np.hypot(rows - 550, cols - 300) < 280).astype(np.float32)
+    path = tmp_path / "surge.tif"
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=data.shape[0],
+        width=data.shape[1],
+        count=1,
+        dtype="float32",
+        crs="EPSG:4326",
+        transform=from_origin(-90.3, 30.3, 0.0005, 0.0005),
+        tiled=True,
+        blockxsize=128,
+        blockysize=128,
+    ) as dst:
+        dst.write(data, 1)
+
+    # Compact after every strip, so the cells found in later strips merge into earlier parents.
+    monkeypatch.setattr(h3_spatial_index, "COMPACT_EVERY_STRIPS", 1)
+    fine = raster_to_h3_array(str(path), 9, use_cache=False)
+    index = H3FloodIndex.from_raster(str(path), 9)
+    assert index.resolution == 9
+    assert index.cells.tolist() == compact_cell_array(fine).tolist()
+    assert 1 < len(index.levels) and len(index) < len(fine) / 4
+
+    rng = np.random.default_rng(8)
+    lat, lon = rng.uniform(29.7, 30.4, 4000), rng.uniform(-90.4, -89.9, 4000)
+    cells = latlng_to_cells(lat, lon, 9)
+    order = np.argsort(cells)
+    table = pa.table(
+        {"bid": order, "latitude": lat[order], "longitude": lon[order], "h3_r9": cells[order]}
+    )
+    expected = np.isin(cells[order], fine)
+    assert 0 < expected.sum() < len(expected)
+
+    with_column = tmp_path / "with_column.parquet"
+    without_column = tmp_path / "without_column.parquet"
+    pq.write_table(table, with_column, row_group_size=250)
+    pq.write_table(table.drop_columns(["h3_r9"]), without_column, row_group_size=250)
+    for parquet_path in (with_column, without_column):
+        kept = filter_buildings_by_h3(str(parquet_path), index, resolution=7)
+        expected_bids = table.column("bid").filter(pa.array(expected)).to_pylist()
+        assert kept.column("bid").to_pylist() == expected_bids
+
+
+def test_flood_index_is_cached_per_raster_content_resolution_and_threshold(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    np = pytest.importorskip("numpy")
+    rasterio = pytest.importorskip("rasterio")
+    from rasterio.transform import from_origin
+
+    import scripts.h3_spatial_index as h3_spatial_index
+    from scripts.h3_spatial_index import (
+        flood_index_cache_path,
+        load_flood_index,
+        raster_to_h3_array,
+    )
+
+    def write(data) -> None:
+        with rasterio.open(
+            path,
+            "w",
+            driver="GTiff",
+            height=data.shape[0],
+            width=data.shape[1],
+            count=1,
+            dtype="float32",
+            crs="EPSG:4326",
+            transform=from_origin(-90.0, 30.0, 0.001, 0.001),
+            nodata=-9999.0,
+        ) as dst:
+            dst.write(data, 1)
+
+    data = np.zeros((200, 300), dtype=np.float32)
+    data[50:100, 100:250] = 0.5
+    data[60:70, 120:130] = 2.0
+    path = tmp_path / "psurge.tif"
+    write(data)
+
+    # Nothing is written next to the raster unless the caller asks for the cache.
+    uncached = load_flood_index(str(path), 9)
+    assert not (tmp_path / ".cache").exists()
+
+    index = load_flood_index(str(path), 9, use_cache=True)
+    assert index.cells.tolist() == uncached.cells.tolist()
+    cache_path = flood_index_cache_path(str(path), 9)
+    assert Path(cache_path).parent == tmp_path / ".cache"
+    assert Path(cache_path).is_file()
+    np.testing.assert_allclose(index.bbox, (-89.9, 29.9, -89.75, 29.95))
+    expected = raster_to_h3_array(str(path), 9, use_cache=False)
+
+    # Later calls, from any process, read the cache instead of scanning the raster.
+    def no_scan(*args, **kwargs):
+        raise AssertionError("the raster was scanned again")
+
+    monkeypatch.setattr(h3_spatial_index, "_raster_strip_cells", no_scan)
+    cached = load_flood_index(str(path), 9, use_cache=True)
+    assert cached.cells.tolist() == index.cells.tolist()
+    assert cached.bbox == index.bbox
+    assert raster_to_h3_array(str(path), 9, use_cache=True).tolist() == expected.tolist()
+    monkeypatch.undo()
+
+    deep = load_flood_index(str(path), 9, threshold=1.0, use_cache=True)
+    np.testing.assert_allclose(deep.bbox, (-89.88, 29.93, -89.87, 29.94))
+    assert len(deep.to_array()) < len(expected)
+    assert len({flood_index_cache_path(str(path), 9), flood_index_cache_path(str(path), 8)}) == 2
+    assert len(list((tmp_path / ".cache").iterdir())) == 2
+
+    # Rewriting the raster changes its key, so the stale entry is not used.
+    data[:] = 0.0
+    write(data)
+    dry = load_flood_index(str(path), 9, use_cache=True)
+    assert len(dry) == 0 and dry.bbox is None
+    assert raster_to_h3_array(str(path), 9, use_cache=True).tolist() == []
+
+    # A cache directory that cannot be written to is skipped with a warning.
+    blocked = tmp_path / "blocked"
+    blocked.write_text("not a directory")
+    with caplog.at_level(logging.WARNING, logger=h3_spatial_index.logger.name):
+        assert len(load_flood_index(str(path), 9, use_cache=True, cache_dir=str(blocked))) == 0
+    assert "Could not write flood index cache" in caplog.text
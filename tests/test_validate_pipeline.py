@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+
+import pytest
+
+from scripts.validate_pipeline import compute_summary, load_predictions, validate_schema
+
+ROWS = [
+    {
+        "FltyId": "1",
+        "Latitude": "27.1",
+        "Longitude": "-82.4",
+        "state": "FL",
+        "flc": "CoastalA",
+        "Occ": "RES1",
+        "BldgDmgPct": "12.5",
+    },
+    {
+        "FltyId": "2",
+        "Latitude": "27.2",
+        "Longitude": "-82.5",
+        "state": "FL",
+        "flc": "CoastalA",
+        "Occ": "RES1",
+        "BldgDmgPct": "0",
+    },
+    {
+        "FltyId": "3",
+        "Latitude": "29.9",
+        "Longitude": "-90.1",
+        "state": "LA",
+        "flc": "CoastalV",
+        "Occ": "COM1",
+        "BldgDmgPct": "",
+    },
+]
+
+
+def test_parquet_predictions_summarize_like_csv(tmp_path: Path) -> None:
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    csv_path = tmp_path / "predictions.csv"
+    with csv_path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(ROWS[0]))
+        writer.writeheader()
+        writer.writerows(ROWS)
+
+    parquet_path = tmp_path / "predictions.parquet"
+    columns = {name: [row[name] for row in ROWS] for name in ROWS[0]}
+    for name in ("Latitude", "Longitude", "BldgDmgPct"):
+        columns[name] = [float(value) if value else None for value in columns[name]]
+    pq.write_table(pa.table(columns), parquet_path)
+
+    csv_rows = load_predictions(csv_path)
+    parquet_rows = load_predictions(parquet_path)
+    assert parquet_rows[0]["BldgDmgPct"] == 12.5
+    assert validate_schema(parquet_rows) == validate_schema(csv_rows) == []
+    assert compute_summary(parquet_rows) == compute_summary(csv_rows)